@@ -0,0 +1,127 @@
+# batcher.py
+
+import asyncio
+import time
+from collections import Counter
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls into batches. Items submitted within `window_ms` of the
+    first one (at most `max_batch_size`) go to `process(items) -> results` in a single
+    call on a worker thread, and each caller gets its own result back.
+
+    One batch runs at a time and whatever arrives meanwhile forms the next one, so batch
+    size grows with concurrency instead of queueing latency.
+    """
+
+    def __init__(self, process, window_ms=5, max_batch_size=32, executor=None):
+        self.process = process
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.batch_sizes = Counter()
+        self.wait_time = 0.0
+
+    def _start(self):
+        # The worker belongs to the loop that first submits; a new loop (e.g. a restarted
+        # app) gets a fresh queue and worker.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        """Queue one item and wait for its result (or the batch's exception)."""
+        self._start()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future, time.monotonic()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Callers that gave up while waiting are not worth computing for
+        return [entry for entry in batch if not entry[1].done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            now = time.monotonic()
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.batch_sizes[len(batch)] += 1
+            self.wait_time += sum(now - queued for _, _, queued in batch)
+
+            try:
+                results = await self._loop.run_in_executor(
+                    self.executor, self.process, [item for item, _, _ in batch]
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch of {len(batch)} produced {len(results)} results")
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            except asyncio.CancelledError:
+                # close() during a batch: its callers would otherwise wait forever
+                self._fail(batch, RuntimeError("Batcher closed"))
+                raise
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _fail(entries, error):
+        for _, future, _ in entries:
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self):
+        """Stop the worker and fail the batch in flight and anything still queued."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, RuntimeError):
+            pass
+        while not self._queue.empty():
+            self._fail([self._queue.get_nowait()], RuntimeError("Batcher closed"))
+        self._worker = None
+        self._loop = None
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window * 1000,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_wait_ms": round(self.wait_time / self.items * 1000, 3) if self.items else 0,
+        }
@@ -0,0 +1,121 @@
+# db_pool.py
+
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+DATABASE = 'database.db'
+
+# Applied to every connection. WAL lets readers run concurrently with the single writer,
+# synchronous=NORMAL is durable enough under WAL and avoids an fsync per commit.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,  # negative = KiB, so ~64MB page cache per connection
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """
+    SQLite connection manager: one reader connection per worker thread plus a single
+    writer connection. Reads run in a bounded thread pool and writes on one dedicated
+    thread, so queued writes never occupy reader threads and async route handlers never
+    block the event loop.
+    """
+
+    def __init__(self, db_path=DATABASE, max_workers=None):
+        self.db_path = db_path
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sqlite")
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        # SQLite allows one writer at a time; a single thread serializes writes without a lock
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._writer = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def reader(self):
+        """Return the calling thread's reader connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def _writer_conn(self):
+        """The writer connection; commits on success and rolls back on error. Write thread only."""
+        if self._writer is None:
+            self._writer = self._connect()
+        try:
+            yield self._writer
+            self._writer.commit()
+        except BaseException:
+            self._writer.rollback()
+            raise
+
+    def _run_read(self, fn, args):
+        return fn(self.reader(), *args)
+
+    def _run_write(self, fn, args):
+        with self._writer_conn() as db:
+            return fn(db, *args)
+
+    async def read(self, fn, *args):
+        """Run `fn(conn, *args)` on a reader connection in the pool's executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run_read, fn, args)
+
+    async def write(self, fn, *args):
+        """Run `fn(conn, *args)` inside a write transaction on the writer thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._write_executor, self._run_write, fn, args)
+
+    def close(self):
+        self._write_executor.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool for DATABASE (used as a FastAPI dependency)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
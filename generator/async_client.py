@@ -0,0 +1,244 @@
+# generator/async_client.py
+import asyncio
+import random
+import time
+from collections import deque
+
+# HTTP statuses worth retrying: timeouts, rate limiting, provider-side failures
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Generation failed (after any retries)."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call's deadline passed while queued, waiting or generating."""
+
+
+def is_transient(exc):
+    """
+    Network failures and retryable statuses. google.genai's APIError carries `.code`,
+    openai's APIStatusError `.status_code`; openai connection errors are matched by name
+    so neither SDK has to be imported here.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ == "APIConnectionError" for cls in type(exc).__mro__):
+        return True
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return status in TRANSIENT_STATUS
+
+
+class TokenBucket:
+    """
+    Request rate limiter: `rate` tokens per second, bursts of up to `burst`.
+    A caller reserves a token up front and sleeps until it is due, so waiters are
+    served in arrival order without a lock.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, max_wait=None):
+        """Seconds to wait for a token, or None (nothing reserved) if over `max_wait`."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+
+class LatencySamples:
+    """Recent durations for percentile metrics"""
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+        return {"count": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": pick(1.0)}
+
+
+class AsyncLLMClient:
+    """
+    Governs async generation against a provider client (anything with google-genai's
+    `client.aio.models.generate_content` / `generate_content_stream`).
+
+    Every call waits for a rate-limit token and a concurrency slot, runs under a deadline
+    of `timeout` seconds covering queueing, retries and generation, and retries transient
+    errors with jittered exponential backoff. Failures raise LLMError.
+    """
+
+    def __init__(self, client=None, max_concurrency=8, rate=10.0, burst=20, timeout=30.0,
+                 retries=3, backoff=0.5, max_backoff=8.0, client_factory=None):
+        # `client_factory` builds the provider client on first call instead
+        self.client = client
+        self.client_factory = client_factory
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._loop = None
+        self._slots = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.timeouts = 0
+        self.queue_time = LatencySamples()
+        self.latency = LatencySamples()
+
+    def _models(self):
+        if self.client is None:
+            self.client = self.client_factory()
+        return self.client.aio.models
+
+    def _semaphore(self):
+        # asyncio primitives belong to one event loop; a new loop gets a fresh semaphore
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.timeouts += 1
+            raise LLMTimeoutError("LLM deadline exceeded")
+        return remaining
+
+    def _check_deadline(self, deadline, error):
+        # wait_for's TimeoutError means the deadline ran out; anything else is the provider's
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)) and time.monotonic() >= deadline:
+            self.timeouts += 1
+            raise LLMTimeoutError("LLM deadline exceeded") from None
+
+    async def _admit(self, deadline):
+        """Wait for a rate token and a concurrency slot, both within the deadline."""
+        queued = time.monotonic()
+        self.waiting += 1
+        try:
+            wait = self.bucket.reserve(max_wait=self._remaining(deadline))
+            if wait is None:
+                self.timeouts += 1
+                raise LLMTimeoutError("LLM rate limit wait exceeds the deadline")
+            await asyncio.sleep(wait)
+            slots = self._semaphore()
+            # Before acquire() is called: if the deadline has passed, no coroutine is left unawaited
+            remaining = self._remaining(deadline)
+            try:
+                await asyncio.wait_for(slots.acquire(), remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMTimeoutError("No LLM slot free before the deadline") from None
+        finally:
+            self.waiting -= 1
+        self.queue_time.add(time.monotonic() - queued)
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def _backoff(self, attempt, error, deadline):
+        if attempt == self.retries or not is_transient(error):
+            self.failures += 1
+            raise LLMError(f"LLM call failed: {error}") from error
+        self.retried += 1
+        # Full jitter: concurrent callers that failed together do not retry together
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        await asyncio.sleep(min(delay, self._remaining(deadline)))
+
+    async def generate(self, model, contents, timeout=None):
+        """Full response text."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.calls += 1
+        start = time.monotonic()
+        for attempt in range(self.retries + 1):
+            await self._admit(deadline)
+            try:
+                remaining = self._remaining(deadline)
+                response = await asyncio.wait_for(
+                    self._models().generate_content(model=model, contents=contents), remaining
+                )
+            except LLMError:
+                raise
+            except Exception as e:
+                self._check_deadline(deadline, e)
+                error = e
+            else:
+                self.latency.add(time.monotonic() - start)
+                return response.text or ""
+            finally:
+                self._release()
+            await self._backoff(attempt, error, deadline)
+
+    async def stream(self, model, contents, timeout=None):
+        """
+        Async iterator of text pieces. Transient failures are retried only until the first
+        piece arrives; after that a failure raises, since the caller has shown partial text.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.calls += 1
+        start = time.monotonic()
+        for attempt in range(self.retries + 1):
+            started = False
+            await self._admit(deadline)
+            try:
+                remaining = self._remaining(deadline)
+                chunks = await asyncio.wait_for(
+                    self._models().generate_content_stream(model=model, contents=contents), remaining
+                )
+                iterator = chunks.__aiter__()
+                while True:
+                    remaining = self._remaining(deadline)
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                self.latency.add(time.monotonic() - start)
+                return
+            except LLMError:
+                raise
+            except Exception as e:
+                self._check_deadline(deadline, e)
+                if started:
+                    self.failures += 1
+                    raise LLMError(f"LLM stream failed: {e}") from e
+                error = e
+            finally:
+                self._release()
+            await self._backoff(attempt, error, deadline)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "retries": self.retried,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "queue_time": self.queue_time.summary(),
+            "latency": self.latency.summary(),
+        }
@@ -1,42 +1,169 @@
 # generator/llm_interface.py
 import json
 import requests
+from collections import deque
 
-from google import genai
 from dotenv import load_dotenv
 import os
 
+from generator.async_client import AsyncLLMClient, LLMError
+from generator.providers import GeminiProvider
+
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
 
-client = genai.Client(api_key=API_KEY)
+_client = None
+_async_client = None
+
+# Past questions + answers resent with each turn are capped at roughly this many tokens
+HISTORY_TOKEN_BUDGET = 2000
+
+def get_client():
+    """Shared Gemini client, created on first use so importing this module needs no API key."""
+    global _client
+    if _client is None:
+        from google import genai
+        _client = genai.Client(api_key=API_KEY)
+    return _client
+
+def get_async_client():
+    """Shared governor for async calls: one rate limit and concurrency cap for the process."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncLLMClient(client_factory=get_client)
+    return _async_client
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), enough for budgeting history."""
+    return len(text) // 4 + 1
 
 class LLMInterface:
-    def __init__(self, model_name="gemini-2.5-flash-lite", history_enabled=False, client=client):
+    def __init__(self, model_name="gemini-2.5-flash-lite", history_enabled=False, client=None,
+                 history_token_budget=HISTORY_TOKEN_BUDGET, async_client=None, provider=None):
         self.model_name = model_name
         self.history_enabled = history_enabled
-        self.history = ""
+        self.history_token_budget = history_token_budget
+        # (question, answer, tokens) per past turn, oldest first
+        self.turns = deque()
+        self.history_tokens = 0
+        self.client = client
+        # A given client gets its own governor; otherwise async calls share get_async_client()
+        self.async_client = async_client or (AsyncLLMClient(client) if client is not None else None)
+        # Async calls go to `provider` (e.g. a HedgedProvider) when given, else Gemini via async_client
+        self.provider = provider
+        # Exception from the most recent call, None if it succeeded
+        self.last_error = None
 
-    def call_llm(self, prompt):
-        
+    @property
+    def history(self):
+        return [(question, answer) for question, answer, _ in self.turns]
 
-        if self.history_enabled and self.history:
-            self.history += f"User: {prompt}\nAssistant: "
-        else:
-            self.history = f"User: {prompt}\nAssistant: "
+    def load_history(self, turns):
+        """Restore [(question, answer), ...] pairs, e.g. from a session store, within the budget."""
+        self.turns.clear()
+        self.history_tokens = 0
+        for question, answer in turns:
+            self.remember(question, answer)
 
+    def _contents(self, prompt):
+        """Past turns as user/model messages, then this turn's full prompt."""
+        contents = []
+        if self.history_enabled:
+            for question, answer, _ in self.turns:
+                contents.append({"role": "user", "parts": [{"text": question}]})
+                contents.append({"role": "model", "parts": [{"text": answer}]})
+        contents.append({"role": "user", "parts": [{"text": prompt}]})
+        return contents
 
+    def remember(self, question, answer):
+        """
+        Keep the bare question (not the prompt with its retrieved context) and the answer,
+        dropping the oldest turns once the history is over its token budget.
+        """
+        if not self.history_enabled:
+            return
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        self.turns.append((question, answer, tokens))
+        self.history_tokens += tokens
+        while self.turns and self.history_tokens > self.history_token_budget:
+            _, _, dropped = self.turns.popleft()
+            self.history_tokens -= dropped
+
+    def call_llm(self, prompt, question=None):
+        """
+        `prompt` is what the model sees this turn; `question` (defaults to the prompt) is
+        what the history keeps of it.
+        """
+        self.last_error = None
         try:
-            response = client.models.generate_content(
+            response = (self.client or get_client()).models.generate_content(
                 model=self.model_name,
-                contents=self.history,
+                contents=self._contents(prompt),
             )
 
-            if self.history_enabled:
-                self.history += response.text + "\n"
-
-            return response.text if response else "No response from LLM"
+            if not response:
+                return "No response from LLM"
+            if response.text:
+                self.remember(question or prompt, response.text)
+            return response.text
 
         except Exception as e:
+            self.last_error = e
             return f"Error communicating with LLM: {e}"
 
+    def stream_llm(self, prompt, question=None):
+        """
+        Like call_llm, but yields the answer piece by piece as the model streams it.
+        The full answer is added to the history once the stream completes.
+        """
+        parts = []
+        self.last_error = None
+
+        try:
+            stream = (self.client or get_client()).models.generate_content_stream(
+                model=self.model_name,
+                contents=self._contents(prompt),
+            )
+            for chunk in stream:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+
+        except Exception as e:
+            self.last_error = e
+            yield f"Error communicating with LLM: {e}"
+            return
+
+        self.remember(question or prompt, "".join(parts))
+
+    def _async_provider(self):
+        return self.provider or GeminiProvider(self.model_name, async_client=self.async_client)
+
+    async def acall_llm(self, prompt, question=None, timeout=None):
+        """
+        Async call_llm through the configured provider (rate-limited and retried by its
+        AsyncLLMClient). Unlike call_llm, failures raise LLMError instead of coming back
+        as answer text.
+        """
+        self.last_error = None
+        try:
+            answer = await self._async_provider().generate(self._contents(prompt), timeout=timeout)
+        except LLMError as e:
+            self.last_error = e
+            raise
+        if answer:
+            self.remember(question or prompt, answer)
+        return answer
+
+    async def astream_llm(self, prompt, question=None, timeout=None):
+        """Async stream_llm; failures raise LLMError after any pieces already yielded."""
+        parts = []
+        self.last_error = None
+        try:
+            async for text in self._async_provider().stream(self._contents(prompt), timeout=timeout):
+                parts.append(text)
+                yield text
+        except LLMError as e:
+            self.last_error = e
+            raise
+        self.remember(question or prompt, "".join(parts))
@@ -0,0 +1,253 @@
+# generator/providers.py
+import asyncio
+import time
+from types import SimpleNamespace
+
+from generator.async_client import AsyncLLMClient, LLMError, LatencySamples
+
+
+class Provider:
+    """
+    One model behind one vendor. `contents` is the structured turn list LLMInterface
+    builds ([{"role": "user" | "model", "parts": [{"text": ...}]}, ...]).
+    """
+
+    name = "provider"
+
+    async def generate(self, contents, timeout=None):
+        """Full answer text; raises LLMError on failure."""
+        raise NotImplementedError
+
+    def stream(self, contents, timeout=None):
+        """Async iterator of answer pieces; raises LLMError on failure."""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Create the vendor client (and import its SDK) ahead of the first call."""
+
+
+class GeminiProvider(Provider):
+    """Gemini through an AsyncLLMClient (the process-wide one by default)."""
+
+    def __init__(self, model_name="gemini-2.5-flash-lite", async_client=None):
+        self.model_name = model_name
+        self.name = f"gemini:{model_name}"
+        self._async_client = async_client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from generator.llm_interface import get_async_client
+            self._async_client = get_async_client()
+        return self._async_client
+
+    async def generate(self, contents, timeout=None):
+        return await self.async_client.generate(self.model_name, contents, timeout=timeout)
+
+    def stream(self, contents, timeout=None):
+        return self.async_client.stream(self.model_name, contents, timeout=timeout)
+
+    def warm_up(self):
+        self.async_client._models()
+
+
+class OpenAIModels:
+    """
+    google-genai shaped `aio.models` over an OpenAI AsyncOpenAI client, so OpenAI calls
+    go through the same AsyncLLMClient governor.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def messages(contents):
+        if isinstance(contents, str):
+            return [{"role": "user", "content": contents}]
+        return [
+            {
+                "role": "assistant" if turn["role"] == "model" else "user",
+                "content": "".join(part["text"] for part in turn["parts"]),
+            }
+            for turn in contents
+        ]
+
+    async def generate_content(self, model, contents):
+        response = await self.client.chat.completions.create(model=model, messages=self.messages(contents))
+        return SimpleNamespace(text=response.choices[0].message.content)
+
+    async def generate_content_stream(self, model, contents):
+        response = await self.client.chat.completions.create(
+            model=model, messages=self.messages(contents), stream=True
+        )
+
+        async def chunks():
+            async for event in response:
+                if event.choices:
+                    yield SimpleNamespace(text=event.choices[0].delta.content)
+        return chunks()
+
+
+class OpenAIProvider(GeminiProvider):
+    """OpenAI chat completions, governed like Gemini but with its own limits."""
+
+    def __init__(self, model_name="gpt-4o-mini", async_client=None, client=None):
+        if async_client is None:
+            def factory():
+                from openai import AsyncOpenAI
+                return SimpleNamespace(aio=SimpleNamespace(models=OpenAIModels(client or AsyncOpenAI())))
+            async_client = AsyncLLMClient(client_factory=factory)
+        super().__init__(model_name, async_client=async_client)
+        self.name = f"openai:{model_name}"
+
+
+def provider_from_spec(spec):
+    """'gemini:<model>' or 'openai:<model>' -> Provider"""
+    vendor, _, model_name = spec.partition(":")
+    if vendor == "gemini":
+        return GeminiProvider(model_name or "gemini-2.5-flash-lite")
+    if vendor == "openai":
+        return OpenAIProvider(model_name or "gpt-4o-mini")
+    raise ValueError(f"Unknown LLM provider: {spec}")
+
+
+class HedgedProvider(Provider):
+    """
+    Sends a request to `primary`; if no response (or, when streaming, no first piece)
+    arrives within the hedge delay, sends the same request to `secondary` too. The first
+    to answer wins and the other is cancelled. A primary failure falls straight back to
+    the secondary.
+
+    The hedge delay is the primary's `percentile` latency over recent calls (bounded by
+    `min_delay`/`max_delay`), or `initial_delay` until `min_samples` have been seen, so
+    only the slowest few percent of calls pay for a second request. Full answers and
+    first stream pieces take very different times, so each mode keeps its own samples.
+    """
+
+    def __init__(self, primary, secondary, percentile=0.95, min_samples=20, initial_delay=2.0,
+                 min_delay=0.05, max_delay=10.0):
+        self.primary = primary
+        self.secondary = secondary
+        self.name = f"hedged({primary.name},{secondary.name})"
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        # Primary latency to the full answer (generate) and to the first piece (stream)
+        self.generate_latency = LatencySamples()
+        self.first_piece_latency = LatencySamples()
+        self.calls = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self.wins = {"primary": 0, "secondary": 0}
+
+    def warm_up(self):
+        self.primary.warm_up()
+        self.secondary.warm_up()
+
+    def _latency(self, mode):
+        return self.generate_latency if mode == "generate" else self.first_piece_latency
+
+    def hedge_delay(self, mode="generate"):
+        """Delay before hedging a `mode` ("generate" or "stream") request."""
+        samples = sorted(self._latency(mode).samples)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        value = samples[min(len(samples) - 1, int(self.percentile * len(samples)))]
+        return min(self.max_delay, max(self.min_delay, value))
+
+    async def _race(self, mode, start_primary, start_secondary, discard=None):
+        """
+        Run the first-response coroutines of a `mode` request; returns (winner, result),
+        timing the primary against that mode's hedge delay. Losers are cancelled
+        and awaited, and `discard` is applied to any result that finished but lost.
+        Raises LLMError only if both fail.
+        """
+        self.calls += 1
+        latency = self._latency(mode)
+        start = time.monotonic()
+        primary = asyncio.ensure_future(start_primary())
+        tasks = {primary: "primary"}
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(mode))
+            if done and primary.exception() is None:
+                winner = primary
+            else:
+                if done:
+                    self.fallbacks += 1
+                else:
+                    self.hedged += 1
+                tasks[asyncio.ensure_future(start_secondary())] = "secondary"
+                pending = {task for task in tasks if not task.done()}
+                while pending and winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((task for task in done if task.exception() is None), None)
+
+            if winner is None:
+                errors = [task.exception() for task in tasks]
+                raise LLMError(f"All providers failed: {errors}") from errors[-1]
+            if winner is primary:
+                latency.add(time.monotonic() - start)
+            self.wins[tasks[winner]] += 1
+            return tasks[winner], winner.result()
+        finally:
+            losers = [task for task in tasks if task is not winner]
+            for task in losers:
+                if not task.done():
+                    if task is primary:
+                        # The primary took at least this long; keep slow calls in the p95
+                        latency.add(time.monotonic() - start)
+                    task.cancel()
+            outcomes = await asyncio.gather(*losers, return_exceptions=True)
+            if discard is not None:
+                for outcome in outcomes:
+                    if not isinstance(outcome, BaseException):
+                        await discard(outcome)
+
+    async def generate(self, contents, timeout=None):
+        _, text = await self._race(
+            "generate",
+            lambda: self.primary.generate(contents, timeout=timeout),
+            lambda: self.secondary.generate(contents, timeout=timeout),
+        )
+        return text
+
+    async def stream(self, contents, timeout=None):
+        async def first_piece(provider):
+            pieces = provider.stream(contents, timeout=timeout).__aiter__()
+            try:
+                return pieces, await pieces.__anext__()
+            except StopAsyncIteration:
+                return pieces, None
+            except BaseException:
+                await pieces.aclose()
+                raise
+
+        async def close(result):
+            await result[0].aclose()
+
+        _, (pieces, first) = await self._race(
+            "stream", lambda: first_piece(self.primary), lambda: first_piece(self.secondary), discard=close
+        )
+        try:
+            if first is None:
+                return
+            yield first
+            async for piece in pieces:
+                yield piece
+        finally:
+            await pieces.aclose()
+
+    def stats(self):
+        return {
+            "primary": self.primary.name,
+            "secondary": self.secondary.name,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0,
+            "fallbacks": self.fallbacks,
+            "wins": dict(self.wins),
+            "hedge_delay_ms": {mode: round(self.hedge_delay(mode) * 1000, 3) for mode in ("generate", "stream")},
+        }
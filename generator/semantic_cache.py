@@ -0,0 +1,163 @@
+# generator/semantic_cache.py
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answers to past queries, looked up by query-embedding similarity.
+
+    Cached query embeddings are rows of one matrix, so a lookup is a single
+    matrix-vector product; the closest entry at or above `threshold` (cosine) is a hit.
+    Each entry remembers the articles its answer was built from. Invalidating an article
+    drops those entries, and an answer whose articles changed while it was being
+    generated is never stored (see `generation`). Entries expire after `ttl` seconds
+    and the least recently used go first once `maxsize` is reached.
+
+    Only the last `changes_kept` invalidations are remembered for that check; an answer
+    that started before the oldest of them is not stored.
+    """
+
+    def __init__(self, threshold=0.92, maxsize=10_000, ttl=24 * 3600, changes_kept=4096):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._matrix = None
+        # slot -> entry dict, least recently used first
+        self._entries = OrderedDict()
+        self._free = []
+        self._by_article = {}
+        # Bumped on every invalidation; the article ids of the latest invalidations, newest last
+        self._generation = 0
+        self._changes = deque(maxlen=changes_kept)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) or 1)
+
+    @property
+    def generation(self):
+        """Take this before retrieval and pass it to `store`, so racing updates are caught."""
+        return self._generation
+
+    def _drop(self, slot):
+        entry = self._entries.pop(slot)
+        self._matrix[slot] = 0
+        self._free.append(slot)
+        for article_id in entry["article_ids"]:
+            slots = self._by_article.get(article_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_article[article_id]
+
+    def _changed_since(self, generation, article_ids):
+        """Whether any of `article_ids` was invalidated after `generation` (True if unknown)."""
+        since = self._generation - generation
+        if since > len(self._changes):
+            return True
+        return not article_ids.isdisjoint(itertools.islice(reversed(self._changes), since))
+
+    def lookup(self, embedding):
+        """The best cached {"query", "answer", "results", "score"} for this embedding, or None."""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if not self._entries or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._matrix @ query
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                slot = int(slot)
+                entry = self._entries.get(slot)
+                if entry is None:
+                    continue
+                if entry["expires"] <= now:
+                    self._drop(slot)
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return {
+                    "query": entry["query"],
+                    "answer": entry["answer"],
+                    "results": entry["results"],
+                    "score": float(scores[slot]),
+                }
+            self.misses += 1
+            return None
+
+    def store(self, embedding, query, answer, results, generation):
+        """
+        Cache an answer. `generation` is `self.generation` as read before retrieval; if any
+        of the answer's articles changed since then the answer is discarded. So is an
+        answer built from no article (e.g. the "no relevant documents" placeholder):
+        nothing would invalidate it when relevant articles are added.
+        """
+        embedding = self._normalize(embedding)
+        article_ids = {r["document"]["article_id"] for r in results if r["document"].get("article_id") is not None}
+        if not article_ids:
+            return False
+        with self._lock:
+            if self._changed_since(generation, article_ids):
+                return False
+            if self._matrix is None or self._matrix.shape[1] != embedding.shape[0]:
+                # First entry, or a different embedding model: start over
+                self._matrix = np.zeros((self.maxsize, embedding.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._by_article.clear()
+                self._free = list(range(self.maxsize - 1, -1, -1))
+            if not self._free:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._matrix[slot] = embedding
+            self._entries[slot] = {
+                "query": query,
+                "answer": answer,
+                "results": results,
+                "article_ids": article_ids,
+                "expires": time.monotonic() + self.ttl,
+            }
+            for article_id in article_ids:
+                self._by_article.setdefault(article_id, set()).add(slot)
+            return True
+
+    def invalidate_article(self, article_id):
+        """Forget every answer built from this article (call on update or delete)."""
+        with self._lock:
+            self._generation += 1
+            self._changes.append(article_id)
+            for slot in list(self._by_article.get(article_id, ())):
+                self._drop(slot)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._drop(slot)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,214 @@
+# generator/session_store.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Rough fixed cost of an LLMInterface and its bookkeeping, on top of the history text
+SESSION_OVERHEAD_BYTES = 1024
+
+
+def session_size(llm):
+    return SESSION_OVERHEAD_BYTES + sum(len(question) + len(answer) for question, answer in llm.history)
+
+
+class SessionStore:
+    """
+    user_id -> LLMInterface with bounded memory.
+
+    The memory tier is an LRU capped by session count and by estimated history bytes;
+    sessions idle for `ttl` seconds expire. With `db_path` each session's compacted
+    history (questions and answers only, already within the token budget) is written to
+    SQLite after every turn, so evicted sessions, restarts and other workers resume it.
+    A per-session version number tells a worker when its in-memory copy is stale; it is
+    re-checked at most every `recheck_interval` seconds per session, and SQLite is never
+    touched while the store-wide lock is held, so memory hits stay cheap and concurrent.
+    """
+
+    def __init__(self, factory, max_sessions=10_000, max_memory_bytes=64 * 1024 * 1024, ttl=3600,
+                 db_path=None, persist_ttl=30 * 24 * 3600, recheck_interval=2.0):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.persist_ttl = persist_ttl
+        self.recheck_interval = recheck_interval
+        # user_id -> [llm, size, last_used, version, version_checked_at]
+        self._sessions = OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        # The writer connection and its lock; reads use one connection per thread
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers = []
+        self._saves = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = {"capacity": 0, "memory": 0, "expired": 0}
+
+    def _conn(self):
+        # Opened on first use so a store that is never touched creates no file. Call with _db_lock held.
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA busy_timeout = 5000")
+            self._db.execute('''
+            CREATE TABLE IF NOT EXISTS llm_sessions (
+                user_id TEXT PRIMARY KEY,
+                turns TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_sessions_updated ON llm_sessions (updated_at)")
+            self._db.commit()
+        return self._db
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._db_lock:
+                self._conn()  # creates the table
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA busy_timeout = 5000")
+                self._readers.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def _stored(self, user_id):
+        """(version, turns) persisted for user_id, or None"""
+        row = self._reader().execute(
+            "SELECT version, turns, updated_at FROM llm_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None or row[2] < time.time() - self.persist_ttl:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _drop(self, user_id, reason):
+        size = self._sessions.pop(user_id)[1]
+        self._memory -= size
+        self.evictions[reason] += 1
+
+    def _enforce_limits(self):
+        while len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)), "capacity")
+        while self._sessions and self._memory > self.max_memory_bytes:
+            self._drop(next(iter(self._sessions)), "memory")
+
+    def _expire(self, now):
+        # LRU order is also idle order, so expired sessions sit at the front
+        while self._sessions:
+            user_id, entry = next(iter(self._sessions.items()))
+            last_used = entry[2]
+            if last_used > now - self.ttl:
+                break
+            self._drop(user_id, "expired")
+
+    def get(self, user_id):
+        """The session for user_id: from memory, else restored from SQLite, else a new one."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(user_id)
+            if entry is not None and (not self.db_path or now - entry[4] < self.recheck_interval):
+                return self._hit(user_id, entry, now)
+
+        # Checked against SQLite outside the lock, so other users' requests are not held up
+        stored = self._stored(user_id) if self.db_path else None
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            # `<`: a save from this process may have landed while we were reading
+            if entry is not None and (stored is None or stored[0] <= entry[3]):
+                entry[4] = now
+                return self._hit(user_id, entry, now)
+
+            # Missing, or another worker has moved the conversation on since we cached it
+            if entry is not None:
+                self._memory -= entry[1]
+                del self._sessions[user_id]
+            self.misses += 1
+            llm = self.factory()
+            version = 0
+            if stored is not None:
+                version, turns = stored
+                llm.load_history(turns)
+                self.loads += 1
+            size = session_size(llm)
+            self._sessions[user_id] = [llm, size, now, version, now]
+            self._memory += size
+            self._enforce_limits()
+            return llm
+
+    def _hit(self, user_id, entry, now):
+        entry[2] = now
+        self._sessions.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def save(self, user_id, llm):
+        """Record a finished turn: refresh the memory accounting and persist the history."""
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is not None and entry[0] is llm:
+                size = session_size(llm)
+                self._memory += size - entry[1]
+                entry[1] = size
+            turns = json.dumps(llm.history)
+            self._enforce_limits()
+        if not self.db_path:
+            return
+
+        with self._db_lock:
+            conn = self._conn()
+            conn.execute('''
+            INSERT INTO llm_sessions (user_id, turns, version, updated_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                turns = excluded.turns, version = version + 1, updated_at = excluded.updated_at
+            ''', (user_id, turns, time.time()))
+            version = conn.execute("SELECT version FROM llm_sessions WHERE user_id = ?", (user_id,)).fetchone()[0]
+            conn.commit()
+            self._saves += 1
+            if self._saves % 1000 == 0:
+                self._purge(conn)
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is not None and entry[0] is llm:
+                entry[3] = max(entry[3], version)
+                entry[4] = time.monotonic()
+
+    def _purge(self, conn):
+        conn.execute("DELETE FROM llm_sessions WHERE updated_at < ?", (time.time() - self.persist_ttl,))
+        conn.commit()
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def close(self):
+        with self._db_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._local = threading.local()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self._memory,
+            "max_memory_bytes": self.max_memory_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loaded_from_db": self.loads,
+            "evictions": dict(self.evictions),
+            "persistent": bool(self.db_path),
+        }
@@ -2,8 +2,137 @@
 
 import sqlite3
 
-def init_db():
-    conn = sqlite3.connect('database.db')
+def create_search_index(cursor):
+    """
+    FTS5 index over articles.title/content, kept in sync by triggers.
+    Returns True if the index was newly created (and therefore needs a rebuild).
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+    ).fetchone()
+
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, content, content='articles', content_rowid='id'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, content ON articles BEGIN
+        INSERT INTO articles_fts (articles_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    ''')
+    return exists is None
+
+def create_indexes(cursor):
+    """Composite indexes backing the (published_date, id) keyset ordering of article listings."""
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_date, id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_articles_source_published ON articles (source_id, published_date, id)
+    ''')
+
+def create_stats_table(cursor):
+    """
+    Per-source article counts and word totals, maintained by triggers so /api/stats
+    never has to scan the articles table. Articles without a source count under source_id 0.
+    Returns True if the table was newly created (and therefore needs a recompute).
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'source_stats'"
+    ).fetchone()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS source_stats (
+        source_id INTEGER PRIMARY KEY,
+        article_count INTEGER NOT NULL DEFAULT 0,
+        total_words INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS source_stats_insert AFTER INSERT ON articles BEGIN
+        INSERT INTO source_stats (source_id, article_count, total_words)
+        VALUES (COALESCE(new.source_id, 0), 1, COALESCE(new.word_count, 0))
+        ON CONFLICT (source_id) DO UPDATE SET
+            article_count = article_count + 1,
+            total_words = total_words + excluded.total_words;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS source_stats_delete AFTER DELETE ON articles BEGIN
+        UPDATE source_stats SET
+            article_count = article_count - 1,
+            total_words = total_words - COALESCE(old.word_count, 0)
+        WHERE source_id = COALESCE(old.source_id, 0);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS source_stats_update AFTER UPDATE OF word_count, source_id ON articles BEGIN
+        UPDATE source_stats SET
+            article_count = article_count - 1,
+            total_words = total_words - COALESCE(old.word_count, 0)
+        WHERE source_id = COALESCE(old.source_id, 0);
+        INSERT INTO source_stats (source_id, article_count, total_words)
+        VALUES (COALESCE(new.source_id, 0), 1, COALESCE(new.word_count, 0))
+        ON CONFLICT (source_id) DO UPDATE SET
+            article_count = article_count + 1,
+            total_words = total_words + excluded.total_words;
+    END
+    ''')
+    return exists is None
+
+def recompute_stats(cursor):
+    """Rebuild source_stats from the articles table (repair after manual edits)."""
+    cursor.execute("DELETE FROM source_stats")
+    cursor.execute('''
+    INSERT INTO source_stats (source_id, article_count, total_words)
+    SELECT COALESCE(source_id, 0), COUNT(*), COALESCE(SUM(word_count), 0)
+    FROM articles
+    GROUP BY COALESCE(source_id, 0)
+    ''')
+
+def add_version_columns(cursor):
+    """Per-article version counter and updated_at timestamp, used for ETags / Last-Modified."""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(articles)")}
+    if 'version' not in columns:
+        cursor.execute("ALTER TABLE articles ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    if 'updated_at' not in columns:
+        # ALTER TABLE cannot use a non-constant default, so backfill existing rows instead
+        cursor.execute("ALTER TABLE articles ADD COLUMN updated_at TEXT")
+        cursor.execute("UPDATE articles SET updated_at = CURRENT_TIMESTAMP")
+
+def migrate_db(db_path='database.db'):
+    """Bring an existing database up to the current schema. Safe to run repeatedly."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    add_version_columns(cursor)
+
+    if create_search_index(cursor):
+        # Index articles that were written before the FTS table existed
+        cursor.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+
+    create_indexes(cursor)
+
+    if create_stats_table(cursor):
+        recompute_stats(cursor)
+
+    conn.commit()
+    conn.close()
+
+def init_db(db_path='database.db'):
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     # Create source table
@@ -24,10 +153,17 @@ def init_db():
         published_date TEXT DEFAULT (DATE('now')),
         word_count INTEGER,
         source_id INTEGER,
+        version INTEGER NOT NULL DEFAULT 1,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (source_id) REFERENCES source(id)
     )
     ''')
 
+    # Full-text search index (populated by triggers as articles are inserted)
+    create_search_index(cursor)
+    create_indexes(cursor)
+    create_stats_table(cursor)
+
     # Insert dummy sources (if not exists)
     cursor.execute("INSERT OR IGNORE INTO source (id, name, url) VALUES (1, 'Health Daily', 'https://healthdaily.example.com')")
     cursor.execute("INSERT OR IGNORE INTO source (id, name, url) VALUES (2, 'Wellness News', 'https://wellnessnews.example.com')")
@@ -90,5 +226,17 @@ def init_db():
     conn.close()
 
 if __name__ == '__main__':
-    init_db()
-    print("Database initialized with articles and source tables including your health articles.")
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        migrate_db()
+        print("Database migrated to the current schema.")
+    elif len(sys.argv) > 1 and sys.argv[1] == 'recompute-stats':
+        conn = sqlite3.connect('database.db')
+        recompute_stats(conn.cursor())
+        conn.commit()
+        conn.close()
+        print("Statistics recomputed from the articles table.")
+    else:
+        init_db()
+        print("Database initialized with articles and source tables including your health articles.")
@@ -1,26 +1,56 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import asyncio
+import json
+import sqlite3
 import time
 from contextlib import asynccontextmanager
 
-# Comment out AI/Docker heavy imports to speed up startup
-# from retriever.sql_emb import load_documents, Embedder
-# from retriever.vector_store import collection_exists, create_qdrant_collection, add_documents_to_index, query_index
-# from generator.prompt_template import build_prompt
-# from generator.llm_interface import LLMInterface
-# from docker import docker_image_exists, pull_docker_image, run_docker_container
+# AI/Docker modules (sentence_transformers, qdrant_client, google.genai) are imported
+# inside the functions that use them, so startup only pays for them in the warmup thread
 
 # Import your article routes
-from routes.article_routes import router as article_router
-from init_db import init_db
+from routes.article_routes import router as article_router, article_change_hooks
+from routes.stats_routes import router as stats_router
+from retriever.store import get_vector_store
+from init_db import init_db, migrate_db
+from db_pool import ConnectionPool, close_pool, get_pool
+from batcher import MicroBatcher
+from generator.session_store import SessionStore
+from generator.semantic_cache import SemanticCache
+from warmup import Warmup
 import os
 
 # ==== Config ====
 # FILE_PATH = "data/fitness.jsonl"
 FILE_PATH = "database.db"
 ENCODER_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = "embedding_cache"
+EMBEDDING_SNAPSHOT_PATH = "embedding_snapshot"  # corpus embeddings reused for index builds on restart; None disables
 TOP_K = 3
+VECTOR_BACKEND = "qdrant"  # "qdrant" (Docker container) or "numpy" (in-process exact search)
+VECTOR_INDEX_PATH = "vector_index"  # numpy backend only
+VECTOR_DTYPE = "float32"  # numpy backend only; "float16" halves memory
+QDRANT_SLIM_PAYLOADS = False  # qdrant backend only; keep chunk text in SQLite, not in the payloads
+BATCH_MAX_QUERIES = 1000  # per /query/batch request
+BATCH_GENERATION_CONCURRENCY = 4  # /query/batch?generate=true LLM calls in flight, across all batches
+QUERY_BATCH_WINDOW_MS = 5  # concurrent /query requests arriving within this window share one encode + search
+QUERY_BATCH_MAX_SIZE = 32
+SESSION_MAX = 10_000  # chat sessions held in memory
+SESSION_MEMORY_MB = 64
+SESSION_TTL = 3600  # seconds idle before a session leaves memory
+SESSION_DB_PATH = "sessions.db"  # persisted history, shared by workers; None keeps sessions in memory only
+ANSWER_CACHE_THRESHOLD = 0.92  # cosine similarity at which a past question counts as the same question
+ANSWER_CACHE_SIZE = 10_000
+ANSWER_CACHE_TTL = 24 * 3600
+LLM_PRIMARY = "gemini:gemini-2.5-flash-lite"
+LLM_HEDGE_SECONDARY = None  # e.g. "openai:gpt-4o-mini" or "gemini:gemini-2.5-flash"; sent when the primary is slower than its p95
+AI_WARMUP = True  # load the embedder, vector index and LLM client in the background at startup
+WARMUP_RETRY_AFTER = 5  # seconds; Retry-After on /query while the AI stack is still loading
+QDRANT_STARTUP_TIMEOUT = 30  # seconds to wait for a freshly started container to accept connections
 image = "qdrant/qdrant"
 container_name = "health-bot-qdrant"
 storage_path = "qdrant_storage"
@@ -35,11 +65,163 @@ class QueryResponse(BaseModel):
     results: List[dict]
     timing: dict
 
-# ==== Globals (set during startup) ====
-# llm = None
-# embedder = None
-# documents = None
-# llm_sessions = {} 
+class BatchQueryResult(BaseModel):
+    query: str
+    user_id: str
+    answer: Optional[str] = None
+    error: Optional[str] = None  # set instead of answer when generation failed
+    results: List[dict]
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+    timing: dict
+
+# ==== Globals (set by the warmup thread) ====
+embedder = None
+vector_store = None
+warmup = Warmup()
+
+def build_vector_store():
+    """Vector index backend selected by VECTOR_BACKEND"""
+    if VECTOR_BACKEND == "numpy":
+        return get_vector_store("numpy", path=VECTOR_INDEX_PATH, dtype=VECTOR_DTYPE)
+    return get_vector_store("qdrant", slim=QDRANT_SLIM_PAYLOADS, db_path=FILE_PATH)
+
+def build_llm_provider():
+    """Provider for chat sessions: LLM_PRIMARY, hedged with LLM_HEDGE_SECONDARY when set"""
+    from generator.providers import HedgedProvider, provider_from_spec
+    primary = provider_from_spec(LLM_PRIMARY)
+    if LLM_HEDGE_SECONDARY:
+        return HedgedProvider(primary, provider_from_spec(LLM_HEDGE_SECONDARY))
+    return primary
+
+llm_provider = build_llm_provider()
+
+def new_llm_session():
+    from generator.llm_interface import LLMInterface
+    return LLMInterface(history_enabled=True, provider=llm_provider)
+
+llm_sessions = SessionStore(
+    new_llm_session,
+    max_sessions=SESSION_MAX,
+    max_memory_bytes=SESSION_MEMORY_MB * 1024 * 1024,
+    ttl=SESSION_TTL,
+    db_path=SESSION_DB_PATH
+)
+
+def get_llm_session(user_id):
+    """Per-user LLMInterface that keeps the conversation history"""
+    return llm_sessions.get(user_id)
+
+answer_cache = SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+# Answers built from an article are dropped when it is updated or deleted
+article_change_hooks.append(answer_cache.invalidate_article)
+
+def answer_cacheable(llm):
+    """
+    Answers are shared across users by question alone, which only holds for a session's
+    first turn: later answers depend on that user's conversation so far.
+    """
+    return not llm.history
+
+def retrieve_batch(items):
+    """
+    Embedding, answer-cache lookup and vector search for a micro-batch of /query
+    (question, cacheable) items (runs on a worker thread). Cacheable questions with a
+    cached answer skip the search.
+    """
+    embeddings = embedder.encode_queries([query for query, _ in items])
+    generation = answer_cache.generation
+    cached = [answer_cache.lookup(embedding) if cacheable else None
+              for embedding, (_, cacheable) in zip(embeddings, items)]
+    misses = [i for i, hit in enumerate(cached) if hit is None]
+    searched = dict(zip(misses, vector_store.query_batch(embeddings[misses], top_k=TOP_K) if misses else []))
+    return [
+        {
+            "embedding": embedding,
+            "cached": hit,
+            "results": hit["results"] if hit is not None else searched[i],
+            "generation": generation,
+        }
+        for i, (embedding, hit) in enumerate(zip(embeddings, cached))
+    ]
+
+retrieval_batcher = MicroBatcher(retrieve_batch, window_ms=QUERY_BATCH_WINDOW_MS, max_batch_size=QUERY_BATCH_MAX_SIZE)
+
+# ==== Warmup ====
+def load_embedder():
+    global embedder
+    from retriever.sql_emb import Embedder
+    model = Embedder(model_name=ENCODER_MODEL, cache_dir=EMBEDDING_CACHE_DIR)
+    # The first encode is much slower than the rest; pay for it here, not on a user's query
+    model.model.encode(["warmup"], normalize_embeddings=True)
+    embedder = model
+
+def start_qdrant():
+    from docker import docker_image_exists, pull_docker_image, run_docker_container
+    if not docker_image_exists(image):
+        pull_docker_image(image)
+    run_docker_container(image, container_name, storage_path)
+
+def index_exists(store, timeout=0):
+    """store.exists(), retried for `timeout` seconds while the backend is still starting"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return store.exists()
+        except Exception:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+def load_vector_store():
+    global vector_store
+    store = build_vector_store()
+    if VECTOR_BACKEND == "qdrant":
+        start_qdrant()
+    if not index_exists(store, timeout=QDRANT_STARTUP_TIMEOUT if VECTOR_BACKEND == "qdrant" else 0):
+        print(f"Creating and indexing {VECTOR_BACKEND} vector index...")
+        documents, embeddings = corpus_embeddings()
+        store.rebuild(documents, embeddings)
+        print(f"Indexed {len(documents)} documents.")
+    vector_store = store
+
+def corpus_embeddings():
+    """
+    (documents, embeddings) for a full index build: memory-mapped from the embedding
+    snapshot when it matches the model and the articles, otherwise encoded now and
+    snapshotted for the next start.
+    """
+    from retriever.snapshot import corpus_fingerprint, load_snapshot, save_snapshot
+    fingerprint = None
+    if EMBEDDING_SNAPSHOT_PATH:
+        fingerprint = corpus_fingerprint(FILE_PATH, ENCODER_MODEL)
+        snapshot = load_snapshot(EMBEDDING_SNAPSHOT_PATH, ENCODER_MODEL, fingerprint)
+        if snapshot is not None:
+            print(f"Using the embedding snapshot in '{EMBEDDING_SNAPSHOT_PATH}' ({len(snapshot[0])} chunks)")
+            return snapshot
+
+    if embedder is None:
+        raise RuntimeError("The vector index is missing and the embedder is not loaded to build it")
+    from retriever.sql_emb import load_documents
+    documents = load_documents(FILE_PATH)
+    embeddings = embedder.encode_documents(documents)
+    if EMBEDDING_SNAPSHOT_PATH:
+        # Saved before indexing so a failed build does not cost the encode
+        save_snapshot(EMBEDDING_SNAPSHOT_PATH, documents, embeddings, ENCODER_MODEL, fingerprint)
+    return documents, embeddings
+
+def load_llm():
+    llm_provider.warm_up()
+
+def require_ai():
+    """503 until the warmup has loaded the embedder and the vector index"""
+    if embedder is not None and vector_store is not None:
+        return
+    if warmup.loading:
+        raise HTTPException(status_code=503, detail="AI components are still loading",
+                            headers={"Retry-After": str(WARMUP_RETRY_AFTER)})
+    raise HTTPException(status_code=503, detail="AI query functionality is not available")
 
 # ==== Startup/Shutdown Events ====
 @asynccontextmanager
@@ -48,33 +230,24 @@ async def lifespan(app: FastAPI):
     print("Initializing database...")
     if not os.path.exists(FILE_PATH):
         init_db()
+    else:
+        migrate_db(FILE_PATH)
     print("Database ready!")
-    
-    # Comment out heavy AI/Docker initialization
-    # global llm, embedder, documents, llm_sessions
-    # 
-    # if not docker_image_exists(image):
-    #     pull_docker_image(image)
-    # run_docker_container(image, container_name, storage_path)
-    # 
-    # print("Loading documents...")
-    # documents = load_documents(FILE_PATH)
-    # print(f"Loaded {len(documents)} documents")
-    # 
-    # print("Initializing Embedder and LLM...")
-    # embedder = Embedder(model_name=ENCODER_MODEL)
-    # 
-    # if not collection_exists():
-    #     print("Creating and indexing Qdrant collection...")
-    #     doc_embeddings = embedder.encode_documents(documents)
-    #     create_qdrant_collection(doc_embeddings.shape[1])
-    #     add_documents_to_index(documents, doc_embeddings)
-    #     print("Indexing complete.")
-    # else:
-    #     print("Qdrant collection already exists, skipping indexing.")
-    
+
+    # The AI stack loads in the background; /articles serves right away and
+    # /query answers 503 until it is warm (progress at /api/health)
+    if AI_WARMUP:
+        warmup.start([
+            ("embedder", load_embedder),
+            ("vector_store", load_vector_store),
+            ("llm", load_llm),
+        ])
+
     yield
-    # Shutdown (if needed)
+    # Shutdown - fail queued queries, release SQLite connections
+    await retrieval_batcher.close()
+    llm_sessions.close()
+    close_pool()
 
 # ==== FastAPI App ====
 app = FastAPI(
@@ -86,54 +259,220 @@ app = FastAPI(
 
 # Include article routes
 app.include_router(article_router)
+app.include_router(stats_router)
 
 @app.get("/")   
 def read_root():
     return {"message": "Health Bot API is running. Use /articles endpoints or /query to post questions."}
 
-# ==== Query Endpoint (Temporarily Disabled) ====
+@app.get("/api/health")
+async def health(pool: ConnectionPool = Depends(get_pool)):
+    """Liveness (database reachable) and readiness (warm state and load time of each AI component)"""
+    try:
+        await pool.read(lambda db: db.execute("SELECT 1").fetchone())
+        database = "connected"
+    except sqlite3.Error:
+        database = "unavailable"
+    body = {
+        "status": "healthy" if database == "connected" else "unhealthy",
+        "database": database,
+        "ai_ready": embedder is not None and vector_store is not None,
+        **warmup.status(),
+    }
+    return JSONResponse(body, status_code=200 if database == "connected" else 503)
+
+# ==== Query Endpoint ====
 @app.post("/query", response_model=QueryResponse)
-def ask_question(req: QueryRequest):
-    # Temporarily return a placeholder response to avoid errors
+async def ask_question(req: QueryRequest):
+    require_ai()
+    from generator.prompt_template import build_prompt
+    from generator.async_client import LLMError
+    start = time.time()
+
+    # Get or create LLMInterface for this user
+    user_llm = await run_in_threadpool(get_llm_session, req.user_id)
+    cacheable = answer_cacheable(user_llm)
+
+    # Encode query and retrieve context, micro-batched with concurrent requests
+    retrieval = await retrieval_batcher.submit((req.query, cacheable))
+    results = retrieval["results"]
+    chunk_time = time.time()
+
+    if not results:
+        return QueryResponse(
+            answer="No relevant documents found.",
+            results=[],
+            timing={"embedding_time": chunk_time - start, "generation_time": 0}
+        )
+
+    if retrieval["cached"] is not None:
+        answer = retrieval["cached"]["answer"]
+        user_llm.remember(req.query, answer)
+    else:
+        prompt = build_prompt([res["document"] for res in results], req.query)
+        try:
+            answer = await user_llm.acall_llm(prompt, question=req.query)
+        except LLMError as e:
+            raise HTTPException(status_code=502, detail=f"Error communicating with LLM: {e}")
+        if cacheable:
+            answer_cache.store(retrieval["embedding"], req.query, answer, results, retrieval["generation"])
+    await run_in_threadpool(llm_sessions.save, req.user_id, user_llm)
+    end = time.time()
+
     return QueryResponse(
-        answer="AI query functionality is temporarily disabled for faster startup. Please use /articles endpoints instead.",
-        results=[],
-        timing={"embedding_time": 0, "generation_time": 0}
+        answer=answer,
+        results=results,
+        timing={
+            "embedding_time": chunk_time - start,
+            "generation_time": end - chunk_time
+        }
+    )
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def ask_question_stream(req: QueryRequest):
+    """
+    Server-sent events: `results` with the retrieved chunks as soon as they are known,
+    `token` events as the model streams its answer (`error` if generation fails), then
+    `done` with the answer and timing (including time_to_first_token).
+    """
+    require_ai()
+
+    start = time.time()
+    user_llm = await run_in_threadpool(get_llm_session, req.user_id)
+    cacheable = answer_cacheable(user_llm)
+    retrieval = await retrieval_batcher.submit((req.query, cacheable))
+    results = retrieval["results"]
+    cached = retrieval["cached"]
+    chunk_time = time.time()
+
+    async def events():
+        from generator.prompt_template import build_prompt
+        from generator.async_client import LLMError
+        yield sse_event("results", {"results": results})
+
+        first_token = None
+        parts = []
+        if cached is not None:
+            # A paraphrase of an answered question whose sources are unchanged
+            first_token = time.time()
+            parts.append(cached["answer"])
+            user_llm.remember(req.query, cached["answer"])
+            yield sse_event("token", {"text": cached["answer"]})
+        else:
+            prompt = build_prompt([res["document"] for res in results], req.query)
+            try:
+                async for text in user_llm.astream_llm(prompt, question=req.query):
+                    if first_token is None:
+                        first_token = time.time()
+                    parts.append(text)
+                    yield sse_event("token", {"text": text})
+            except LLMError as e:
+                yield sse_event("error", {"detail": str(e)})
+            if cacheable and user_llm.last_error is None and parts:
+                answer_cache.store(retrieval["embedding"], req.query, "".join(parts), results,
+                                   retrieval["generation"])
+        end = time.time()
+        await run_in_threadpool(llm_sessions.save, req.user_id, user_llm)
+
+        yield sse_event("done", {
+            "answer": "".join(parts),
+            "cached": cached is not None,
+            "timing": {
+                "embedding_time": chunk_time - start,
+                "time_to_first_token": (first_token or end) - start,
+                "generation_time": end - chunk_time,
+            }
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/query/metrics")
+def query_metrics():
+    """Micro-batching, query-embedding cache, session store, answer cache, LLM governor and hedging counters"""
+    from generator.llm_interface import get_async_client
+    return {
+        "retrieval_batcher": retrieval_batcher.stats(),
+        "query_cache": embedder.query_cache_stats() if embedder is not None else None,
+        "sessions": llm_sessions.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm": get_async_client().stats(),
+        "hedging": llm_provider.stats() if hasattr(llm_provider, "stats") else None,
+    }
+
+_batch_generation_slots = None  # (event loop, Semaphore)
+
+def batch_generation_slots():
+    """
+    Process-wide cap on batch generations. Handing a whole batch to the LLM client at
+    once would use up its rate budget (later calls fail their deadline before they are
+    admitted) and starve /query; instead each call starts, with a fresh deadline, once
+    a slot frees up.
+    """
+    global _batch_generation_slots
+    loop = asyncio.get_running_loop()
+    if _batch_generation_slots is None or _batch_generation_slots[0] is not loop:
+        _batch_generation_slots = (loop, asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY))
+    return _batch_generation_slots[1]
+
+async def generate_answer(query, results):
+    """
+    One stateless LLM answer; batch questions stay out of the users' chat histories.
+    Returns (answer, error): a failed generation is reported for its query alone.
+    """
+    from generator.prompt_template import build_prompt
+    from generator.llm_interface import LLMInterface
+    from generator.async_client import LLMError
+    context = [res["document"] for res in results]
+    async with batch_generation_slots():
+        try:
+            return await LLMInterface(provider=llm_provider).acall_llm(build_prompt(context, query)), None
+        except LLMError as e:
+            return None, str(e)
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def ask_questions(reqs: List[QueryRequest], generate: bool = False):
+    """
+    Retrieval for many questions at once: one batched encode, one batched vector search.
+    Answers are generated only with `generate=true`, through the same provider and rate
+    limits as /query. Timing covers the whole batch.
+    """
+    require_ai()
+    if not reqs:
+        raise HTTPException(status_code=422, detail="No queries given")
+    if len(reqs) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+
+    start = time.time()
+    query_embeddings = await run_in_threadpool(embedder.encode_queries, [req.query for req in reqs])
+    embedded = time.time()
+    results = await run_in_threadpool(vector_store.query_batch, query_embeddings, top_k=TOP_K)
+    retrieved = time.time()
+
+    answers = [(None, None)] * len(reqs)
+    if generate:
+        answers = await asyncio.gather(*(generate_answer(req.query, hits) for req, hits in zip(reqs, results)))
+    end = time.time()
+
+    return BatchQueryResponse(
+        results=[
+            BatchQueryResult(query=req.query, user_id=req.user_id, answer=answer, error=error, results=hits)
+            for req, (answer, error), hits in zip(reqs, answers, results)
+        ],
+        timing={
+            "queries": len(reqs),
+            "embedding_time": embedded - start,
+            "retrieval_time": retrieved - embedded,
+            "generation_time": end - retrieved,
+            "total_time": end - start,
+        }
     )
-    
-    # Original AI code commented out:
-    # start = time.time()
-    # 
-    # # Get or create LLMInterface for this user
-    # if req.user_id not in llm_sessions:
-    #     llm_sessions[req.user_id] = LLMInterface(history_enabled=True)
-    # user_llm = llm_sessions[req.user_id]
-    # 
-    # # Encode query and retrieve context
-    # query_embedding = embedder.encode_query(req.query)
-    # results = query_index(query_embedding, top_k=TOP_K)
-    # chunk_time = time.time()
-    # 
-    # if not results:
-    #     return QueryResponse(
-    #         answer="No relevant documents found.",
-    #         results=[],
-    #         timing={"embedding_time": chunk_time - start, "generation_time": 0}
-    #     )
-    # 
-    # context = [res["document"] for res in results]
-    # prompt = build_prompt(context, req.query)
-    # answer = user_llm.call_llm(prompt)
-    # end = time.time()
-    # 
-    # return QueryResponse(
-    #     answer=answer,
-    #     results=results,
-    #     timing={
-    #         "embedding_time": chunk_time - start,
-    #         "generation_time": end - chunk_time
-    #     }
-    # )
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,10 +1,12 @@
 # retriever/embedder.py
 
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import json
 import os
 
+from cache import LRUCache
+from retriever.embedding_cache import EmbeddingCache, encode_with_cache, normalize_query
+
 def load_documents(jsonl_path, long_chunk_size=300, short_chunk_size=550, overlap=50):
     """
     Load and chunk documents from a JSONL file or a directory containing JSONL files (recursively).
@@ -70,19 +72,62 @@ def load_documents(jsonl_path, long_chunk_size=300, short_chunk_size=550, overla
 
 
 class Embedder:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_dir=None, cache_size=500_000, model=None,
+                 query_cache_size=1024, query_cache_ttl=3600):
+        """
+        `cache_dir` enables the on-disk embedding cache; `model` accepts an already
+        loaded model (anything with a SentenceTransformer-style `encode`).
+        Query embeddings are kept in an in-memory LRU (`query_cache_size=0` disables it).
+        """
+        if model is None:
+            # Imported here so loading documents doesn't pull in torch
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model = model
+        self.cache = EmbeddingCache(cache_dir, max_entries=cache_size) if cache_dir else None
+        self.query_cache = LRUCache(query_cache_size, ttl=query_cache_ttl) if query_cache_size else None
 
     def encode_documents(self, docs, batch_size=32):
         """
         Encodes a list of document strings into embeddings.
         """
         texts = [doc['text'] for doc in docs]
+        if self.cache is not None:
+            return encode_with_cache(self.model, texts, self.cache, self.model_name, batch_size=batch_size,
+                                     normalize_embeddings=True, show_progress_bar=True)
         embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=True, normalize_embeddings=True)
         return np.array(embeddings)
     
     def encode_query(self, query):
         """
-        Encodes a single query string.
+        Encodes a single query string. Queries differing only in case or whitespace share
+        one cached embedding (of the normalized text).
         """
-        return self.model.encode([query], normalize_embeddings=True)[0]
+        return self.encode_queries([query])[0]
+
+    def encode_queries(self, queries, batch_size=64):
+        """
+        Encodes many queries with a single model.encode call; cached queries and repeats
+        within the batch are not re-encoded. Returns an (n, dim) array in input order.
+        """
+        if self.query_cache is None:
+            return np.asarray(self.model.encode(list(queries), batch_size=batch_size, normalize_embeddings=True))
+        keys = [normalize_query(query) for query in queries]
+        found = {}
+        for key in dict.fromkeys(keys):
+            embedding = self.query_cache.get(key)
+            if embedding is not None:
+                found[key] = embedding
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            computed = self.model.encode(missing, batch_size=batch_size, normalize_embeddings=True)
+            for key, embedding in zip(missing, np.asarray(computed, dtype=np.float32)):
+                embedding = embedding.copy()
+                embedding.setflags(write=False)
+                self.query_cache.set(key, embedding)
+                found[key] = embedding
+        return np.stack([found[key] for key in keys])
+
+    def query_cache_stats(self):
+        return self.query_cache.stats() if self.query_cache is not None else None
@@ -0,0 +1,242 @@
+# retriever/embedding_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per cache_dir
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of embeddings.
+
+    Vectors are rows of a memory-mapped float32 matrix (`vectors.f32`); a SQLite index
+    (`index.db`) maps sha256(model_name, normalize, text) to a row and tracks recency.
+    Once `max_entries` rows are in use the least recently used rows are overwritten.
+
+    Several processes (server workers, the reindex CLI) may share a cache_dir: reads and
+    writes hold an exclusive lock on `lock` and re-read the shared state inside it, so
+    two processes never hand out the same row.
+    """
+
+    def __init__(self, cache_dir, max_entries=500_000, initial_capacity=1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.initial_capacity = min(initial_capacity, max_entries)
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(cache_dir, "lock"), "a+")
+        self._index = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._index.execute("PRAGMA journal_mode = WAL")
+        self._index.execute('''
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            slot INTEGER NOT NULL UNIQUE,
+            last_used INTEGER NOT NULL
+        )
+        ''')
+        self._index.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._index.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._index.commit()
+
+        self.dim = None
+        self._capacity = 0
+        self._tick = 0
+        self._matrix = None
+        self._matrix_inode = None
+        with self._locked():
+            pass  # loads dim, capacity and tick, and maps the matrix if there is one
+
+    @staticmethod
+    def key(model_name, normalize, text):
+        return hashlib.sha256(f"{model_name}\0{int(bool(normalize))}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return self._index.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _open_matrix(self):
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+        self._matrix_inode = os.stat(self.vectors_path).st_ino
+
+    @contextmanager
+    def _locked(self):
+        """Hold the thread lock and the cross-process file lock, with state re-read from disk."""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows, growth or a reset written by another process since our last access."""
+        meta = dict(self._index.execute("SELECT name, value FROM meta"))
+        dim, capacity = meta.get("dim"), meta.get("capacity", 0)
+        self._tick = max(self._tick, meta.get("tick", 0))
+        inode = os.stat(self.vectors_path).st_ino if os.path.exists(self.vectors_path) else None
+        if dim == self.dim and capacity == self._capacity and inode == self._matrix_inode:
+            return
+        self.dim = dim
+        self._capacity = capacity
+        self._matrix = None
+        self._matrix_inode = None
+        if dim and capacity and inode is not None:
+            self._open_matrix()
+
+    def _save_meta(self):
+        self._index.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [("dim", self.dim), ("capacity", self._capacity), ("tick", self._tick)]
+        )
+
+    def _reset(self, dim):
+        """Start over with a new vector size (a different model was plugged in)."""
+        self._index.execute("DELETE FROM entries")
+        self.dim = dim
+        self._capacity = 0
+        self._matrix = None
+        self._matrix_inode = None
+        if os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+
+    def _grow(self, needed):
+        capacity = max(self._capacity, self.initial_capacity)
+        while capacity < needed:
+            capacity *= 2
+        capacity = min(capacity, self.max_entries)
+        if capacity == self._capacity:
+            return
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        # Extending the file leaves a sparse, zero-filled tail; existing rows keep their offsets
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._capacity = capacity
+        self._open_matrix()
+
+    def _slots(self, keys):
+        slots = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            slots.update(self._index.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part
+            ).fetchall())
+        return slots
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys present in the cache."""
+        if not keys:
+            return {}
+        with self._locked():
+            if self._matrix is None:
+                return {}
+            self._tick += 1
+            slots = self._slots(list(dict.fromkeys(keys)))
+            found = {key: np.array(self._matrix[slot]) for key, slot in slots.items()}
+            self._index.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", [(self._tick, key) for key in slots]
+            )
+            self._save_meta()
+            self._index.commit()
+        return found
+
+    def put_many(self, keys, vectors):
+        """Store vectors under keys, evicting least recently used rows if the cache is full."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        with self._locked():
+            if self.dim != vectors.shape[1]:
+                self._reset(vectors.shape[1])
+            self._tick += 1
+
+            # Last occurrence wins for duplicate keys. Keys already cached keep their row and are
+            # marked as just used so eviction below cannot pick them.
+            positions = {key: i for i, key in enumerate(keys)}
+            slots = self._slots(list(positions))
+            self._index.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?", [(self._tick, key) for key in slots]
+            )
+            fresh = [key for key in positions if key not in slots]
+            room = self.max_entries - len(slots)
+            fresh = fresh[max(len(fresh) - room, 0):]
+
+            # Rows 0..used-1 are always occupied: evicted rows are reused immediately
+            used = len(self)
+            self._grow(min(used + len(fresh), self.max_entries))
+            free = list(range(used, min(used + len(fresh), self._capacity)))
+
+            evict = len(fresh) - len(free)
+            if evict > 0:
+                victims = self._index.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)
+                ).fetchall()
+                self._index.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                free.extend(slot for _, slot in victims)
+
+            slots.update(zip(fresh, free))
+            for key, slot in slots.items():
+                self._matrix[slot] = vectors[positions[key]]
+            self._matrix.flush()
+
+            self._index.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, self._tick) for key, slot in slots.items()]
+            )
+            self._save_meta()
+            self._index.commit()
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._index.close()
+            self._lock_file.close()
+
+
+def encode_with_cache(model, texts, cache, model_name, batch_size=32, normalize_embeddings=True, **kwargs):
+    """
+    `model.encode` with a content-addressed cache in front: only texts that are not cached
+    (each distinct text once) reach the model, and results come back in input order.
+    """
+    keys = [cache.key(model_name, normalize_embeddings, text) for text in texts]
+    found = cache.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        computed = model.encode(
+            list(missing.values()), batch_size=batch_size, normalize_embeddings=normalize_embeddings, **kwargs
+        )
+        computed = np.asarray(computed, dtype=np.float32)
+        cache.put_many(list(missing), computed)
+        found.update(zip(missing, computed))
+
+    if not keys:
+        return np.empty((0, cache.dim or 0), dtype=np.float32)
+    return np.stack([found[key] for key in keys])
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text):
+    """Cache key for a query: trimmed, case-folded, runs of whitespace collapsed."""
+    return _WHITESPACE.sub(" ", text).strip().casefold()
@@ -0,0 +1,70 @@
+# retriever/hydrate.py
+
+import sqlite3
+
+from cache import LRUCache
+from retriever.sql_emb import document_text
+
+
+# Fields kept in a slim vector payload; everything else is rebuilt from the articles table
+SLIM_FIELDS = ("chunk_id", "article_id", "start", "end")
+
+
+def slim_document(doc):
+    return {field: doc.get(field) for field in SLIM_FIELDS}
+
+
+class ChunkHydrator:
+    """
+    Turns slim payloads ({chunk_id, article_id, start, end}) back into full documents.
+    Hits not in the LRU of hot chunks are fetched with one `WHERE id IN (...)` query.
+    Entries expire after `ttl` seconds so edited articles are picked up.
+    """
+
+    def __init__(self, db_path='database.db', cache_size=4096, ttl=300):
+        self.db_path = db_path
+        self.cache = LRUCache(cache_size, ttl=ttl)
+
+    def _fetch(self, article_ids):
+        placeholders = ",".join("?" * len(article_ids))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT id, title, content FROM articles WHERE id IN ({placeholders})", article_ids
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row_id: (title, content) for row_id, title, content in rows}
+
+    def hydrate(self, documents):
+        """
+        Full documents for the given slim ones, in order. Documents that already carry
+        their text pass through; chunks whose article no longer exists come back as None.
+        """
+        hydrated = [doc if "text" in doc else self.cache.get(str(doc["chunk_id"])) for doc in documents]
+        missing = sorted({doc["article_id"] for doc, full in zip(documents, hydrated) if full is None})
+        if not missing:
+            return hydrated
+
+        articles = self._fetch(missing)
+        for i, doc in enumerate(documents):
+            if hydrated[i] is not None or doc["article_id"] not in articles:
+                continue
+            title, content = articles[doc["article_id"]]
+            full = dict(doc, title=title, text=document_text(title, content, doc.get("start") or 0, doc.get("end")))
+            self.cache.set(str(doc["chunk_id"]), full)
+            hydrated[i] = full
+        return hydrated
+
+    def batch(self, groups):
+        """Hydrate several queries' hit lists with one lookup; see __call__."""
+        documents = iter(self.hydrate([hit["document"] for hits in groups for hit in hits]))
+        hydrated = []
+        for hits in groups:
+            pairs = [(hit, next(documents)) for hit in hits]
+            hydrated.append([dict(hit, document=doc) for hit, doc in pairs if doc is not None])
+        return hydrated
+
+    def __call__(self, hits):
+        """Hydrate [{"score", "document"}] search hits, dropping hits whose article is gone."""
+        return self.batch([hits])[0]
@@ -0,0 +1,194 @@
+# retriever/local_store.py
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from retriever.store import VectorStore, no_results
+
+
+# How often a query checks whether another process (e.g. the reindex CLI) replaced the files
+RELOAD_CHECK_INTERVAL = 1.0
+# Rows copied per step when rewriting the matrix, so a rewrite never holds it all in memory
+COPY_BLOCK_ROWS = 65536
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process exact vector search. Normalized embeddings are kept in a memory-mapped
+    `.npy` matrix (float32, or float16 to halve memory) next to a JSONL file of the
+    matching documents; a query is one matrix-vector product plus `argpartition`.
+
+    Writes build new files and swap them in with `os.replace`, so readers (here or in
+    other processes) always see a consistent pair. A store notices files replaced by
+    another process within RELOAD_CHECK_INTERVAL seconds and maps the new ones.
+    """
+
+    def __init__(self, path="vector_index", dtype="float32"):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.documents_path = os.path.join(path, "documents.jsonl")
+        self._lock = threading.Lock()
+        # (matrix, documents, {str(chunk_id): row}) swapped as one tuple so readers never see a mix
+        self._state = (None, [], {})
+        # (inode, mtime) of both files as last loaded or written
+        self._signature = None
+        self._next_check = 0.0
+        if self.exists():
+            self._load()
+
+    def exists(self):
+        return os.path.exists(self.vectors_path) and os.path.exists(self.documents_path)
+
+    def __len__(self):
+        return len(self._state[1])
+
+    @property
+    def documents(self):
+        return self._state[1]
+
+    def _file_signature(self):
+        try:
+            return tuple((st.st_ino, st.st_mtime_ns) for st in map(os.stat, (self.vectors_path, self.documents_path)))
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        signature = self._file_signature()
+        matrix = np.load(self.vectors_path, mmap_mode="r")
+        with open(self.documents_path, "r", encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f]
+        if len(matrix) != len(documents):
+            # Caught between another process's two os.replace calls; try again on the next check
+            return
+        self._set(matrix, documents)
+        self._signature = signature
+
+    def _refresh(self):
+        """Map the files again if another process has replaced them since we loaded them."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return
+        with self._lock:
+            if self._file_signature() != self._signature:
+                self._load()
+
+    def _set(self, matrix, documents):
+        self._state = (matrix, documents, {str(doc["chunk_id"]): i for i, doc in enumerate(documents)})
+
+    def _commit(self, documents):
+        """Write the documents next to the already written vectors tmp file, swap both in, remap."""
+        with open(self.documents_path + ".tmp", "w", encoding="utf-8") as f:
+            for doc in documents:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        os.replace(self.vectors_path + ".tmp.npy", self.vectors_path)
+        os.replace(self.documents_path + ".tmp", self.documents_path)
+        self._set(np.load(self.vectors_path, mmap_mode="r"), documents)
+        self._signature = self._file_signature()
+
+    def _save(self, matrix, documents):
+        """Write both files atomically, then switch to a memory map of the new matrix."""
+        os.makedirs(self.path, exist_ok=True)
+        np.save(self.vectors_path + ".tmp.npy", np.ascontiguousarray(matrix, dtype=self.dtype))
+        self._commit(documents)
+
+    def create(self, dim):
+        with self._lock:
+            self._save(np.empty((0, dim), dtype=self.dtype), [])
+
+    def add(self, documents, embeddings):
+        self.update(documents, embeddings)
+
+    def delete(self, chunk_ids):
+        self.update([], [], chunk_ids)
+
+    def update(self, documents, embeddings, delete_ids=()):
+        """
+        Upsert `documents` and drop `delete_ids` in a single rewrite. Kept rows are copied
+        block by block from the current memory map straight into the new file, so memory
+        use stays flat however large the index is.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            current, stored, rows = self._state
+            if current is None:
+                raise RuntimeError("Call create() before adding documents")
+            # Same chunk id: replace in place, like a Qdrant upsert; an upsert beats a delete
+            replaced, appended = {}, {}
+            for doc, emb in zip(documents, embeddings):
+                row = rows.get(str(doc["chunk_id"]))
+                if row is None:
+                    appended[str(doc["chunk_id"])] = (doc, emb)
+                else:
+                    replaced[row] = (doc, emb)
+            drop = {rows[str(c)] for c in delete_ids if str(c) in rows} - set(replaced)
+            if not (replaced or appended or drop):
+                return
+
+            keep = np.array([i for i in range(len(stored)) if i not in drop], dtype=np.int64)
+            dim = current.shape[1]
+            os.makedirs(self.path, exist_ok=True)
+            matrix = np.lib.format.open_memmap(
+                self.vectors_path + ".tmp.npy", mode="w+", dtype=self.dtype, shape=(len(keep) + len(appended), dim)
+            )
+            for i in range(0, len(keep), COPY_BLOCK_ROWS):
+                block = keep[i:i + COPY_BLOCK_ROWS]
+                matrix[i:i + len(block)] = current[block]
+            new_documents = [stored[i] for i in keep]
+            positions = np.searchsorted(keep, list(replaced)) if replaced else []
+            for position, (doc, emb) in zip(positions, replaced.values()):
+                matrix[position] = emb
+                new_documents[position] = doc
+            for i, (doc, emb) in enumerate(appended.values(), start=len(keep)):
+                matrix[i] = emb
+                new_documents.append(doc)
+            matrix.flush()
+            del matrix
+            self._commit(new_documents)
+
+    def _scores(self, matrix, queries):
+        """Cosine scores of normalized rows against (n, dim) float32 queries -> (n, rows)."""
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+        # float16 storage: upcast in blocks so float32 accumulation never copies the whole matrix
+        block = 65536
+        return np.hstack([queries @ np.asarray(matrix[i:i + block], dtype=np.float32).T
+                          for i in range(0, len(matrix), block)])
+
+    def _top(self, scores, documents, top_k, threshold):
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        filtered = [
+            {"score": float(scores[i]), "document": documents[i]}
+            for i in top
+            if scores[i] >= threshold
+        ]
+        return filtered if filtered else no_results(threshold)
+
+    def query(self, query_embedding, top_k=3, threshold=0.1):
+        return self.query_batch(np.asarray(query_embedding)[None, :], top_k=top_k, threshold=threshold)[0]
+
+    def query_batch(self, query_embeddings, top_k=3, threshold=0.1):
+        """All queries are scored with a single (n, dim) x (dim, rows) matrix product."""
+        self._refresh()
+        matrix, documents, _ = self._state
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if matrix is None or not documents:
+            return [no_results(threshold) for _ in range(len(queries))]
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = self._scores(matrix, queries / np.where(norms == 0, 1, norms))
+        return [self._top(row, documents, top_k, threshold) for row in scores]
@@ -0,0 +1,108 @@
+# retriever/reindex.py
+
+import hashlib
+import sqlite3
+import time
+
+from retriever.snapshot import corpus_fingerprint, update_snapshot
+from retriever.sql_emb import load_documents
+from retriever.store import get_vector_store
+
+
+def content_hash(text, model_name):
+    """Hash of a chunk as embedded by a given model; a model change invalidates every chunk."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+def ensure_manifest(conn):
+    """Table recording which chunks are in the vector index and the hash they were embedded from."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS vector_manifest (
+        chunk_id TEXT PRIMARY KEY,
+        article_id INTEGER,
+        content_hash TEXT NOT NULL
+    )
+    ''')
+
+
+def reindex(embedder, db_path='database.db', store=None, full=False, snapshot_path=None):
+    """
+    Bring the vector index (Qdrant unless another VectorStore is given) in line with the
+    articles table, touching only what changed: new or edited chunks are embedded and
+    upserted by chunk id, chunks that no longer exist are deleted. With `full=True` every
+    chunk is re-embedded. With `snapshot_path` the embedding snapshot (see
+    retriever.snapshot) is rewritten to match, so a restart can rebuild the index from it.
+    Returns counts of added/updated/removed/unchanged chunks.
+    """
+    if store is None:
+        store = get_vector_store("qdrant")
+    start = time.time()
+
+    # Taken before reading the articles: an edit racing this run makes the snapshot look stale, never current
+    fingerprint = corpus_fingerprint(db_path, embedder.model_name) if snapshot_path else None
+    documents = load_documents(db_path)
+    hashes = {str(doc['chunk_id']): content_hash(doc['text'], embedder.model_name) for doc in documents}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_manifest(conn)
+
+        if full or not store.exists():
+            conn.execute("DELETE FROM vector_manifest")
+            manifest = {}
+        else:
+            manifest = dict(conn.execute("SELECT chunk_id, content_hash FROM vector_manifest"))
+
+        changed = [doc for doc in documents if manifest.get(str(doc['chunk_id'])) != hashes[str(doc['chunk_id'])]]
+        removed = [chunk_id for chunk_id in manifest if chunk_id not in hashes]
+
+        embeddings = embedder.encode_documents(changed) if changed else []
+        if manifest:
+            if changed or removed:
+                store.update(changed, embeddings, removed)
+        elif changed:
+            # Full build: Qdrant fills a new collection version and swaps it in when done
+            store.rebuild(changed, embeddings)
+
+        # Record progress only after the index accepted the writes, so a failed run is simply redone
+        conn.executemany(
+            "INSERT OR REPLACE INTO vector_manifest (chunk_id, article_id, content_hash) VALUES (?, ?, ?)",
+            [(str(doc['chunk_id']), doc['article_id'], hashes[str(doc['chunk_id'])]) for doc in changed]
+        )
+        conn.executemany("DELETE FROM vector_manifest WHERE chunk_id = ?", [(chunk_id,) for chunk_id in removed])
+        conn.commit()
+    finally:
+        conn.close()
+
+    snapshot = None
+    if snapshot_path:
+        snapshot = update_snapshot(snapshot_path, documents, changed, embeddings, embedder.model_name, fingerprint)
+
+    added = sum(1 for doc in changed if str(doc['chunk_id']) not in manifest)
+    return {
+        "added": added,
+        "updated": len(changed) - added,
+        "removed": len(removed),
+        "unchanged": len(documents) - len(changed),
+        "snapshot": snapshot,
+        "seconds": round(time.time() - start, 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from retriever.sql_emb import Embedder
+
+    parser = argparse.ArgumentParser(description="Incrementally re-embed changed articles into the vector index.")
+    parser.add_argument("--db", default="database.db")
+    parser.add_argument("--backend", default="qdrant", choices=["qdrant", "numpy"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--cache-dir", default="embedding_cache", help="on-disk embedding cache ('' to disable)")
+    parser.add_argument("--snapshot-dir", default="embedding_snapshot",
+                        help="embedding snapshot to keep in sync ('' to disable)")
+    parser.add_argument("--full", action="store_true", help="re-embed every chunk")
+    args = parser.parse_args()
+
+    embedder = Embedder(model_name=args.model, cache_dir=args.cache_dir or None)
+    print(reindex(embedder, db_path=args.db, store=get_vector_store(args.backend), full=args.full,
+                  snapshot_path=args.snapshot_dir or None))
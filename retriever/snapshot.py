@@ -0,0 +1,128 @@
+# retriever/snapshot.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+
+
+def corpus_fingerprint(db_path, model_name, long_chunk_size=300, short_chunk_size=550, overlap=50):
+    """
+    Hash of everything the document embeddings depend on: the articles' text, the
+    chunking parameters and the model. Reads the articles table directly, so checking it
+    costs one scan and no chunking or encoding.
+    """
+    digest = hashlib.sha256(f"{model_name}\0{long_chunk_size}\0{short_chunk_size}\0{overlap}".encode("utf-8"))
+    conn = sqlite3.connect(db_path)
+    try:
+        for row_id, title, content in conn.execute("SELECT id, title, content FROM articles ORDER BY id"):
+            digest.update(f"\0{row_id}\0{title}\0{content or ''}".encode("utf-8"))
+    finally:
+        conn.close()
+    return digest.hexdigest()
+
+
+def snapshot_paths(path):
+    return (os.path.join(path, "embeddings.npy"),
+            os.path.join(path, "chunks.jsonl"),
+            os.path.join(path, "meta.json"))
+
+
+def read_meta(path):
+    """The snapshot's meta.json, or None if there is no complete snapshot at `path`."""
+    vectors_path, chunks_path, meta_path = snapshot_paths(path)
+    if not all(os.path.exists(p) for p in (vectors_path, chunks_path, meta_path)):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_snapshot(path, documents, embeddings, model_name, fingerprint):
+    """
+    Write the embedding matrix (`embeddings.npy`), the chunk manifest (`chunks.jsonl`,
+    one document per matrix row) and `meta.json`. Each file is replaced atomically and
+    meta.json goes last, so a crash mid-write leaves a snapshot that fails validation.
+    """
+    vectors_path, chunks_path, meta_path = snapshot_paths(path)
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if len(documents) != len(embeddings):
+        raise ValueError(f"{len(documents)} documents but {len(embeddings)} embeddings")
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    np.save(vectors_path + ".tmp.npy", embeddings)
+    with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+        for doc in documents:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    os.replace(vectors_path + ".tmp.npy", vectors_path)
+    os.replace(chunks_path + ".tmp", chunks_path)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "model_name": model_name,
+        "fingerprint": fingerprint,
+        "count": len(documents),
+        "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        "created_at": time.time(),
+    }
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+
+def load_snapshot(path, model_name, fingerprint=None):
+    """
+    (documents, embeddings) from the snapshot at `path` if it was written by `model_name`
+    for this corpus `fingerprint` (any corpus when None), else None. The matrix is a
+    read-only memory map, so its pages are loaded on demand and shared by every process
+    that maps the same file.
+    """
+    meta = read_meta(path)
+    if meta is None or meta.get("format") != SNAPSHOT_FORMAT or meta.get("model_name") != model_name:
+        return None
+    if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+        return None
+
+    vectors_path, chunks_path, _ = snapshot_paths(path)
+    embeddings = np.load(vectors_path, mmap_mode="r")
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        documents = [json.loads(line) for line in f]
+    if len(documents) != meta["count"] or embeddings.shape[0] != meta["count"]:
+        return None
+    return documents, embeddings
+
+
+def update_snapshot(path, documents, changed, embeddings, model_name, fingerprint):
+    """
+    Rewrite the snapshot for the current `documents` after an incremental reindex:
+    `changed` documents take the new `embeddings`, the others reuse their rows from the
+    existing snapshot. Returns False, writing nothing, if an unchanged chunk has no
+    matching row to reuse.
+    """
+    meta = read_meta(path)
+    if not changed and meta is not None and meta.get("fingerprint") == fingerprint \
+            and meta.get("model_name") == model_name:
+        return True
+
+    fresh = {str(doc["chunk_id"]): emb for doc, emb in zip(changed, embeddings)}
+    previous = load_snapshot(path, model_name) or ([], None)
+    old_rows = {str(doc["chunk_id"]): (i, doc["text"]) for i, doc in enumerate(previous[0])}
+
+    rows = []
+    for doc in documents:
+        key = str(doc["chunk_id"])
+        if key in fresh:
+            rows.append(fresh[key])
+        elif key in old_rows and old_rows[key][1] == doc["text"]:
+            rows.append(previous[1][old_rows[key][0]])
+        else:
+            return False
+    save_snapshot(path, documents, np.array(rows, dtype=np.float32), model_name, fingerprint)
+    return True
@@ -1,22 +1,34 @@
 import os
 import sqlite3
-import numpy as np
-from sentence_transformers import SentenceTransformer
+
+# Embedder lives in retriever.embedder; re-exported for callers that load documents from here
+from retriever.embedder import Embedder
+
+def chunk_spans(n_words, size, overlap):
+    """(start, end) word offsets of the overlapping chunks chunk_text produces"""
+    return [(i, min(i + size, n_words)) for i in range(0, n_words, size - overlap)]
 
 def chunk_text(text, size, overlap):
     words = text.split()
-    chunks = []
-    for i in range(0, len(words), size - overlap):
-        chunk = " ".join(words[i:i + size])
-        if chunk:
-            chunks.append(chunk)
-    return chunks
+    return [" ".join(words[start:end]) for start, end in chunk_spans(len(words), size, overlap)]
+
+def document_text(title, content, start=0, end=None):
+    """
+    Text of a document as load_documents builds it. `end=None` is the whole article,
+    otherwise the words [start, end) of title + content. Used to rebuild chunk text
+    from the articles table instead of storing it in the vector index.
+    """
+    full_text = f"{title}\n{content}"
+    if end is None:
+        return full_text
+    return " ".join(full_text.split()[start:end])
 
 def load_documents(db_path='database.db', long_chunk_size=300, short_chunk_size=550, overlap=50):
     """
     Load and chunk articles from a SQLite database.
     Short articles are kept whole, long ones are split into overlapping chunks.
-    Returns a list of dicts with 'title', 'chunk_id', and 'text'.
+    Returns a list of dicts with 'title', 'chunk_id', 'article_id', 'text' and the word
+    offsets 'start'/'end' of the text within the article ('end' is None for whole articles).
     """
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
@@ -31,33 +43,28 @@ def load_documents(db_path='database.db', long_chunk_size=300, short_chunk_size=
         if not content:
             continue
 
-        full_text = f"{title}\n{content}"
+        full_text = document_text(title, content)
 
         if word_count < short_chunk_size:
             all_documents.append({
                 'title': title,
                 'chunk_id': row_id,
+                'article_id': row_id,
+                'start': 0,
+                'end': None,
                 'text': full_text
             })
         else:
-            chunks = chunk_text(full_text, long_chunk_size, overlap)
-            for idx, chunk in enumerate(chunks):
+            words = full_text.split()
+            spans = chunk_spans(len(words), long_chunk_size, overlap)
+            for idx, (start, end) in enumerate(spans):
                 all_documents.append({
                     'title': title,
                     'chunk_id': f"{row_id}.{idx:02d}",
-                    'text': chunk
+                    'article_id': row_id,
+                    'start': start,
+                    'end': end,
+                    'text': " ".join(words[start:end])
                 })
 
     return all_documents
-
-class Embedder:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
-
-    def encode_documents(self, docs, batch_size=32):
-        texts = [doc['text'] for doc in docs]
-        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=True, normalize_embeddings=True)
-        return np.array(embeddings)
-
-    def encode_query(self, query):
-        return self.model.encode([query], normalize_embeddings=True)[0]
@@ -0,0 +1,63 @@
+# retriever/store.py
+
+
+class VectorStore:
+    """
+    Interface shared by the vector index backends. Mirrors the function API of
+    retriever.vector_store (create_qdrant_collection / add_documents_to_index / query_index).
+    Documents are chunk dicts as produced by load_documents; point identity is the chunk_id.
+    """
+
+    def exists(self) -> bool:
+        raise NotImplementedError
+
+    def create(self, dim):
+        """Create (or empty) the index for vectors of size `dim`."""
+        raise NotImplementedError
+
+    def add(self, documents, embeddings):
+        """Insert or replace documents with their embeddings."""
+        raise NotImplementedError
+
+    def rebuild(self, documents, embeddings):
+        """Replace the whole index with these documents. Backends that can build aside override this."""
+        self.create(len(embeddings[0]))
+        self.add(documents, embeddings)
+
+    def delete(self, chunk_ids):
+        raise NotImplementedError
+
+    def update(self, documents, embeddings, delete_ids=()):
+        """`add` then `delete` in one call. Backends that rewrite their storage override this to do it once."""
+        if len(documents):
+            self.add(documents, embeddings)
+        if delete_ids:
+            self.delete(delete_ids)
+
+    def query(self, query_embedding, top_k=3, threshold=0.1):
+        """Return up to top_k [{"score", "document"}] with score >= threshold."""
+        raise NotImplementedError
+
+    def query_batch(self, query_embeddings, top_k=3, threshold=0.1):
+        """One `query` result per row of `query_embeddings`. Backends override this to search in one pass."""
+        return [self.query(query_embedding, top_k=top_k, threshold=threshold) for query_embedding in query_embeddings]
+
+
+def no_results(threshold):
+    """Placeholder hit returned when nothing clears the threshold"""
+    return [{"score": threshold,
+             "document": {"title": "NA",
+                          "chunk_id": 0,
+                          "text": "No relevant documents found."}
+             }]
+
+
+def get_vector_store(backend="qdrant", **kwargs):
+    """Build a backend by name. Imports are deferred so unused backends need not be installed."""
+    if backend == "qdrant":
+        from retriever.vector_store import QdrantVectorStore
+        return QdrantVectorStore(**kwargs)
+    if backend == "numpy":
+        from retriever.local_store import NumpyVectorStore
+        return NumpyVectorStore(**kwargs)
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -1,40 +1,224 @@
 # retriever/vector_store.py
+import re
+import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import (
+    Distance, VectorParams, Batch, PointIdsList,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation, SearchRequest,
+)
+
+from retriever.hydrate import ChunkHydrator, slim_document
+from retriever.store import VectorStore, no_results
 
 
 # Connect to Qdrant
 client = QdrantClient(host="localhost", port=6333)  
 # client = QdrantClient(url="YOUR_QDRANT_URL", api_key="YOUR_API_KEY")
 
+# Queries read this name. It is an alias for the live `documents_v{n}` collection, so a
+# rebuild fills a new version in the background and then switches the alias atomically.
 COLLECTION_NAME = "documents"
+VERSION_PATTERN = re.compile(rf"^{COLLECTION_NAME}_v(\d+)$")
+# Superseded versions kept after a switch, for rolling back
+RETAIN_VERSIONS = 1
+
+# Ingestion tuning: points per upsert request, requests in flight, retries per batch
+UPSERT_BATCH_SIZE = 256
+UPSERT_PARALLELISM = 4
+UPSERT_RETRIES = 3
+UPSERT_BACKOFF = 0.5
+# Statuses worth retrying: timeouts, rate limiting, server-side failures
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Store only chunk_id/article_id/offsets in payloads; text is hydrated from SQLite at query time
+SLIM_PAYLOADS = False
+
+# Point ids are derived from chunk ids, so re-indexing a chunk overwrites its point
+POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "health-bot")
+
+def point_id(chunk_id) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, str(chunk_id)))
 
 def collection_exists(client: QdrantClient = client, collection_name: str = COLLECTION_NAME) -> bool:
-    return collection_name in [c.name for c in client.get_collections().collections]
+    if collection_name in [c.name for c in client.get_collections().collections]:
+        return True
+    return collection_name in [a.alias_name for a in client.get_aliases().aliases]
+
+def version_name(version: int) -> str:
+    return f"{COLLECTION_NAME}_v{version}"
 
-def create_qdrant_collection(dim):
+def collection_versions(client: QdrantClient = client) -> list:
+    """Version numbers of the `documents_v{n}` collections, oldest first."""
+    versions = []
+    for c in client.get_collections().collections:
+        match = VERSION_PATTERN.match(c.name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+def live_collection(client: QdrantClient = client):
+    """Name of the collection the alias currently points to, or None."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_NAME:
+            return alias.collection_name
+    return None
+
+def create_collection_version(dim, client: QdrantClient = client) -> str:
     """
-    Creates or recreates a Qdrant collection for storing embeddings.
+    Creates the next, empty `documents_v{n}` collection. Queries are unaffected until
+    `switch_alias` points at it.
     """
-    client.recreate_collection(
-        collection_name=COLLECTION_NAME,
+    versions = collection_versions(client)
+    name = version_name(versions[-1] + 1 if versions else 1)
+    client.create_collection(
+        collection_name=name,
         vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
     )
+    return name
 
-def add_documents_to_index(documents, embeddings):
+def switch_alias(collection_name, client: QdrantClient = client):
     """
-    Adds documents & their embeddings to Qdrant.
+    Atomically points the `documents` alias at `collection_name`: the delete and create
+    operations are applied in one request, so every query sees the old or the new version.
     """
-    points = [
-        PointStruct(id=str(uuid.uuid4()), vector=emb.tolist(), payload={"document": doc})
-        for doc, emb in zip(documents, embeddings)
-    ]
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
+    operations = []
+    if live_collection(client) is not None:
+        operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=COLLECTION_NAME)))
+    elif COLLECTION_NAME in [c.name for c in client.get_collections().collections]:
+        # Indexes built before versioning hold a real collection under the alias name; it
+        # has to go before the alias can exist. This one-time migration is not gap-free.
+        client.delete_collection(collection_name=COLLECTION_NAME)
+    operations.append(CreateAliasOperation(
+        create_alias=CreateAlias(collection_name=collection_name, alias_name=COLLECTION_NAME)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+def garbage_collect_versions(client: QdrantClient = client, keep=None) -> list:
+    """
+    Drops versions older than the live one, except the newest `keep` of them. Versions newer
+    than the live one may still be building and are left alone. Returns the dropped names.
+    """
+    keep = RETAIN_VERSIONS if keep is None else keep
+    live = live_collection(client)
+    match = VERSION_PATTERN.match(live) if live else None
+    if match is None:
+        return []
+    older = [v for v in collection_versions(client) if v < int(match.group(1))]
+    dropped = [version_name(v) for v in older[:max(len(older) - keep, 0)]]
+    for name in dropped:
+        client.delete_collection(collection_name=name)
+    return dropped
+
+def create_qdrant_collection(dim, client: QdrantClient = client):
+    """
+    Creates an empty collection and makes it live. Replaces the previous version through
+    the alias instead of recreating it in place.
+    """
+    name = create_collection_version(dim, client=client)
+    switch_alias(name, client=client)
+    garbage_collect_versions(client)
+    return name
+
+def is_transient(exc) -> bool:
+    """
+    Connection failures (which the HTTP client wraps in ResponseHandlingException),
+    timeouts and retryable statuses. Anything else, e.g. a 400 for a vector of the wrong
+    dimension, fails the same way on every attempt.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError, ResponseHandlingException)):
+        return True
+    return isinstance(exc, UnexpectedResponse) and exc.status_code in TRANSIENT_STATUS
 
-def query_index(query_embedding, top_k=3, threshold=0.1):
+def upsert_batch(batch, client: QdrantClient = client, retries=None, backoff=None,
+                 collection_name=COLLECTION_NAME):
+    """
+    Upserts one Batch, retrying transient failures with exponential backoff. Point ids are
+    deterministic, so a retried (or re-run) batch overwrites instead of duplicating.
+    """
+    retries = UPSERT_RETRIES if retries is None else retries
+    backoff = UPSERT_BACKOFF if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            client.upsert(collection_name=collection_name, points=batch, wait=True)
+            return len(batch.ids)
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def add_documents_to_index(documents, embeddings, client: QdrantClient = client,
+                           batch_size=UPSERT_BATCH_SIZE, parallel=UPSERT_PARALLELISM,
+                           collection_name=COLLECTION_NAME, slim=None):
+    """
+    Adds documents & their embeddings to Qdrant, `batch_size` points per request with at
+    most `parallel` requests in flight. Each batch's vectors are converted with one
+`tolist()` call; handing pydantic the array slice makes it validate every element.
+    With `slim` the payload keeps only the fields needed to hydrate the chunk later.
+    Returns the number of points written.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    slim = SLIM_PAYLOADS if slim is None else slim
+
+    def batches():
+        for start in range(0, len(documents), batch_size):
+            docs = documents[start:start + batch_size]
+            yield Batch(
+                ids=[point_id(doc["chunk_id"]) for doc in docs],
+                vectors=embeddings[start:start + len(docs)].tolist(),
+                payloads=[{"document": slim_document(doc) if slim else doc} for doc in docs]
+            )
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="qdrant-upsert") as executor:
+        # Only `parallel` batches are built and in flight at a time, so memory stays flat
+        in_flight = deque()
+        for batch in batches():
+            if len(in_flight) >= parallel:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.remove(future)
+                    written += future.result()
+            in_flight.append(executor.submit(upsert_batch, batch, client, collection_name=collection_name))
+        for future in in_flight:
+            written += future.result()
+    return written
+
+def rebuild_collection(documents, embeddings, client: QdrantClient = client, keep=None, slim=None) -> str:
+    """
+    Blue/green rebuild: fills a new `documents_v{n}` while queries keep hitting the live
+    version, switches the alias once every point is written, then drops old versions.
+    A failed build is deleted and the live version stays in place.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    name = create_collection_version(embeddings.shape[1], client=client)
+    try:
+        add_documents_to_index(documents, embeddings, client=client, collection_name=name, slim=slim)
+    except Exception:
+        client.delete_collection(collection_name=name)
+        raise
+    switch_alias(name, client=client)
+    garbage_collect_versions(client, keep=keep)
+    return name
+
+def delete_documents_from_index(chunk_ids, client: QdrantClient = client):
+    """
+    Removes the points for the given chunk ids.
+    """
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=PointIdsList(points=[point_id(chunk_id) for chunk_id in chunk_ids])
+    )
+
+def query_index(query_embedding, top_k=3, threshold=0.1, client: QdrantClient = client, hydrator=None):
     """
     Queries Qdrant and returns top_k most similar documents.
+    Slim payloads are turned back into full documents by `hydrator` (a ChunkHydrator).
     """
     search_result = client.search(
         collection_name=COLLECTION_NAME,
@@ -46,10 +230,57 @@ def query_index(query_embedding, top_k=3, threshold=0.1):
         for r in search_result
         if r.score >= threshold
     ]
+    if hydrator is not None and filtered:
+        filtered = hydrator(filtered)
     print(filtered)
-    return filtered  if filtered else [{"score": threshold, 
-                                       "document": {"title": "NA",
-                                                    "chunk_id": 0,
-                                                    "text": "No relevant documents found."}
-                                                    }]
+    return filtered if filtered else no_results(threshold)
+
+def query_index_batch(query_embeddings, top_k=3, threshold=0.1, client: QdrantClient = client, hydrator=None):
+    """
+    Searches for every row of `query_embeddings` in one search_batch request. Slim hits of
+    all queries are hydrated together. Returns one query_index-style list per query.
+    """
+    search_results = client.search_batch(
+        collection_name=COLLECTION_NAME,
+        requests=[SearchRequest(vector=np.asarray(q, dtype=np.float32).tolist(), limit=top_k, with_payload=True)
+                  for q in query_embeddings]
+    )
+    groups = [
+        [{"score": r.score, "document": r.payload["document"]} for r in result if r.score >= threshold]
+        for result in search_results
+    ]
+    if hydrator is not None:
+        groups = hydrator.batch(groups)
+    return [hits if hits else no_results(threshold) for hits in groups]
+
+
+class QdrantVectorStore(VectorStore):
+    """VectorStore backed by the Qdrant functions above."""
+
+    def __init__(self, client: QdrantClient = client, slim=None, db_path='database.db'):
+        self.client = client
+        self.slim = SLIM_PAYLOADS if slim is None else slim
+        self.hydrator = ChunkHydrator(db_path) if self.slim else None
+
+    def exists(self):
+        return collection_exists(self.client)
+
+    def create(self, dim):
+        create_qdrant_collection(dim, client=self.client)
+
+    def rebuild(self, documents, embeddings):
+        rebuild_collection(documents, embeddings, client=self.client, slim=self.slim)
+
+    def add(self, documents, embeddings):
+        add_documents_to_index(documents, embeddings, client=self.client, slim=self.slim)
+
+    def delete(self, chunk_ids):
+        delete_documents_from_index(chunk_ids, client=self.client)
+
+    def query(self, query_embedding, top_k=3, threshold=0.1):
+        return query_index(query_embedding, top_k=top_k, threshold=threshold, client=self.client,
+                           hydrator=self.hydrator)
 
+    def query_batch(self, query_embeddings, top_k=3, threshold=0.1):
+        return query_index_batch(query_embeddings, top_k=top_k, threshold=threshold, client=self.client,
+                                 hydrator=self.hydrator)
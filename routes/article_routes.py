@@ -1,12 +1,22 @@
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Union
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import base64
+import codecs
+import csv
+import hashlib
+import io
+import json
+import re
 import sqlite3
-from contextlib import contextmanager
 
-router = APIRouter(prefix="/articles", tags=["articles"])
+from cache import LRUCache
+from db_pool import ConnectionPool, get_pool
 
-DATABASE = 'database.db'
+router = APIRouter(prefix="/articles", tags=["articles"])
 
 # Pydantic models for request/response validation
 class ArticleBase(BaseModel):
@@ -29,179 +39,753 @@ class Article(ArticleBase):
     word_count: int
     source_name: Optional[str] = None
     source_url: Optional[str] = None
+    version: Optional[int] = None
+    updated_at: Optional[str] = None
     
     class Config:
         from_attributes = True
 
-# Database connection management
-@contextmanager
-def get_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+class ArticleSummary(BaseModel):
+    """Lightweight listing row; returned for fields=summary and other projections"""
+    id: int
+    title: Optional[str] = None
+    published_date: Optional[str] = None
+    word_count: Optional[int] = None
+    source_id: Optional[int] = None
+    source_name: Optional[str] = None
+    snippet: Optional[str] = None
+
+SNIPPET_LENGTH = 200
+
+# Columns selectable through ?fields=, mapped to the SQL that produces them
+ARTICLE_FIELDS = {
+    'id': 'a.id',
+    'title': 'a.title',
+    'content': 'a.content',
+    'snippet': f'substr(a.content, 1, {SNIPPET_LENGTH})',
+    'published_date': 'a.published_date',
+    'word_count': 'a.word_count',
+    'source_id': 'a.source_id',
+    'source_name': 's.name',
+    'source_url': 's.url',
+    'version': 'a.version',
+    'updated_at': 'a.updated_at',
+}
+SUMMARY_FIELDS = ['id', 'title', 'published_date', 'word_count', 'source_id', 'source_name']
+
+def parse_fields(fields):
+    """Resolve ?fields= into a list of known field names (id always included)"""
+    if fields.strip() == 'summary':
+        return list(SUMMARY_FIELDS)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in ARTICLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [f for f in dict.fromkeys(requested) if f != 'id']
+
+def fts_query(search):
+    """Turn free text into an FTS5 MATCH expression: every word must match as a prefix."""
+    terms = re.findall(r'\w+', search)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def encode_cursor(published_date, article_id):
+    """Opaque keyset cursor pointing just past the given (published_date, id)."""
+    raw = json.dumps([published_date, article_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        published_date, article_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(article_id, int) or not (published_date is None or isinstance(published_date, str)):
+            raise ValueError(cursor)
+        return published_date, article_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# ============ HTTP CACHING ============
+
+# Rendered JSON bodies. Single articles are keyed by id and re-validated against the row's
+# version on every hit; listings are keyed by query string, dropped on any write from this
+# process and expire after a TTL to bound staleness from other workers.
+article_cache = LRUCache(maxsize=4096)
+listing_cache = LRUCache(maxsize=1024, ttl=60)
+
+# Called with the id of every updated or deleted article, e.g. to drop answers built from it
+article_change_hooks = []
+
+def invalidate_cache(article_id=None):
+    """Drop cached responses affected by a write"""
+    listing_cache.clear()
+    if article_id is not None:
+        article_cache.pop(article_id)
+        for hook in article_change_hooks:
+            hook(article_id)
+
+def clear_cache():
+    listing_cache.clear()
+    article_cache.clear()
+
+def json_body(data):
+    # Same encoding JSONResponse uses
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+def body_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def article_etag(article_id, version):
+    return f'"{article_id}-{version}"'
+
+def http_date(timestamp):
+    """SQLite CURRENT_TIMESTAMP text (UTC) to an HTTP-date"""
+    if not timestamp:
+        return None
     try:
-        yield conn
-    finally:
-        conn.close()
+        moment = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(moment, usegmt=True)
+
+def not_modified(request, etag, last_modified):
+    """Evaluate If-None-Match, or If-Modified-Since when no If-None-Match was sent"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def cached_response(request, body, etag, last_modified=None, headers=None):
+    """200 with the body, or an empty 304 if the client's copy is current"""
+    headers = dict(headers or {})
+    headers['ETag'] = etag
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
 
 # ============ ARTICLE ENDPOINTS ============
+# Handlers stay async; the SQLite work itself runs in the pool's executor.
+
+INSERT_ARTICLE = '''
+    INSERT INTO articles (title, content, published_date, word_count, source_id, updated_at)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+
+def article_values(article):
+    """Row values for INSERT_ARTICLE, with the computed word count"""
+    # Calculate word count
+    content = article.content or ""
+    word_count = len(content.split()) if content else 0
+    
+    # Default to source_id = 1 if not specified (as per instructions)
+    source_id = article.source_id if article.source_id is not None else 1
+    
+    return (article.title, content, article.published_date, word_count, source_id)
 
 @router.post("/", response_model=dict, status_code=201)
-async def create_article(article: ArticleCreate):
+async def create_article(article: ArticleCreate, pool: ConnectionPool = Depends(get_pool)):
     """Insert a new article"""
     try:
-        # Calculate word count
-        content = article.content or ""
-        word_count = len(content.split()) if content else 0
-        
-        # Default to source_id = 1 if not specified (as per instructions)
-        source_id = article.source_id if article.source_id is not None else 1
-        
-        with get_db() as db:
-            cursor = db.cursor()
-            cursor.execute('''
-                INSERT INTO articles (title, content, published_date, word_count, source_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                article.title,
-                content,
-                article.published_date,
-                word_count,
-                source_id
-            ))
-            db.commit()
-            
-            article_id = cursor.lastrowid
-            return {"id": article_id, "message": "Article created successfully"}
+        values = article_values(article)
+        
+        def insert(db):
+            return db.execute(INSERT_ARTICLE, values).lastrowid
+        
+        article_id = await pool.write(insert)
+        invalidate_cache()
+        return {"id": article_id, "message": "Article created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/", response_model=List[Article])
+# ============ BULK INGEST ============
+
+BULK_BATCH_SIZE = 5000
+BULK_MAX_ERRORS = 1000
+BULK_MAX_ROW_BYTES = 10 * 1024 * 1024
+
+# Characters the array splitter has to look at: inside a string only quotes and escapes,
+# outside it the structure (whitespace ends a top-level number or literal)
+STRING_SPECIAL = re.compile(r'["\\]')
+ARRAY_STRUCTURE = re.compile(r'["{}\[\],\s]')
+
+def utf8_len(text):
+    return len(text.encode('utf-8'))
+
+class JSONArraySplitter:
+    """
+    Splits the text of a JSON array (after its opening '[') into element texts as it
+    arrives. Only nesting and strings are tracked, and regex jumps mean each character
+    is scanned once, so a large element costs linear time. Elements are parsed by the
+    caller, so a malformed one is reported on its own and the rows after it still load.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0  # next character to scan
+        self.start = None  # start of the element being scanned
+        self.depth = 0
+        self.in_string = False
+        self.closed = False  # the closing ']' has been seen
+        self.pending = 0  # UTF-8 bytes buffered for the incomplete element
+
+    def feed(self, text):
+        """Append text; return the texts of the elements it completes."""
+        continuing = self.start == 0
+        buf = self.buffer + text
+        i = self.pos
+        elements = []
+
+        def finish(end):
+            elements.append(buf[self.start:end])
+            self.start = None
+            return end
+
+        while not self.closed:
+            if self.start is None:
+                while i < len(buf) and buf[i] in ' \t\r\n,':
+                    i += 1
+                if i == len(buf):
+                    break
+                if buf[i] == ']':
+                    self.closed = True
+                    break
+                self.start = i
+                if buf[i] == '"':
+                    self.in_string = True
+                    i += 1
+                    continue
+
+            if self.in_string:
+                match = STRING_SPECIAL.search(buf, i)
+                if match is None:
+                    i = len(buf)
+                    break
+                i = match.start()
+                if buf[i] == '\\':
+                    if i + 1 == len(buf):
+                        break  # escape split across chunks; rescan it with the next one
+                    i += 2
+                    continue
+                self.in_string = False
+                i += 1
+                if self.depth == 0:
+                    i = finish(i)
+                continue
+
+            match = ARRAY_STRUCTURE.search(buf, i)
+            if match is None:
+                i = len(buf)
+                break
+            j = match.start()
+            char = buf[j]
+            if char == '"':
+                self.in_string = True
+                i = j + 1
+            elif char in '{[':
+                self.depth += 1
+                i = j + 1
+            elif char in '}]':
+                if self.depth == 0:
+                    # A scalar ended by the array's ']', or a stray '}' (reported as invalid)
+                    i = finish(j if char == ']' else j + 1)
+                    if char == ']':
+                        self.closed = True
+                else:
+                    self.depth -= 1
+                    i = j + 1
+                    if self.depth == 0:
+                        i = finish(i)
+            elif self.depth == 0:
+                i = finish(j)  # ',' or whitespace after a top-level scalar
+            else:
+                i = j + 1
+
+        keep = self.start if self.start is not None else i
+        self.buffer = buf[keep:]
+        self.pos = i - keep
+        # Only newly arrived text is encoded, so a large element is still measured in linear time
+        if continuing and self.start == 0:
+            self.pending += utf8_len(text)
+        else:
+            self.pending = utf8_len(self.buffer)
+        if self.start is not None:
+            self.start = 0
+        return elements
+
+async def iter_json_rows(chunks):
+    """
+    Incrementally parse an NDJSON or JSON-array byte stream.
+    Yields (row_number, value, error) so a bad row never stops the rows after it.
+    Only the current partial row is buffered, and no row may exceed BULK_MAX_ROW_BYTES.
+    """
+    mode = None  # 'array' or 'ndjson', decided by the first non-blank character
+    head = ''
+    pending = ''  # ndjson: the partial last line
+    pending_bytes = 0
+    skipping = False  # ndjson: dropping the rest of an oversized line
+    splitter = JSONArraySplitter()
+    row = 0
+    text_chunks = codecs.getincrementaldecoder('utf-8')()
+
+    def parse(text):
+        if utf8_len(text) > BULK_MAX_ROW_BYTES:
+            return None, f"Row exceeds {BULK_MAX_ROW_BYTES} bytes"
+        try:
+            return json.loads(text), None
+        except ValueError as e:
+            return None, f"Invalid JSON: {e}"
+
+    async for chunk in chunks:
+        text = text_chunks.decode(chunk)
+
+        if mode is None:
+            head = (head + text).lstrip()
+            if not head:
+                continue
+            mode = 'array' if head[0] == '[' else 'ndjson'
+            text = head[1:] if mode == 'array' else head
+
+        if mode == 'ndjson':
+            if skipping:
+                newline = text.find('\n')
+                if newline < 0:
+                    continue
+                text = text[newline + 1:]
+                skipping = False
+            *lines, rest = text.split('\n')
+            if lines:
+                lines[0] = pending + lines[0]
+                pending = rest
+                pending_bytes = utf8_len(rest)
+            else:
+                pending += rest
+                pending_bytes += utf8_len(rest)
+            for line in lines:
+                if line.strip():
+                    row += 1
+                    yield (row, *parse(line))
+            if pending_bytes > BULK_MAX_ROW_BYTES:
+                row += 1
+                yield row, None, f"Row exceeds {BULK_MAX_ROW_BYTES} bytes"
+                pending = ''
+                pending_bytes = 0
+                skipping = True
+        else:
+            for element in splitter.feed(text):
+                row += 1
+                yield (row, *parse(element))
+            if splitter.closed:
+                return
+            if splitter.pending > BULK_MAX_ROW_BYTES:
+                yield (row + 1, None,
+                       f"Array element exceeds {BULK_MAX_ROW_BYTES} bytes or is malformed; "
+                       f"rows after row {row} were not processed")
+                return
+
+    # Whatever is left over at the end of the body
+    if mode == 'ndjson' and pending.strip() and not skipping:
+        row += 1
+        yield (row, *parse(pending))
+    elif mode == 'array':
+        for element in splitter.feed(''):
+            row += 1
+            yield (row, *parse(element))
+        if not splitter.closed:
+            yield row + 1, None, f"Unterminated JSON array; rows after row {row} were not processed"
+
+def insert_batch(db, batch):
+    """
+    Insert (row_number, values) pairs with one executemany. If the batch is rejected,
+    retry row by row under savepoints so only the offending rows fail.
+    Returns (inserted, errors).
+    """
+    # Keep the whole batch in one transaction; the savepoints below nest inside it
+    if not db.in_transaction:
+        db.execute('BEGIN')
+    try:
+        db.execute('SAVEPOINT bulk_batch')
+        db.executemany(INSERT_ARTICLE, [values for _, values in batch])
+        db.execute('RELEASE bulk_batch')
+        return len(batch), []
+    except sqlite3.DatabaseError:
+        db.execute('ROLLBACK TO bulk_batch')
+        db.execute('RELEASE bulk_batch')
+    
+    inserted, errors = 0, []
+    for row, values in batch:
+        try:
+            db.execute('SAVEPOINT bulk_row')
+            db.execute(INSERT_ARTICLE, values)
+            db.execute('RELEASE bulk_row')
+            inserted += 1
+        except sqlite3.DatabaseError as e:
+            db.execute('ROLLBACK TO bulk_row')
+            db.execute('RELEASE bulk_row')
+            errors.append({"row": row, "error": str(e)})
+    return inserted, errors
+
+@router.post("/bulk", response_model=dict, status_code=201)
+async def bulk_create_articles(request: Request, pool: ConnectionPool = Depends(get_pool)):
+    """
+    Insert many articles from an NDJSON or JSON-array body.
+    The body is parsed and validated as it streams in and written in large batches,
+    one transaction per batch. Invalid rows are reported and skipped.
+    """
+    inserted = 0
+    failed = 0
+    errors = []
+    batch = []
+    
+    def record(error):
+        nonlocal failed
+        failed += 1
+        if len(errors) < BULK_MAX_ERRORS:
+            errors.append(error)
+    
+    async def flush():
+        nonlocal inserted
+        batch_inserted, batch_errors = await pool.write(insert_batch, batch[:])
+        inserted += batch_inserted
+        for error in batch_errors:
+            record(error)
+        batch.clear()
+    
+    try:
+        async for row, value, error in iter_json_rows(request.stream()):
+            if error is not None:
+                record({"row": row, "error": error})
+                continue
+            try:
+                article = ArticleCreate.model_validate(value)
+            except ValidationError as e:
+                detail = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+                    for err in e.errors()
+                )
+                record({"row": row, "error": detail})
+                continue
+            
+            batch.append((row, article_values(article)))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush()
+        
+        if batch:
+            await flush()
+    except Exception as e:
+        if inserted:
+            invalidate_cache()
+        raise HTTPException(status_code=500, detail=f"Bulk insert stopped after {inserted} articles: {e}")
+    
+    if inserted:
+        invalidate_cache()
+    return {
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+        "message": f"Inserted {inserted} articles"
+    }
+
+@router.get("/", response_model=Union[List[Article], List[ArticleSummary]])
 async def get_articles(
+    request: Request,
     source_id: Optional[int] = Query(None, description="Filter by source ID"),
     search: Optional[str] = Query(None, description="Search in title and content"),
     limit: Optional[int] = Query(None, description="Limit number of results"),
-    offset: int = Query(0, description="Offset for pagination")
+    offset: int = Query(0, description="Offset for pagination"),
+    after: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary'"),
+    pool: ConnectionPool = Depends(get_pool)
 ):
     """Get all articles with optional filtering"""
     try:
-        with get_db() as db:
-            # Build query
-            query = '''
-                SELECT a.*, s.name as source_name, s.url as source_url
-                FROM articles a
+        cache_key = tuple(sorted(request.query_params.multi_items()))
+        cached = listing_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(request, *cached)
+        
+        if after and (offset or search):
+            raise HTTPException(status_code=400, detail="after cannot be combined with offset or search")
+        
+        # Only read the requested columns; published_date is also needed for the next cursor
+        projection = parse_fields(fields) if fields else None
+        if projection:
+            selected = projection + (['published_date'] if 'published_date' not in projection else [])
+            select_list = ', '.join(f'{ARTICLE_FIELDS[f]} as {f}' for f in selected)
+        else:
+            select_list = 'a.*, s.name as source_name, s.url as source_url'
+        
+        params = []
+        
+        # Add filters
+        conditions = []
+        if source_id:
+            conditions.append('a.source_id = ?')
+            params.append(source_id)
+        
+        if search:
+            match = fts_query(search)
+            if not match:
+                return []
+            # Full-text search goes through the FTS5 index, ranked by BM25
+            conditions.append('articles_fts MATCH ?')
+            params.append(match)
+            from_clause = 'articles_fts f JOIN articles a ON a.id = f.rowid'
+            order_by = 'bm25(articles_fts), a.published_date DESC, a.id DESC'
+        else:
+            from_clause = 'articles a'
+            order_by = 'a.published_date DESC, a.id DESC'
+        
+        # Keyset pagination: seek straight past the cursor via the (published_date, id) indexes.
+        # NULL dates sort last under DESC, so once the dated rows run out the page continues
+        # with a second seek over the undated ones.
+        seeks = [([], [])]
+        if after:
+            published_date, article_id = decode_cursor(after)
+            if published_date is None:
+                seeks = [(['a.published_date IS NULL', 'a.id < ?'], [article_id])]
+            else:
+                seeks = [
+                    (['(a.published_date, a.id) < (?, ?)'], [published_date, article_id]),
+                    (['a.published_date IS NULL'], []),
+                ]
+        
+        def build_query(where, where_params, page_size):
+            query = f'''
+                SELECT {select_list}
+                FROM {from_clause}
                 LEFT JOIN source s ON a.source_id = s.id
             '''
-            params = []
-            
-            # Add filters
-            conditions = []
-            if source_id:
-                conditions.append('a.source_id = ?')
-                params.append(source_id)
-            
-            if search:
-                conditions.append('(a.title LIKE ? OR a.content LIKE ?)')
-                params.extend([f'%{search}%', f'%{search}%'])
+            query_params = list(where_params)
             
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
+            if where:
+                query += ' WHERE ' + ' AND '.join(where)
             
-            query += ' ORDER BY a.published_date DESC'
+            query += f' ORDER BY {order_by}'
             
-            if limit:
+            if page_size:
                 query += ' LIMIT ?'
-                params.append(limit)
+                query_params.append(page_size)
             
             if offset:
+                # SQLite only accepts OFFSET after a LIMIT
+                if not page_size:
+                    query += ' LIMIT -1'
                 query += ' OFFSET ?'
-                params.append(offset)
+                query_params.append(offset)
             
-            articles = db.execute(query, params).fetchall()
-            return [dict(article) for article in articles]
+            return query, query_params
+        
+        def select(db):
+            articles = []
+            for seek_conditions, seek_params in seeks:
+                page_size = limit - len(articles) if limit else None
+                if page_size == 0:
+                    break
+                query, query_params = build_query(conditions + seek_conditions, params + seek_params, page_size)
+                articles.extend(dict(article) for article in db.execute(query, query_params).fetchall())
+            return articles
+        
+        articles = await pool.read(select)
+        headers = {}
+        if limit and len(articles) == limit and not search:
+            last = articles[-1]
+            headers['X-Next-Cursor'] = encode_cursor(last['published_date'], last['id'])
+        
+        if projection:
+            # Projected rows return only what was asked for
+            articles = [{f: article[f] for f in projection} for article in articles]
+        
+        # Rows already match the response models, so serialize once and cache the bytes
+        body = json_body(articles)
+        # ETag only: no Last-Modified, since the newest row on a page does not move when a row is deleted
+        entry = (body, body_etag(body), None, headers)
+        listing_cache.set(cache_key, entry)
+        return cached_response(request, *entry)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============ EXPORT ============
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = ['id', 'title', 'content', 'published_date', 'word_count', 'source_id', 'source_name', 'source_url']
+
+async def iter_article_chunks(pool, source_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of article rows in id order, one short read per chunk.
+    Each chunk seeks past the last id seen, so no cursor or read transaction
+    stays open between chunks and memory is bounded by chunk_size.
+    """
+    query = '''
+        SELECT a.id, a.title, a.content, a.published_date, a.word_count, a.source_id,
+               s.name as source_name, s.url as source_url
+        FROM articles a
+        LEFT JOIN source s ON a.source_id = s.id
+        WHERE a.id > ?
+    '''
+    if source_id:
+        query += ' AND a.source_id = ?'
+    query += ' ORDER BY a.id LIMIT ?'
+    
+    last_id = 0
+    while True:
+        params = [last_id] + ([source_id] if source_id else []) + [chunk_size]
+        rows = await pool.read(lambda db: db.execute(query, params).fetchall())
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+async def export_ndjson(chunks):
+    async for rows in chunks:
+        yield ''.join(json.dumps(dict(row), ensure_ascii=False) + '\n' for row in rows)
+
+async def export_csv(chunks):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    yield out.getvalue()
+    async for rows in chunks:
+        out.seek(0)
+        out.truncate()
+        writer.writerows(tuple(row) for row in rows)
+        yield out.getvalue()
+
+@router.get("/export")
+async def export_articles(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    source_id: Optional[int] = Query(None, description="Filter by source ID"),
+    pool: ConnectionPool = Depends(get_pool)
+):
+    """Stream every article as NDJSON or CSV without loading the table into memory"""
+    chunks = iter_article_chunks(pool, source_id)
+    if format == 'csv':
+        body, media_type = export_csv(chunks), 'text/csv'
+    else:
+        body, media_type = export_ndjson(chunks), 'application/x-ndjson'
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="articles.{format}"'}
+    )
+
 @router.get("/{article_id}", response_model=Article)
-async def get_article(article_id: int):
+async def get_article(article_id: int, request: Request, pool: ConnectionPool = Depends(get_pool)):
     """Get a single article by ID"""
     try:
-        with get_db() as db:
-            article = db.execute('''
+        cached = article_cache.get(article_id)
+        conditional = 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+        
+        if cached is not None or conditional:
+            # Check freshness from the version columns alone, without reading the content
+            def lookup(db):
+                return db.execute(
+                    'SELECT version, updated_at FROM articles WHERE id = ?', (article_id,)
+                ).fetchone()
+            
+            meta = await pool.read(lookup)
+            if meta is None:
+                raise HTTPException(status_code=404, detail="Article not found")
+            etag = article_etag(article_id, meta['version'])
+            last_modified = http_date(meta['updated_at'])
+            if not_modified(request, etag, last_modified):
+                return cached_response(request, b'', etag, last_modified)
+            if cached is not None and cached[1] == etag:
+                return cached_response(request, *cached)
+        
+        def select(db):
+            return db.execute('''
                 SELECT a.*, s.name as source_name, s.url as source_url
                 FROM articles a
                 LEFT JOIN source s ON a.source_id = s.id
                 WHERE a.id = ?
             ''', (article_id,)).fetchone()
-            
-            if article is None:
-                raise HTTPException(status_code=404, detail="Article not found")
-            return dict(article)
+        
+        article = await pool.read(select)
+        if article is None:
+            raise HTTPException(status_code=404, detail="Article not found")
+        article = dict(article)
+        body = json_body(article)
+        entry = (body, article_etag(article_id, article['version']), http_date(article['updated_at']))
+        article_cache.set(article_id, entry)
+        return cached_response(request, *entry)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{article_id}", response_model=dict)
-async def update_article(article_id: int, article: ArticleUpdate):
+async def update_article(article_id: int, article: ArticleUpdate, pool: ConnectionPool = Depends(get_pool)):
     """Update an article"""
     try:
-        with get_db() as db:
+        # Build update query dynamically
+        fields = []
+        params = []
+        
+        if article.title is not None:
+            fields.append('title = ?')
+            params.append(article.title)
+        
+        if article.content is not None:
+            fields.append('content = ?')
+            fields.append('word_count = ?')
+            word_count = len(article.content.split()) if article.content else 0
+            params.extend([article.content, word_count])
+        
+        if article.published_date is not None:
+            fields.append('published_date = ?')
+            params.append(article.published_date)
+        
+        if article.source_id is not None:
+            fields.append('source_id = ?')
+            params.append(article.source_id)
+        
+        def update(db):
             # Check if article exists
             existing = db.execute('SELECT id FROM articles WHERE id = ?', (article_id,)).fetchone()
             if existing is None:
                 raise HTTPException(status_code=404, detail="Article not found")
             
-            # Build update query dynamically
-            fields = []
-            params = []
-            
-            if article.title is not None:
-                fields.append('title = ?')
-                params.append(article.title)
-            
-            if article.content is not None:
-                fields.append('content = ?')
-                fields.append('word_count = ?')
-                word_count = len(article.content.split()) if article.content else 0
-                params.extend([article.content, word_count])
-            
-            if article.published_date is not None:
-                fields.append('published_date = ?')
-                params.append(article.published_date)
-            
-            if article.source_id is not None:
-                fields.append('source_id = ?')
-                params.append(article.source_id)
-            
             if not fields:
                 raise HTTPException(status_code=400, detail="No valid fields to update")
             
-            params.append(article_id)
-            query = f'UPDATE articles SET {", ".join(fields)} WHERE id = ?'
-            
-            db.execute(query, params)
-            db.commit()
-            
-            return {"message": "Article updated successfully"}
+            # Every update bumps the version, which changes the article's ETag
+            fields_sql = ", ".join(fields + ['version = version + 1', 'updated_at = CURRENT_TIMESTAMP'])
+            query = f'UPDATE articles SET {fields_sql} WHERE id = ?'
+            db.execute(query, params + [article_id])
+        
+        await pool.write(update)
+        invalidate_cache(article_id)
+        return {"message": "Article updated successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{article_id}", response_model=dict)
-async def delete_article(article_id: int):
+async def delete_article(article_id: int, pool: ConnectionPool = Depends(get_pool)):
     """Delete an article"""
     try:
-        with get_db() as db:
+        def delete(db):
             # Check if article exists
             existing = db.execute('SELECT id FROM articles WHERE id = ?', (article_id,)).fetchone()
             if existing is None:
                 raise HTTPException(status_code=404, detail="Article not found")
             
             db.execute('DELETE FROM articles WHERE id = ?', (article_id,))
-            db.commit()
-            
-            return {"message": "Article deleted successfully"}
+        
+        await pool.write(delete)
+        invalidate_cache(article_id)
+        return {"message": "Article deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
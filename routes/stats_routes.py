@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import List
+
+from db_pool import ConnectionPool, get_pool
+
+router = APIRouter(prefix="/api", tags=["stats"])
+
+class SourceStats(BaseModel):
+    id: int
+    name: str
+    article_count: int
+
+class Stats(BaseModel):
+    total_articles: int
+    total_sources: int
+    average_word_count: float
+    articles_by_source: List[SourceStats]
+
+# ============ STATISTICS ENDPOINTS ============
+
+@router.get("/stats", response_model=Stats)
+async def get_stats(pool: ConnectionPool = Depends(get_pool)):
+    """Database statistics, read from the trigger-maintained source_stats table"""
+    try:
+        def select(db):
+            # O(number of sources): only the aggregate rows are read, never the articles
+            totals = db.execute('''
+                SELECT COALESCE(SUM(article_count), 0) as total_articles,
+                       COALESCE(SUM(total_words), 0) as total_words
+                FROM source_stats
+            ''').fetchone()
+            by_source = db.execute('''
+                SELECT s.id, s.name, COALESCE(st.article_count, 0) as article_count
+                FROM source s
+                LEFT JOIN source_stats st ON st.source_id = s.id
+                ORDER BY s.id
+            ''').fetchall()
+            return totals, by_source
+        
+        totals, by_source = await pool.read(select)
+        total_articles = totals['total_articles']
+        return {
+            "total_articles": total_articles,
+            "total_sources": len(by_source),
+            "average_word_count": totals['total_words'] / total_articles if total_articles else 0,
+            "articles_by_source": [dict(row) for row in by_source]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
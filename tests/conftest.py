@@ -0,0 +1,93 @@
+# conftest.py
+
+import pytest
+import sqlite3
+import tempfile
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path so top-level modules import
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db_pool import ConnectionPool, get_pool
+from init_db import migrate_db
+
+
+@pytest.fixture(scope="function")
+def article_db():
+    """Temporary database with the articles schema and two seeded articles"""
+    db_fd, db_path = tempfile.mkstemp(suffix=".db")
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE source (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        url TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE articles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT,
+        published_date TEXT DEFAULT (DATE('now')),
+        word_count INTEGER,
+        source_id INTEGER,
+        FOREIGN KEY (source_id) REFERENCES source(id)
+    )
+    ''')
+    cursor.execute("INSERT INTO source (name, url) VALUES (?, ?)",
+                   ("Test Health Daily", "https://test-health.com"))
+    cursor.execute("INSERT INTO source (name, url) VALUES (?, ?)",
+                   ("Test Wellness News", "https://test-wellness.com"))
+    cursor.execute("""
+        INSERT INTO articles (title, content, published_date, word_count, source_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, ("Test Yoga Article", "This is test yoga content for flexibility.", "2025-08-01", 7, 1))
+    cursor.execute("""
+        INSERT INTO articles (title, content, published_date, word_count, source_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, ("Test HIIT Workout", "High intensity training content here.", "2025-08-02", 5, 1))
+    conn.commit()
+    conn.close()
+
+    # Upgrade the pre-existing schema the same way the app does on startup
+    migrate_db(db_path)
+
+    yield db_path
+
+    os.close(db_fd)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+
+
+@pytest.fixture(scope="function")
+def pool(article_db):
+    pool = ConnectionPool(article_db, max_workers=4)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="function")
+def api(pool, monkeypatch):
+    """Test client whose routes use the temporary database pool"""
+    from fastapi.testclient import TestClient
+    import main
+    from main import app
+    from routes.article_routes import clear_cache
+
+    # Keep the startup migration away from the real database.db
+    monkeypatch.setattr(main, "FILE_PATH", pool.db_path)
+    # Tests install their own fakes instead of loading models and Docker in the background
+    monkeypatch.setattr(main, "AI_WARMUP", False)
+    app.dependency_overrides[get_pool] = lambda: pool
+    # Cached responses from another test's database must not leak in
+    clear_cache()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+    clear_cache()
@@ -0,0 +1,410 @@
+# test_articles.py
+
+
+class TestArticleRoutes:
+
+    def test_list_articles(self, api):
+        """Listing goes through the pooled connections"""
+        response = api.get("/articles/")
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_offset_without_limit(self, api):
+        """Offset works on its own"""
+        response = api.get("/articles/?offset=1")
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+
+    def test_create_update_delete(self, api):
+        """Write endpoints commit through the single writer"""
+        response = api.post("/articles/", json={"title": "Pooled", "content": "one two three"})
+        assert response.status_code == 201
+        article_id = response.json()["id"]
+
+        response = api.put(f"/articles/{article_id}", json={"content": "one two"})
+        assert response.status_code == 200
+        assert api.get(f"/articles/{article_id}").json()["word_count"] == 2
+
+        assert api.delete(f"/articles/{article_id}").status_code == 200
+        assert api.get(f"/articles/{article_id}").status_code == 404
+
+    def test_update_missing_article(self, api):
+        """Errors raised inside the write transaction still surface as 404"""
+        response = api.put("/articles/999", json={"title": "Nope"})
+        assert response.status_code == 404
+
+
+class TestArticleSearch:
+
+    def test_search_existing_rows(self, api):
+        """Rows written before the migration are indexed by the rebuild"""
+        response = api.get("/articles/?search=yoga")
+        assert response.status_code == 200
+        articles = response.json()
+        assert len(articles) == 1
+        assert articles[0]["title"] == "Test Yoga Article"
+
+    def test_search_prefix_and_case(self, api):
+        """Words match case-insensitively as prefixes"""
+        articles = api.get("/articles/?search=FLEX").json()
+        assert [a["title"] for a in articles] == ["Test Yoga Article"]
+
+    def test_search_tracks_writes(self, api):
+        """Triggers keep the index in sync with create, update and delete"""
+        article_id = api.post("/articles/", json={"title": "Rowing basics", "content": "Erg technique"}).json()["id"]
+        assert len(api.get("/articles/?search=erg").json()) == 1
+
+        api.put(f"/articles/{article_id}", json={"content": "Catch and drive"})
+        assert api.get("/articles/?search=erg").json() == []
+        assert len(api.get("/articles/?search=drive").json()) == 1
+
+        api.delete(f"/articles/{article_id}")
+        assert api.get("/articles/?search=drive").json() == []
+
+    def test_search_ranked_by_bm25(self, api):
+        """Articles that mention the term more often rank first"""
+        api.post("/articles/", json={"title": "Training", "content": "training training training plans"})
+        titles = [a["title"] for a in api.get("/articles/?search=training").json()]
+        assert titles == ["Training", "Test HIIT Workout"]
+
+    def test_search_without_words(self, api):
+        """Punctuation-only searches cannot form a query and match nothing"""
+        response = api.get("/articles/?search=%25%25")
+        assert response.status_code == 200
+        assert response.json() == []
+
+
+class TestKeysetPagination:
+
+    def seed(self, api, count):
+        # Several articles share a date so the id tie-breaker matters
+        for i in range(count):
+            api.post("/articles/", json={"title": f"Paged {i}", "published_date": f"2025-09-{i // 3 + 1:02d}"})
+
+    def walk(self, api, url):
+        titles, cursor = [], None
+        while True:
+            response = api.get(url + (f"&after={cursor}" if cursor else ""))
+            assert response.status_code == 200
+            titles.extend(a["title"] for a in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return titles
+
+    def test_cursor_walk_matches_offset_order(self, api):
+        """Following cursors visits every article once, in the same order as a full listing"""
+        self.seed(api, 7)
+        api.post("/articles/", json={"title": "Undated"})
+        expected = [a["title"] for a in api.get("/articles/").json()]
+        assert self.walk(api, "/articles/?limit=3") == expected
+        assert expected[-1] == "Undated"
+
+    def test_cursor_with_source_filter(self, api):
+        """Cursors combine with the source filter"""
+        self.seed(api, 4)
+        api.post("/articles/", json={"title": "Other source", "source_id": 2})
+        titles = self.walk(api, "/articles/?source_id=1&limit=2")
+        assert "Other source" not in titles
+        assert len(titles) == 6
+
+    def test_invalid_cursor(self, api):
+        """Garbage cursors are rejected"""
+        response = api.get("/articles/?limit=1&after=not-a-cursor")
+        assert response.status_code == 400
+
+    def test_cursor_with_offset_rejected(self, api):
+        """Cursor and offset pagination cannot be mixed"""
+        cursor = api.get("/articles/?limit=1").headers["X-Next-Cursor"]
+        response = api.get(f"/articles/?limit=1&offset=1&after={cursor}")
+        assert response.status_code == 400
+
+    def test_listing_uses_index(self, pool):
+        """Source-filtered keyset queries are served by the composite index"""
+        plan = pool.reader().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM articles a WHERE a.source_id = ? "
+            "AND (a.published_date, a.id) < (?, ?) ORDER BY a.published_date DESC, a.id DESC LIMIT 10",
+            (1, "2025-08-02", 2)
+        ).fetchall()
+        details = " ".join(row["detail"] for row in plan)
+        assert details.startswith("SEARCH a")
+        assert "idx_articles_source_published" in details
+        assert "TEMP B-TREE" not in details
+
+
+class TestBulkIngest:
+
+    def test_ndjson(self, api):
+        """NDJSON rows are validated, counted and inserted with word counts"""
+        body = "\n".join([
+            '{"title": "Bulk one", "content": "a b c"}',
+            '',
+            '{"title": "Bulk two", "source_id": 2}',
+        ])
+        response = api.post("/articles/bulk", content=body)
+        assert response.status_code == 201
+        assert response.json()["inserted"] == 2
+        articles = {a["title"]: a for a in api.get("/articles/").json()}
+        assert articles["Bulk one"]["word_count"] == 3
+        assert articles["Bulk two"]["source_id"] == 2
+
+    def test_json_array(self, api):
+        """A JSON array body works the same way"""
+        body = '[{"title": "Array one"}, {"title": "Array two", "content": "x y"}]'
+        response = api.post("/articles/bulk", content=body)
+        assert response.json()["inserted"] == 2
+
+    def test_bad_rows_are_reported(self, api):
+        """Invalid rows are skipped with their row numbers, the rest still land"""
+        body = "\n".join([
+            '{"title": "Good"}',
+            '{"content": "missing title"}',
+            'not json',
+            '{"title": "Also good"}',
+        ])
+        data = api.post("/articles/bulk", content=body).json()
+        assert data["inserted"] == 2
+        assert data["failed"] == 2
+        assert [e["row"] for e in data["errors"]] == [2, 3]
+        assert "title" in data["errors"][0]["error"]
+
+    def test_malformed_array_element(self, api):
+        """A malformed element is reported at its row and the elements after it still load"""
+        data = api.post("/articles/bulk", content='[{"title": "a"}, {bad}, {"title": "b"}]').json()
+        assert data["inserted"] == 2
+        assert [e["row"] for e in data["errors"]] == [2]
+        assert "Invalid JSON" in data["errors"][0]["error"]
+
+    def test_unterminated_array(self, api):
+        """A body that ends mid-element says which rows were not processed"""
+        data = api.post("/articles/bulk", content='[{"title": "a"}, {"title": "b"').json()
+        assert data["inserted"] == 1
+        assert data["errors"] == [{"row": 2, "error": "Unterminated JSON array; rows after row 1 were not processed"}]
+
+    def test_oversized_rows(self, api, monkeypatch):
+        """Neither format buffers a row past BULK_MAX_ROW_BYTES"""
+        import routes.article_routes as article_routes
+        monkeypatch.setattr(article_routes, "BULK_MAX_ROW_BYTES", 50)
+        long_row = '{"title": "' + "x" * 100 + '"}'
+
+        def body(text):
+            raw = text.encode()
+            for i in range(0, len(raw), 10):
+                yield raw[i:i + 10]
+
+        data = api.post("/articles/bulk", content=body(f'{long_row}\n{{"title": "After"}}')).json()
+        assert data["inserted"] == 1
+        assert [e["row"] for e in data["errors"]] == [1]
+
+        data = api.post("/articles/bulk", content=body(f'[{{"title": "Before"}}, {long_row}, {{"title": "c"}}]')).json()
+        assert data["inserted"] == 2
+        assert [e["row"] for e in data["errors"]] == [2]
+
+    def test_row_limit_counts_utf8_bytes(self, api, monkeypatch):
+        """Multi-byte text counts by its encoded size, not its length in characters"""
+        import routes.article_routes as article_routes
+        monkeypatch.setattr(article_routes, "BULK_MAX_ROW_BYTES", 60)
+        wide_row = '{"title": "' + "é" * 30 + '"}'  # 43 characters, 73 bytes
+
+        data = api.post("/articles/bulk", content=f'{wide_row}\n{{"title": "After"}}'.encode()).json()
+        assert (data["inserted"], [e["row"] for e in data["errors"]]) == (1, [1])
+
+        data = api.post("/articles/bulk", content=f'[{wide_row}, {{"title": "After"}}]'.encode()).json()
+        assert (data["inserted"], [e["row"] for e in data["errors"]]) == (1, [1])
+
+    def test_splitter_pending_is_utf8_bytes(self):
+        """The open element's size grows by the encoded size of each chunk"""
+        from routes.article_routes import JSONArraySplitter
+
+        splitter = JSONArraySplitter()
+        assert splitter.feed('{"a": 1}, {"title": "') == ['{"a": 1}']
+        assert splitter.pending == len('{"title": "')
+        splitter.feed("é" * 10)
+        assert splitter.pending == len('{"title": "') + 20
+        assert splitter.feed('"}') == ['{"title": "' + "é" * 10 + '"}']
+        assert splitter.pending == 0
+
+    def test_oversized_partial_element_stops(self, monkeypatch):
+        """An array element still open past the cap ends the parse, saying so"""
+        import asyncio
+        import routes.article_routes as article_routes
+        monkeypatch.setattr(article_routes, "BULK_MAX_ROW_BYTES", 50)
+
+        async def chunks():
+            yield b'[{"title": "Before"}, {"title": "'
+            for _ in range(10):
+                yield b"x" * 10
+
+        async def collect():
+            return [row async for row in article_routes.iter_json_rows(chunks())]
+
+        rows = asyncio.run(collect())
+        assert rows[0] == (1, {"title": "Before"}, None)
+        assert rows[1][0] == 2
+        assert "rows after row 1 were not processed" in rows[1][2]
+        assert len(rows) == 2
+
+    def test_streamed_in_small_chunks(self, api, monkeypatch):
+        """Rows split across body chunks and batch boundaries are reassembled"""
+        import routes.article_routes as article_routes
+        monkeypatch.setattr(article_routes, "BULK_BATCH_SIZE", 7)
+
+        rows = [f'{{"title": "Chunked {i}", "content": "café {i}"}}' for i in range(20)]
+        raw = ("[" + ",\n".join(rows) + "]").encode()
+
+        def body():
+            for i in range(0, len(raw), 5):
+                yield raw[i:i + 5]
+
+        data = api.post("/articles/bulk", content=body()).json()
+        assert data["inserted"] == 20
+        assert data["failed"] == 0
+        assert len(api.get("/articles/?search=chunked").json()) == 20
+
+    def test_database_errors_fail_single_rows(self, pool):
+        """A rejected row falls back to row-by-row inserts inside the batch"""
+        import asyncio
+        from routes.article_routes import insert_batch
+
+        good = ("Fine", "", None, 0, 1)
+        bad = (None, "", None, 0, 1)  # violates NOT NULL on title
+        inserted, errors = asyncio.run(pool.write(insert_batch, [(1, good), (2, bad), (3, good)]))
+        assert inserted == 2
+        assert [e["row"] for e in errors] == [2]
+        count = pool.reader().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        assert count == 4
+
+
+class TestExport:
+
+    def test_ndjson_export(self, api, monkeypatch):
+        """Every article is streamed once, across several chunks"""
+        import json
+        import routes.article_routes as article_routes
+        monkeypatch.setattr(article_routes, "EXPORT_CHUNK_SIZE", 2)
+        for i in range(5):
+            api.post("/articles/", json={"title": f"Export {i}"})
+
+        response = api.get("/articles/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["id"] for r in rows] == list(range(1, 8))
+        assert rows[0]["source_name"] == "Test Health Daily"
+
+    def test_csv_export(self, api):
+        """CSV export has a header row and handles embedded commas"""
+        import csv
+        import io
+        api.post("/articles/", json={"title": "Commas, quotes \"and\" more", "source_id": 2})
+
+        response = api.get("/articles/export?format=csv&source_id=2")
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][:2] == ["id", "title"]
+        assert rows[1][1] == "Commas, quotes \"and\" more"
+        assert len(rows) == 2
+
+    def test_unknown_format(self, api):
+        """Only ndjson and csv are supported"""
+        assert api.get("/articles/export?format=xml").status_code == 422
+
+
+class TestFieldProjection:
+
+    def test_default_listing_unchanged(self, api):
+        """Without fields= the full Article rows are returned"""
+        article = api.get("/articles/").json()[0]
+        assert article["content"]
+        assert article["source_url"] == "https://test-health.com"
+
+    def test_summary(self, api):
+        """fields=summary returns ArticleSummary rows without content"""
+        articles = api.get("/articles/?fields=summary").json()
+        assert set(articles[0]) == {"id", "title", "published_date", "word_count", "source_id", "source_name"}
+        assert articles[0]["source_name"] == "Test Health Daily"
+
+    def test_explicit_fields(self, api):
+        """Only the requested fields come back, plus id"""
+        articles = api.get("/articles/?fields=title,snippet&search=yoga").json()
+        assert articles == [{"id": 1, "title": "Test Yoga Article",
+                             "snippet": "This is test yoga content for flexibility."}]
+
+    def test_projection_keeps_cursor(self, api):
+        """Keyset pagination still works when published_date is not requested"""
+        response = api.get("/articles/?fields=title&limit=1")
+        assert list(response.json()[0]) == ["id", "title"]
+        cursor = response.headers["X-Next-Cursor"]
+        page = api.get(f"/articles/?fields=title&limit=1&after={cursor}").json()
+        assert page[0]["title"] == "Test Yoga Article"
+
+    def test_unknown_field(self, api):
+        """Unknown fields are rejected rather than silently dropped"""
+        response = api.get("/articles/?fields=title,password")
+        assert response.status_code == 400
+        assert "password" in response.json()["detail"]
+
+
+class TestConditionalGet:
+
+    def test_article_etag_and_304(self, api):
+        """A matching If-None-Match gets an empty 304"""
+        response = api.get("/articles/1")
+        etag = response.headers["ETag"]
+        assert etag == '"1-1"'
+        assert response.headers["Last-Modified"].endswith("GMT")
+
+        response = api.get("/articles/1", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    def test_update_changes_etag(self, api):
+        """Updates bump the version, so old ETags stop matching"""
+        etag = api.get("/articles/1").headers["ETag"]
+        api.put("/articles/1", json={"title": "Renamed"})
+
+        response = api.get("/articles/1", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"1-2"'
+        assert response.json()["title"] == "Renamed"
+        assert response.json()["version"] == 2
+
+    def test_if_modified_since(self, api):
+        """If-Modified-Since is honoured when no ETag is sent"""
+        last_modified = api.get("/articles/1").headers["Last-Modified"]
+        response = api.get("/articles/1", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == 304
+        response = api.get("/articles/1", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+        assert response.status_code == 200
+
+    def test_deleted_article_not_served_from_cache(self, api):
+        """Cached bodies are re-validated, so deletes show up immediately"""
+        api.get("/articles/2")
+        api.delete("/articles/2")
+        assert api.get("/articles/2").status_code == 404
+
+    def test_listing_cache_invalidated_by_writes(self, api):
+        """Listings are cached until a write endpoint runs"""
+        from routes.article_routes import listing_cache
+
+        first = api.get("/articles/?fields=summary")
+        again = api.get("/articles/?fields=summary", headers={"If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 304
+        assert listing_cache.hits >= 1
+
+        api.post("/articles/", json={"title": "Fresh"})
+        response = api.get("/articles/?fields=summary", headers={"If-None-Match": first.headers["ETag"]})
+        assert response.status_code == 200
+        assert len(response.json()) == 3
+
+    def test_listing_after_delete_is_not_304(self, api):
+        """Listings validate by body ETag only; a delete changes the body even if no row got newer"""
+        first = api.get("/articles/")
+        assert "Last-Modified" not in first.headers
+        api.delete("/articles/2")
+
+        response = api.get("/articles/", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+        assert response.status_code == 200
+        response = api.get("/articles/", headers={"If-None-Match": first.headers["ETag"]})
+        assert response.status_code == 200
+        assert len(response.json()) == len(first.json()) - 1
@@ -0,0 +1,164 @@
+# test_async_client.py
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from generator.async_client import AsyncLLMClient, LLMError, LLMTimeoutError, TokenBucket, is_transient
+
+
+class ProviderError(Exception):
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+class FakeProvider:
+    """Local async provider: scripted failures, optional latency, tracks concurrency"""
+
+    def __init__(self, failures=(), delay=0.0, pieces=("a", "b")):
+        self.failures = list(failures)
+        self.delay = delay
+        self.pieces = pieces
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.aio = SimpleNamespace(models=self)
+
+    async def _enter(self):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+        finally:
+            self.active -= 1
+
+    async def generate_content(self, model, contents):
+        await self._enter()
+        return SimpleNamespace(text="".join(self.pieces))
+
+    async def generate_content_stream(self, model, contents):
+        await self._enter()
+
+        async def chunks():
+            for piece in self.pieces:
+                yield SimpleNamespace(text=piece)
+        return chunks()
+
+
+def client(provider, **kwargs):
+    kwargs.setdefault("backoff", 0.001)
+    return AsyncLLMClient(provider, **kwargs)
+
+
+class TestAsyncLLMClient:
+
+    def test_transient_errors_are_retried(self):
+        provider = FakeProvider(failures=[ConnectionError("reset"), ProviderError(503)])
+        llm = client(provider)
+        assert asyncio.run(llm.generate("m", "q")) == "ab"
+        assert provider.calls == 3
+        assert llm.stats()["retries"] == 2
+
+    def test_permanent_errors_fail_fast(self):
+        provider = FakeProvider(failures=[ProviderError(400)])
+        llm = client(provider)
+        with pytest.raises(LLMError):
+            asyncio.run(llm.generate("m", "q"))
+        assert provider.calls == 1
+        assert llm.stats()["failures"] == 1
+
+    def test_retries_are_bounded(self):
+        provider = FakeProvider(failures=[ProviderError(429)] * 5)
+        with pytest.raises(LLMError):
+            asyncio.run(client(provider, retries=2).generate("m", "q"))
+        assert provider.calls == 3
+
+    def test_deadline(self):
+        """A slow provider is cut off at the call's deadline"""
+        llm = client(FakeProvider(delay=1.0))
+        start = time.monotonic()
+        with pytest.raises(LLMTimeoutError):
+            asyncio.run(llm.generate("m", "q", timeout=0.05))
+        assert time.monotonic() - start < 0.5
+        assert llm.stats()["timeouts"] == 1
+        assert llm.stats()["in_flight"] == 0
+
+    def test_deadline_during_rate_wait(self):
+        """A deadline that runs out while waiting for a rate token leaves nothing unawaited"""
+        import gc
+        import warnings
+
+        checks = []
+
+        def remaining(deadline):
+            # Time enough to reserve a rate token, none left once it is granted
+            checks.append(deadline)
+            if len(checks) > 1:
+                raise LLMTimeoutError("LLM deadline exceeded")
+            return 0.5
+
+        llm = client(FakeProvider())
+        llm._remaining = remaining
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            with pytest.raises(LLMTimeoutError):
+                asyncio.run(llm._admit(0))
+            gc.collect()
+        assert not [w for w in caught if "never awaited" in str(w.message)]
+        assert llm.stats()["waiting"] == 0
+
+    def test_concurrency_cap(self):
+        """No more than max_concurrency generations run at once; the rest queue"""
+        provider = FakeProvider(delay=0.02)
+        llm = client(provider, max_concurrency=2, rate=1000, burst=1000)
+
+        async def run():
+            return await asyncio.gather(*(llm.generate("m", "q") for _ in range(6)))
+
+        assert asyncio.run(run()) == ["ab"] * 6
+        assert provider.peak == 2
+        stats = llm.stats()
+        assert stats["queue_time"]["count"] == 6
+        assert stats["queue_time"]["max_ms"] >= 15
+        assert stats["latency"]["count"] == 6
+
+    def test_stream_retries_before_first_piece(self):
+        provider = FakeProvider(failures=[ConnectionError("reset")])
+        llm = client(provider)
+
+        async def collect():
+            return [text async for text in llm.stream("m", "q")]
+
+        assert asyncio.run(collect()) == ["a", "b"]
+        assert provider.calls == 2
+        assert llm.stats()["in_flight"] == 0
+
+
+class TestTokenBucket:
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+    def test_refuses_waits_past_deadline(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve()
+        assert bucket.reserve(max_wait=0.1) is None
+        assert bucket.reserve(max_wait=2) == pytest.approx(1, abs=0.01)
+
+
+class TestIsTransient:
+
+    def test_classification(self):
+        assert is_transient(ConnectionError())
+        assert is_transient(ProviderError(429))
+        assert not is_transient(ProviderError(400))
+        assert not is_transient(ValueError())
@@ -0,0 +1,128 @@
+# test_batcher.py
+
+import asyncio
+import threading
+
+from batcher import MicroBatcher
+
+
+class Recorder:
+    """Batch function that records the batches it was given"""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self.release = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        self.release.wait(self.delay)
+        return [item * 10 for item in items]
+
+
+class TestMicroBatcher:
+
+    def test_concurrent_calls_share_a_batch(self):
+        """Calls arriving inside the window are processed together, results routed back"""
+        process = Recorder()
+        batcher = MicroBatcher(process, window_ms=50, max_batch_size=16)
+
+        async def run():
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+            await batcher.close()
+            return results
+
+        assert asyncio.run(run()) == [0, 10, 20, 30, 40]
+        assert process.batches == [[0, 1, 2, 3, 4]]
+        stats = batcher.stats()
+        assert stats["batches"] == 1
+        assert stats["mean_batch_size"] == 5
+        assert stats["batch_sizes"] == {5: 1}
+
+    def test_max_batch_size(self):
+        """A full batch is dispatched without waiting for the window"""
+        process = Recorder()
+        batcher = MicroBatcher(process, window_ms=10_000, max_batch_size=3)
+
+        async def run():
+            results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(6))), 5)
+            await batcher.close()
+            return results
+
+        assert asyncio.run(run()) == [0, 10, 20, 30, 40, 50]
+        assert process.batches == [[0, 1, 2], [3, 4, 5]]
+
+    def test_queue_builds_while_a_batch_runs(self):
+        """Requests arriving during a slow batch wait in the queue and form the next batch"""
+        process = Recorder(delay=5)
+        batcher = MicroBatcher(process, window_ms=1, max_batch_size=32)
+
+        async def run():
+            first = asyncio.ensure_future(batcher.submit(0))
+            while not process.batches:
+                await asyncio.sleep(0.001)
+            rest = [asyncio.ensure_future(batcher.submit(i)) for i in range(1, 5)]
+            await asyncio.sleep(0.01)
+            depth = batcher.queue_depth()
+            process.release.set()
+            results = await asyncio.gather(first, *rest)
+            await batcher.close()
+            return depth, results
+
+        depth, results = asyncio.run(run())
+        assert depth == 4
+        assert results == [0, 10, 20, 30, 40]
+        assert process.batches == [[0], [1, 2, 3, 4]]
+
+    def test_errors_reach_every_caller(self):
+        """A failing batch raises in each waiting caller and the batcher keeps serving"""
+        calls = []
+
+        def process(items):
+            calls.append(items)
+            if len(calls) == 1:
+                raise ValueError("model failed")
+            return items
+
+        batcher = MicroBatcher(process, window_ms=20)
+
+        async def run():
+            failed = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+            ok = await batcher.submit(3)
+            await batcher.close()
+            return failed, ok
+
+        failed, ok = asyncio.run(run())
+        assert all(isinstance(e, ValueError) for e in failed)
+        assert ok == 3
+
+    def test_close_fails_the_batch_in_flight(self):
+        """Callers whose batch is still running when the batcher closes get an error"""
+        process = Recorder(delay=5)
+        batcher = MicroBatcher(process, window_ms=1)
+
+        async def run():
+            running = asyncio.ensure_future(batcher.submit(1))
+            while not process.batches:
+                await asyncio.sleep(0.001)
+            queued = asyncio.ensure_future(batcher.submit(2))
+            await asyncio.sleep(0)
+            await batcher.close()
+            process.release.set()
+            return await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+
+        assert [str(e) for e in asyncio.run(run())] == ["Batcher closed", "Batcher closed"]
+
+    def test_survives_event_loop_restart(self):
+        """A batcher used under a new event loop starts a new worker"""
+        batcher = MicroBatcher(Recorder(), window_ms=1)
+        assert asyncio.run(batcher.submit(1)) == 10
+        assert asyncio.run(batcher.submit(2)) == 20
+
+
+class TestQueryMetrics:
+
+    def test_metrics_endpoint(self, api):
+        response = api.get("/query/metrics")
+        assert response.status_code == 200
+        assert {"queue_depth", "batches", "mean_batch_size"} <= set(response.json()["retrieval_batcher"])
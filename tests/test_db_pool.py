@@ -0,0 +1,76 @@
+# test_db_pool.py
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+
+class TestConnectionPool:
+
+    def test_wal_and_pragmas(self, pool):
+        """Connections are opened in WAL mode with a busy timeout"""
+        db = pool.reader()
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+    def test_reader_is_per_thread(self, pool):
+        """Each thread gets its own reader, reused on later calls"""
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(pool.reader()))
+        thread.start()
+        thread.join()
+        assert pool.reader() is pool.reader()
+        assert seen[0] is not pool.reader()
+
+    def test_reader_is_read_only(self, pool):
+        """Readers cannot write"""
+        with pytest.raises(sqlite3.OperationalError):
+            pool.reader().execute("DELETE FROM articles")
+
+    def test_write_commits_and_read_sees_it(self, pool):
+        """Writes run in a transaction visible to readers afterwards"""
+        async def run():
+            await pool.write(lambda db: db.execute("INSERT INTO articles (title) VALUES ('Pooled')"))
+            return await pool.read(lambda db: db.execute("SELECT COUNT(*) FROM articles").fetchone()[0])
+
+        assert asyncio.run(run()) == 3
+
+    def test_write_rolls_back_on_error(self, pool):
+        """A failing write leaves no partial changes behind"""
+        def failing(db):
+            db.execute("INSERT INTO articles (title) VALUES ('Half done')")
+            raise RuntimeError("boom")
+
+        async def run():
+            with pytest.raises(RuntimeError):
+                await pool.write(failing)
+            return await pool.read(lambda db: db.execute("SELECT COUNT(*) FROM articles").fetchone()[0])
+
+        assert asyncio.run(run()) == 2
+
+    def test_concurrent_reads(self, pool):
+        """Many concurrent reads complete through the bounded executor"""
+        async def run():
+            tasks = [pool.read(lambda db: db.execute("SELECT COUNT(*) FROM articles").fetchone()[0])
+                     for _ in range(50)]
+            return await asyncio.gather(*tasks)
+
+        assert asyncio.run(run()) == [2] * 50
+
+    def test_queued_writes_do_not_block_reads(self, pool):
+        """Reads keep their threads while slow writes wait for the single writer"""
+        import time
+
+        async def run():
+            writes = [pool.write(lambda db: time.sleep(0.2)) for _ in range(pool.max_workers)]
+            writing = asyncio.gather(*writes)
+            await asyncio.sleep(0.05)
+            start = time.monotonic()
+            await pool.read(lambda db: db.execute("SELECT 1").fetchone())
+            waited = time.monotonic() - start
+            await writing
+            return waited
+
+        assert asyncio.run(run()) < 0.15
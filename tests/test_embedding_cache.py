@@ -0,0 +1,182 @@
+# test_embedding_cache.py
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from retriever.embedding_cache import EmbeddingCache
+from retriever.sql_emb import Embedder
+
+
+class FakeModel:
+    """SentenceTransformer stand-in that records every text it encodes"""
+
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.seen = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        self.seen.extend(texts)
+        rows = [np.frombuffer(hashlib.sha256(t.encode()).digest()[:self.dim], dtype=np.uint8) for t in texts]
+        return np.array(rows, dtype=np.float32)
+
+
+def docs(*texts):
+    return [{"text": t} for t in texts]
+
+
+class TestEmbeddingCache:
+
+    def test_only_misses_reach_the_model(self, tmp_path):
+        """Duplicates and previously seen texts are served from the cache, in input order"""
+        model = FakeModel()
+        embedder = Embedder(model=model, cache_dir=str(tmp_path))
+
+        first = embedder.encode_documents(docs("a", "b", "a"))
+        assert model.seen == ["a", "b"]
+        np.testing.assert_array_equal(first[0], first[2])
+
+        second = embedder.encode_documents(docs("b", "c", "a"))
+        assert model.seen == ["a", "b", "c"]
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[2], first[0])
+
+    def test_survives_restart(self, tmp_path):
+        """A new Embedder on the same directory reuses the stored vectors"""
+        Embedder(model=FakeModel(), cache_dir=str(tmp_path)).encode_documents(docs("x", "y"))
+        model = FakeModel()
+        result = Embedder(model=model, cache_dir=str(tmp_path)).encode_documents(docs("y", "x"))
+        assert model.seen == []
+        assert result.shape == (2, 4)
+
+    def test_key_includes_model_and_normalize(self):
+        """The same text under another model or normalisation is a different entry"""
+        keys = {EmbeddingCache.key("m1", True, "t"), EmbeddingCache.key("m2", True, "t"),
+                EmbeddingCache.key("m1", False, "t")}
+        assert len(keys) == 3
+
+    def test_lru_eviction_bounds_size(self, tmp_path):
+        """The cache never holds more than max_entries rows and drops the least recently used"""
+        cache = EmbeddingCache(str(tmp_path), max_entries=3, initial_capacity=2)
+        vectors = np.eye(4, dtype=np.float32)
+        cache.put_many(["a", "b", "c"], vectors[:3])
+        cache.get_many(["a"])
+        cache.put_many(["d"], vectors[3:])
+
+        assert len(cache) == 3
+        found = cache.get_many(["a", "b", "c", "d"])
+        assert set(found) == {"a", "c", "d"}
+        np.testing.assert_array_equal(found["d"], vectors[3])
+        np.testing.assert_array_equal(found["a"], vectors[0])
+
+    def test_dimension_change_resets(self, tmp_path):
+        """Switching to a model with another vector size starts a fresh cache"""
+        cache = EmbeddingCache(str(tmp_path))
+        cache.put_many(["a"], np.ones((1, 4)))
+        cache.put_many(["b"], np.ones((1, 8)))
+        assert cache.dim == 8
+        assert set(cache.get_many(["a", "b"])) == {"b"}
+
+
+def row_for(key):
+    return [float(int(key[1:]) + 1000 * (key[0] == "y")), 1, 0, 0]
+
+
+def fill_cache(cache_dir, prefix, count):
+    """Worker process: put `count` keys, a few at a time, into a shared cache"""
+    cache = EmbeddingCache(cache_dir, initial_capacity=4)
+    for i in range(0, count, 5):
+        keys = [f"{prefix}{j}" for j in range(i, i + 5)]
+        cache.put_many(keys, [row_for(key) for key in keys])
+    cache.close()
+
+
+class TestSharedCacheDir:
+
+    def test_other_instance_sees_writes(self, tmp_path):
+        """A second handle on the directory picks up rows and growth from the first"""
+        first = EmbeddingCache(str(tmp_path), initial_capacity=2)
+        second = EmbeddingCache(str(tmp_path), initial_capacity=2)
+        first.put_many(["a", "b", "c"], np.eye(3, 4))
+        second.put_many(["d"], [[0, 0, 0, 1]])
+
+        found = first.get_many(["a", "c", "d"])
+        np.testing.assert_array_equal(found["c"], [0, 0, 1, 0])
+        np.testing.assert_array_equal(found["d"], [0, 0, 0, 1])
+        assert len(second) == 4
+
+    @pytest.mark.skipif(not hasattr(__import__("os"), "fork"), reason="needs fork")
+    def test_concurrent_processes_never_share_rows(self, tmp_path):
+        """Processes writing at once each keep their own rows"""
+        import multiprocessing
+
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=fill_cache, args=(str(tmp_path), prefix, 100)) for prefix in "xy"]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            assert worker.exitcode == 0
+
+        cache = EmbeddingCache(str(tmp_path))
+        keys = [f"{prefix}{i}" for prefix in "xy" for i in range(100)]
+        found = cache.get_many(keys)
+        assert len(found) == 200
+        for key in keys:
+            np.testing.assert_array_equal(found[key], row_for(key))
+
+
+class TestQueryCache:
+
+    def test_repeated_and_recased_queries_skip_the_model(self):
+        """Case and whitespace variants of a query are encoded once"""
+        model = FakeModel()
+        embedder = Embedder(model=model)
+
+        first = embedder.encode_query("How much protein")
+        second = embedder.encode_query("  how MUCH\tprotein ")
+        assert model.seen == ["how much protein"]
+        np.testing.assert_array_equal(first, second)
+        assert embedder.query_cache_stats()["hits"] == 1
+        assert embedder.query_cache_stats()["misses"] == 1
+
+    def test_cached_embedding_is_not_shared(self):
+        """Callers cannot corrupt the cached vector by writing to the result"""
+        embedder = Embedder(model=FakeModel())
+        embedding = embedder.encode_query("running")
+        original = embedding.copy()
+        embedding[0] = -1
+        np.testing.assert_array_equal(embedder.encode_query("running"), original)
+
+    def test_batch_encodes_misses_once(self):
+        """A batch sends only uncached, distinct queries to the model, in one call"""
+        model = FakeModel()
+        embedder = Embedder(model=model)
+        embedder.encode_query("sleep")
+
+        embeddings = embedder.encode_queries(["Sleep", "stretching", "sleep ", "STRETCHING", "diet"])
+        assert model.seen == ["sleep", "stretching", "diet"]
+        assert embeddings.shape == (5, 4)
+        np.testing.assert_array_equal(embeddings[0], embeddings[2])
+        np.testing.assert_array_equal(embeddings[1], embeddings[3])
+
+    def test_disabled(self):
+        """query_cache_size=0 sends every query to the model"""
+        model = FakeModel()
+        embedder = Embedder(model=model, query_cache_size=0)
+        embedder.encode_query("sleep")
+        embedder.encode_query("sleep")
+        assert model.seen == ["sleep", "sleep"]
+        assert embedder.query_cache_stats() is None
+
+    def test_entries_expire(self, monkeypatch):
+        """Entries older than the TTL are encoded again"""
+        model = FakeModel()
+        embedder = Embedder(model=model, query_cache_ttl=10)
+        now = [1000.0]
+        monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+        embedder.encode_query("yoga")
+        now[0] += 11
+        embedder.encode_query("yoga")
+        assert model.seen == ["yoga", "yoga"]
@@ -0,0 +1,77 @@
+# test_hydrate.py
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from retriever.hydrate import ChunkHydrator, slim_document
+from retriever.sql_emb import load_documents
+
+qdrant_client = pytest.importorskip("qdrant_client")
+
+from retriever import vector_store
+
+
+def add_long_article(db_path, words=40):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "INSERT INTO articles (title, content, published_date, word_count, source_id) VALUES (?, ?, ?, ?, ?)",
+        ("Long Read", " ".join(f"w{i}" for i in range(words)), "2025-08-03", words, 1)
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestChunkHydrator:
+
+    def test_slim_documents_round_trip(self, article_db):
+        """Hydrating slim payloads rebuilds exactly the text load_documents produced"""
+        add_long_article(article_db)
+        documents = load_documents(article_db, long_chunk_size=10, short_chunk_size=20, overlap=3)
+        assert any(doc["end"] is not None for doc in documents)
+
+        hydrated = ChunkHydrator(article_db).hydrate([slim_document(doc) for doc in documents])
+        assert hydrated == documents
+
+    def test_one_query_for_all_misses(self, article_db, monkeypatch):
+        """Misses are fetched in a single batched lookup; repeats come from the LRU"""
+        add_long_article(article_db)
+        documents = load_documents(article_db, long_chunk_size=10, short_chunk_size=20, overlap=3)
+        hydrator = ChunkHydrator(article_db)
+        calls = []
+        fetch = hydrator._fetch
+        monkeypatch.setattr(hydrator, "_fetch", lambda ids: calls.append(ids) or fetch(ids))
+
+        hydrator.hydrate([slim_document(doc) for doc in documents])
+        hydrator.hydrate([slim_document(doc) for doc in documents])
+        assert calls == [[1, 2, 3]]
+        assert hydrator.cache.hits == len(documents)
+
+    def test_deleted_article_hits_are_dropped(self, article_db):
+        """Hits pointing at a deleted article are removed instead of returned empty"""
+        documents = load_documents(article_db)
+        conn = sqlite3.connect(article_db)
+        conn.execute("DELETE FROM articles WHERE id = 2")
+        conn.commit()
+        conn.close()
+
+        hits = [{"score": 0.9, "document": slim_document(doc)} for doc in documents]
+        hydrated = ChunkHydrator(article_db)(hits)
+        assert [hit["document"]["article_id"] for hit in hydrated] == [1]
+
+
+class TestSlimPayloads:
+
+    def test_query_hydrates_slim_points(self, article_db):
+        """Points carry no text, yet query results come back with full documents"""
+        client = qdrant_client.QdrantClient(location=":memory:")
+        store = vector_store.QdrantVectorStore(client=client, slim=True, db_path=article_db)
+        documents = load_documents(article_db)
+        store.rebuild(documents, np.eye(len(documents), 8))
+
+        point = client.scroll(vector_store.COLLECTION_NAME, limit=1, with_payload=True)[0][0]
+        assert set(point.payload["document"]) == {"chunk_id", "article_id", "start", "end"}
+
+        hits = store.query(np.eye(1, 8)[0], top_k=1)
+        assert hits[0]["document"] == documents[0]
@@ -0,0 +1,152 @@
+# test_llm_interface.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from generator.async_client import AsyncLLMClient, LLMError
+from generator.llm_interface import LLMInterface
+
+
+class FakeModels:
+    """Stand-in for genai's client.models: canned answer, streamed in pieces"""
+
+    def __init__(self, pieces, fail=False):
+        self.pieces = pieces
+        self.fail = fail
+        self.contents = []
+
+    def generate_content(self, model, contents):
+        self.contents.append(contents)
+        return SimpleNamespace(text="".join(self.pieces))
+
+    def generate_content_stream(self, model, contents):
+        self.contents.append(contents)
+        for piece in self.pieces:
+            yield SimpleNamespace(text=piece)
+        if self.fail:
+            raise ConnectionError("stream dropped")
+
+
+class FakeAsyncModels:
+    """client.aio.models counterpart, recording into the same FakeModels"""
+
+    def __init__(self, models):
+        self.models = models
+
+    async def generate_content(self, model, contents):
+        return self.models.generate_content(model, contents)
+
+    async def generate_content_stream(self, model, contents):
+        async def chunks():
+            for chunk in self.models.generate_content_stream(model, contents):
+                yield chunk
+        return chunks()
+
+
+class FakeClient:
+
+    def __init__(self, pieces=("Stretch ", "every ", "day."), fail=False):
+        self.models = FakeModels(list(pieces), fail=fail)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self.models))
+
+
+def user(text):
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def model(text):
+    return {"role": "model", "parts": [{"text": text}]}
+
+
+class TestLLMInterface:
+
+    def test_uses_given_client(self):
+        """The client passed in is the one called"""
+        client = FakeClient()
+        assert LLMInterface(client=client).call_llm("q") == "Stretch every day."
+        assert client.models.contents == [[user("q")]]
+
+    def test_stream_yields_pieces_in_order(self):
+        client = FakeClient()
+        assert list(LLMInterface(client=client).stream_llm("q")) == ["Stretch ", "every ", "day."]
+
+    def test_streamed_answer_enters_history(self):
+        """A streamed turn is remembered like a regular one"""
+        client = FakeClient()
+        llm = LLMInterface(history_enabled=True, client=client)
+        list(llm.stream_llm("first"))
+        llm.call_llm("second")
+        assert client.models.contents[-1] == [user("first"), model("Stretch every day."), user("second")]
+
+    def test_stream_error_is_reported(self):
+        """A dropped stream ends with the usual error text instead of raising"""
+        pieces = list(LLMInterface(client=FakeClient(fail=True)).stream_llm("q"))
+        assert pieces[-1].startswith("Error communicating with LLM")
+
+
+class TestHistoryBudget:
+
+    def test_history_keeps_questions_not_context(self):
+        """Later turns resend the bare question, not the prompt with retrieved context"""
+        client = FakeClient()
+        llm = LLMInterface(history_enabled=True, client=client)
+        llm.call_llm("Context: <long article>\nQuery: how to stretch", question="how to stretch")
+        llm.call_llm("Context: <other article>\nQuery: how often", question="how often")
+        assert client.models.contents[-1] == [
+            user("how to stretch"), model("Stretch every day."),
+            user("Context: <other article>\nQuery: how often"),
+        ]
+
+    def test_oldest_turns_are_evicted(self):
+        """History never exceeds its token budget; the newest turns survive"""
+        llm = LLMInterface(history_enabled=True, client=FakeClient(["x" * 40]), history_token_budget=50)
+        for i in range(10):
+            llm.call_llm(f"question {i}")
+        assert llm.history_tokens <= 50
+        assert [q for q, _ in llm.history] == ["question 7", "question 8", "question 9"]
+
+    def test_failed_turns_are_not_remembered(self):
+        llm = LLMInterface(history_enabled=True, client=FakeClient(fail=True))
+        list(llm.stream_llm("q"))
+        assert llm.history == []
+
+    def test_disabled_history_sends_only_the_prompt(self):
+        client = FakeClient()
+        llm = LLMInterface(client=client)
+        llm.call_llm("one")
+        llm.call_llm("two")
+        assert client.models.contents[-1] == [user("two")]
+        assert llm.history == []
+
+
+class TestAsyncLLMInterface:
+
+    def test_acall_llm(self):
+        client = FakeClient()
+        llm = LLMInterface(history_enabled=True, client=client)
+        assert asyncio.run(llm.acall_llm("prompt with context", question="q")) == "Stretch every day."
+        assert llm.history == [("q", "Stretch every day.")]
+
+    def test_astream_llm(self):
+        llm = LLMInterface(history_enabled=True, client=FakeClient())
+
+        async def collect():
+            return [text async for text in llm.astream_llm("q")]
+
+        assert asyncio.run(collect()) == ["Stretch ", "every ", "day."]
+        assert llm.history == [("q", "Stretch every day.")]
+
+    def test_async_failure_raises(self):
+        """Unlike call_llm, the async path raises instead of answering with the error"""
+        client = FakeClient(fail=True)
+        llm = LLMInterface(history_enabled=True, async_client=AsyncLLMClient(client, retries=0))
+
+        async def collect():
+            return [text async for text in llm.astream_llm("q")]
+
+        with pytest.raises(LLMError):
+            asyncio.run(collect())
+        assert llm.history == []
+        assert isinstance(llm.last_error, LLMError)
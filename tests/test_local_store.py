@@ -0,0 +1,109 @@
+# test_local_store.py
+
+import numpy as np
+import pytest
+
+from retriever.local_store import NumpyVectorStore
+from retriever.store import get_vector_store
+
+
+def doc(chunk_id, text=None):
+    return {"title": f"T{chunk_id}", "chunk_id": chunk_id, "text": text or f"text {chunk_id}"}
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(50, 16)).astype(np.float32)
+
+
+class TestNumpyVectorStore:
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16"])
+    def test_matches_brute_force(self, tmp_path, vectors, dtype):
+        """Top-k equals a sorted brute-force cosine ranking"""
+        store = NumpyVectorStore(path=str(tmp_path), dtype=dtype)
+        store.create(16)
+        store.add([doc(i) for i in range(50)], vectors)
+
+        query = vectors[7] + 0.1
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5]
+
+        results = store.query(query, top_k=5, threshold=-1)
+        assert [r["document"]["chunk_id"] for r in results] == list(expected)
+        assert results[0]["score"] == pytest.approx(1.0, abs=0.05)
+
+    def test_threshold_and_placeholder(self, tmp_path, vectors):
+        """Hits under the threshold are dropped, with the usual placeholder when none remain"""
+        store = NumpyVectorStore(path=str(tmp_path))
+        store.create(16)
+        store.add([doc(1)], vectors[:1])
+        assert store.query(-vectors[0], threshold=0.1)[0]["document"]["text"] == "No relevant documents found."
+
+    def test_upsert_delete_and_reload(self, tmp_path, vectors):
+        """Same chunk ids replace rows; state survives reopening from disk as a memory map"""
+        store = NumpyVectorStore(path=str(tmp_path))
+        store.create(16)
+        store.add([doc(1), doc(2)], vectors[:2])
+        store.add([doc(1, "edited")], vectors[2:3])
+        store.delete([2])
+
+        reopened = get_vector_store("numpy", path=str(tmp_path))
+        assert reopened.exists()
+        assert isinstance(reopened._state[0], np.memmap)
+        assert len(reopened) == 1
+        assert reopened.query(vectors[2])[0]["document"]["text"] == "edited"
+
+    def test_update_in_one_rewrite(self, tmp_path, vectors):
+        """Upserts, appends and deletes land together; an upsert of a deleted id keeps it"""
+        store = NumpyVectorStore(path=str(tmp_path))
+        store.create(16)
+        store.add([doc(i) for i in range(5)], vectors[:5])
+        store.update([doc(1, "edited"), doc(9)], vectors[10:12], delete_ids=[0, 1, 3])
+
+        assert [d["chunk_id"] for d in store.documents] == [1, 2, 4, 9]
+        assert store.documents[0]["text"] == "edited"
+        assert store.query(vectors[10])[0]["document"]["chunk_id"] == 1
+        assert store.query(vectors[4])[0]["document"]["chunk_id"] == 4
+
+    def test_sees_files_replaced_by_another_process(self, tmp_path, vectors, monkeypatch):
+        """A running store maps the new files after e.g. the reindex CLI rewrites them"""
+        import retriever.local_store as local_store
+        monkeypatch.setattr(local_store, "RELOAD_CHECK_INTERVAL", 0)
+
+        server = NumpyVectorStore(path=str(tmp_path))
+        server.create(16)
+        server.add([doc(1)], vectors[:1])
+
+        cli = NumpyVectorStore(path=str(tmp_path))
+        cli.add([doc(2, "new chunk")], vectors[1:2])
+
+        assert server.query(vectors[1])[0]["document"]["text"] == "new chunk"
+        assert len(server) == 2
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            get_vector_store("faiss")
+
+
+class TestQueryBatch:
+
+    def test_matches_single_queries(self, tmp_path, vectors):
+        """One matrix product gives the same hits as querying one at a time"""
+        store = NumpyVectorStore(path=str(tmp_path))
+        store.create(16)
+        store.add([doc(i) for i in range(50)], vectors)
+
+        queries = vectors[[3, 11, 42]] + 0.05
+        batched = store.query_batch(queries, top_k=4, threshold=0.2)
+        for hits, q in zip(batched, queries):
+            single = store.query(q, top_k=4, threshold=0.2)
+            assert [h["document"] for h in hits] == [h["document"] for h in single]
+            assert [h["score"] for h in hits] == pytest.approx([h["score"] for h in single], abs=1e-5)
+
+    def test_empty_store(self, tmp_path):
+        """Each query gets the placeholder when nothing is indexed"""
+        store = NumpyVectorStore(path=str(tmp_path))
+        results = store.query_batch(np.ones((2, 16)), threshold=0.3)
+        assert [r[0]["document"]["title"] for r in results] == ["NA", "NA"]
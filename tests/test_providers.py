@@ -0,0 +1,202 @@
+# test_providers.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from generator.async_client import LLMError
+from generator.llm_interface import LLMInterface
+from generator.providers import HedgedProvider, OpenAIModels, OpenAIProvider, Provider, provider_from_spec
+
+
+class StubProvider(Provider):
+    """Local provider with fixed latency and optional failure; records cancellations"""
+
+    def __init__(self, name, delay=0.0, error=None, pieces=("a", "b")):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.pieces = pieces
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = 0
+
+    async def _wait(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+
+    async def generate(self, contents, timeout=None):
+        await self._wait()
+        return f"{self.name}:" + "".join(self.pieces)
+
+    async def stream(self, contents, timeout=None):
+        try:
+            await self._wait()
+            for piece in self.pieces:
+                yield f"{self.name}:{piece}"
+        finally:
+            self.closed += 1
+
+
+def hedged(primary, secondary, **kwargs):
+    kwargs.setdefault("initial_delay", 0.05)
+    return HedgedProvider(primary, secondary, **kwargs)
+
+
+async def collect(pieces):
+    return [piece async for piece in pieces]
+
+
+class TestHedgedGenerate:
+
+    def test_fast_primary_is_not_hedged(self):
+        """A primary answering within the hedge delay never reaches the secondary"""
+        primary, secondary = StubProvider("p"), StubProvider("s")
+        provider = hedged(primary, secondary)
+
+        assert asyncio.run(provider.generate("q")) == "p:ab"
+        assert secondary.calls == 0
+        assert provider.stats()["hedged"] == 0
+        assert provider.stats()["wins"] == {"primary": 1, "secondary": 0}
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        """Past the hedge delay the secondary is sent too; the faster answer wins, the other is cancelled"""
+        primary, secondary = StubProvider("p", delay=1.0), StubProvider("s")
+        provider = hedged(primary, secondary)
+
+        assert asyncio.run(provider.generate("q")) == "s:ab"
+        assert primary.cancelled == 1
+        stats = provider.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_rate"] == 1.0
+        assert stats["wins"]["secondary"] == 1
+
+    def test_primary_can_still_win_after_hedging(self):
+        """The hedge races the primary rather than replacing it"""
+        primary, secondary = StubProvider("p", delay=0.08), StubProvider("s", delay=1.0)
+        provider = hedged(primary, secondary)
+
+        assert asyncio.run(provider.generate("q")) == "p:ab"
+        assert secondary.cancelled == 1
+        assert provider.stats()["hedged"] == 1
+
+    def test_primary_failure_falls_back(self):
+        """A failing primary sends the request to the secondary without waiting out the delay"""
+        primary = StubProvider("p", error=LLMError("down"))
+        provider = hedged(primary, StubProvider("s"), initial_delay=5.0)
+
+        assert asyncio.run(asyncio.wait_for(provider.generate("q"), 1.0)) == "s:ab"
+        assert provider.stats()["fallbacks"] == 1
+        assert provider.stats()["hedged"] == 0
+
+    def test_both_failing_raises(self):
+        provider = hedged(StubProvider("p", error=LLMError("down")), StubProvider("s", error=LLMError("also down")))
+
+        with pytest.raises(LLMError):
+            asyncio.run(provider.generate("q"))
+
+    def test_hedge_delay_tracks_primary_percentile(self):
+        """After min_samples the delay is the primary's p95 latency, within bounds"""
+        provider = hedged(StubProvider("p"), StubProvider("s"), min_samples=3, min_delay=0.01, max_delay=1.0)
+        assert provider.hedge_delay() == 0.05
+
+        for seconds in (0.02, 0.03, 0.2):
+            provider.generate_latency.add(seconds)
+        assert provider.hedge_delay() == 0.2
+
+        provider.generate_latency.add(30.0)
+        assert provider.hedge_delay() == 1.0
+
+    def test_generate_and_stream_keep_separate_latencies(self):
+        """Full-answer times never set the delay for hedging a stream's first piece, nor the reverse"""
+        primary = StubProvider("p", delay=0.02)
+        provider = hedged(primary, StubProvider("s"), min_samples=1, min_delay=0.001)
+
+        asyncio.run(provider.generate("q"))
+        asyncio.run(collect(provider.stream("q")))
+        assert len(provider.generate_latency.samples) == 1
+        assert len(provider.first_piece_latency.samples) == 1
+
+        provider.generate_latency.add(5.0)
+        provider.generate_latency.add(5.0)
+        assert provider.hedge_delay("generate") == 5.0
+        assert provider.hedge_delay("stream") < 0.5
+        assert set(provider.stats()["hedge_delay_ms"]) == {"generate", "stream"}
+
+
+class TestHedgedStream:
+
+    def test_stream_hedges_on_first_piece(self):
+        """The first provider to produce a piece streams the answer; the other stream is closed"""
+        primary, secondary = StubProvider("p", delay=1.0), StubProvider("s")
+        provider = hedged(primary, secondary)
+
+        assert asyncio.run(collect(provider.stream("q"))) == ["s:a", "s:b"]
+        assert primary.cancelled == 1
+        assert provider.stats()["wins"]["secondary"] == 1
+
+    def test_fast_primary_streams_alone(self):
+        primary, secondary = StubProvider("p"), StubProvider("s")
+        provider = hedged(primary, secondary)
+
+        assert asyncio.run(collect(provider.stream("q"))) == ["p:a", "p:b"]
+        assert secondary.calls == 0
+        assert primary.closed == 1
+
+    def test_stream_falls_back_on_primary_failure(self):
+        provider = hedged(StubProvider("p", error=LLMError("down")), StubProvider("s"))
+
+        assert asyncio.run(collect(provider.stream("q"))) == ["s:a", "s:b"]
+        assert provider.stats()["fallbacks"] == 1
+
+
+class TestProviders:
+
+    def test_openai_messages(self):
+        """Structured turns map onto chat roles"""
+        contents = [
+            {"role": "user", "parts": [{"text": "q1"}]},
+            {"role": "model", "parts": [{"text": "a1"}]},
+            {"role": "user", "parts": [{"text": "q2"}]},
+        ]
+        assert OpenAIModels.messages(contents) == [
+            {"role": "user", "content": "q1"},
+            {"role": "assistant", "content": "a1"},
+            {"role": "user", "content": "q2"},
+        ]
+        assert OpenAIModels.messages("hi") == [{"role": "user", "content": "hi"}]
+
+    def test_openai_provider_generates_through_governor(self):
+        """OpenAI responses come back through the same AsyncLLMClient path as Gemini"""
+        seen = {}
+
+        async def create(model, messages, stream=False):
+            seen.update(model=model, messages=messages)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="hello"))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        provider = OpenAIProvider("gpt-test", client=client)
+
+        assert asyncio.run(provider.generate("q")) == "hello"
+        assert seen == {"model": "gpt-test", "messages": [{"role": "user", "content": "q"}]}
+        assert provider.async_client.stats()["calls"] == 1
+
+    def test_provider_from_spec(self):
+        assert provider_from_spec("gemini:gemini-2.5-flash").name == "gemini:gemini-2.5-flash"
+        assert provider_from_spec("openai:gpt-4o-mini").name == "openai:gpt-4o-mini"
+        with pytest.raises(ValueError):
+            provider_from_spec("other:model")
+
+    def test_llm_interface_uses_provider(self):
+        """LLMInterface's async calls go through a given provider and keep history"""
+        llm = LLMInterface(history_enabled=True, provider=hedged(StubProvider("p", delay=1.0), StubProvider("s")))
+
+        assert asyncio.run(llm.acall_llm("prompt", question="q")) == "s:ab"
+        assert llm.history == [("q", "s:ab")]
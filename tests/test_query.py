@@ -0,0 +1,287 @@
+# test_query.py
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import main
+from retriever.local_store import NumpyVectorStore
+from retriever.sql_emb import Embedder, load_documents
+
+
+class FakeModel:
+    """SentenceTransformer stand-in: one call per batch, a fixed vector per word"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        self.calls.append(list(texts))
+        vocabulary = ["yoga", "hiit", "flexibility", "training"]
+        rows = [[float(word in text.lower()) for word in vocabulary] for text in texts]
+        return np.array(rows, dtype=np.float32) + 0.01
+
+
+@pytest.fixture
+def ai(api, article_db, tmp_path, monkeypatch):
+    """The API with a fake embedder and an in-process index of the test articles"""
+    model = FakeModel()
+    embedder = Embedder(model=model)
+    store = NumpyVectorStore(path=str(tmp_path / "index"))
+    documents = load_documents(article_db)
+    store.rebuild(documents, embedder.encode_documents(documents))
+    model.calls.clear()
+    monkeypatch.setattr(main, "embedder", embedder)
+    monkeypatch.setattr(main, "vector_store", store)
+    main.answer_cache.clear()
+    yield model
+    main.answer_cache.clear()
+
+
+class TestBatchQuery:
+
+    def test_batch_retrieval(self, api, ai):
+        """Every query gets its own hits, from a single encode call"""
+        response = api.post("/query/batch", json=[
+            {"query": "yoga flexibility", "user_id": "u1"},
+            {"query": "HIIT training", "user_id": "u2"},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["results"][0]["document"]["title"] for r in data["results"]] == \
+            ["Test Yoga Article", "Test HIIT Workout"]
+        assert [r["answer"] for r in data["results"]] == [None, None]
+        assert len(ai.calls) == 1
+        assert data["timing"]["queries"] == 2
+        assert {"embedding_time", "retrieval_time", "generation_time", "total_time"} <= set(data["timing"])
+
+    def test_generate(self, api, ai, monkeypatch):
+        """With generate=true each result carries an answer from the configured provider"""
+        from test_providers import StubProvider
+
+        provider = StubProvider("stub")
+        monkeypatch.setattr(main, "llm_provider", provider)
+        response = api.post("/query/batch?generate=true", json=[
+            {"query": "yoga", "user_id": "u1"},
+            {"query": "hiit", "user_id": "u2"},
+        ])
+        assert [(r["answer"], r["error"]) for r in response.json()["results"]] == [("stub:ab", None)] * 2
+        assert provider.calls == 2
+
+    def test_generation_concurrency_is_capped(self, api, ai, monkeypatch):
+        """A large batch keeps at most BATCH_GENERATION_CONCURRENCY generations in flight"""
+        from test_providers import StubProvider
+
+        class CountingProvider(StubProvider):
+            active = peak = 0
+
+            async def generate(self, contents, timeout=None):
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                try:
+                    return await super().generate(contents, timeout=timeout)
+                finally:
+                    self.active -= 1
+
+        provider = CountingProvider("stub", delay=0.01)
+        monkeypatch.setattr(main, "llm_provider", provider)
+        monkeypatch.setattr(main, "BATCH_GENERATION_CONCURRENCY", 2)
+        monkeypatch.setattr(main, "_batch_generation_slots", None)
+        response = api.post("/query/batch?generate=true", json=[{"query": "yoga", "user_id": "u1"}] * 6)
+        assert [r["answer"] for r in response.json()["results"]] == ["stub:ab"] * 6
+        assert provider.peak == 2
+
+    def test_generation_error_is_per_result(self, api, ai, monkeypatch):
+        """A failed generation is reported on its result instead of failing the batch"""
+        from test_providers import StubProvider
+        from generator.async_client import LLMError
+
+        monkeypatch.setattr(main, "llm_provider", StubProvider("stub", error=LLMError("down")))
+        response = api.post("/query/batch?generate=true", json=[{"query": "yoga", "user_id": "u1"}])
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert (result["answer"], result["error"]) == (None, "down")
+        assert result["results"][0]["document"]["title"] == "Test Yoga Article"
+
+    def test_generation_is_hedged(self, api, ai, monkeypatch):
+        """Batch answers go through the hedged provider and show up in its stats"""
+        from test_providers import StubProvider, hedged
+
+        provider = hedged(StubProvider("primary", delay=0.2), StubProvider("secondary"))
+        monkeypatch.setattr(main, "llm_provider", provider)
+        response = api.post("/query/batch?generate=true", json=[{"query": "yoga", "user_id": "u1"}])
+        assert response.json()["results"][0]["answer"] == "secondary:ab"
+        hedging = api.get("/query/metrics").json()["hedging"]
+        assert (hedging["calls"], hedging["hedged"], hedging["wins"]["secondary"]) == (1, 1, 1)
+
+    def test_limits(self, api, ai, monkeypatch):
+        """Empty and oversized batches are rejected"""
+        monkeypatch.setattr(main, "BATCH_MAX_QUERIES", 2)
+        assert api.post("/query/batch", json=[]).status_code == 422
+        too_many = [{"query": "q", "user_id": "u"}] * 3
+        assert api.post("/query/batch", json=too_many).status_code == 413
+
+    def test_unavailable_without_models(self, api):
+        """Until the embedder and index are loaded the endpoint answers 503"""
+        response = api.post("/query/batch", json=[{"query": "yoga", "user_id": "u1"}])
+        assert response.status_code == 503
+
+
+class TestRetrievalBatcher:
+
+    def test_concurrent_queries_share_one_encode(self, ai):
+        """Concurrent retrievals are encoded and searched as one batch"""
+        import asyncio
+
+        async def run():
+            return await asyncio.gather(main.retrieval_batcher.submit(("yoga", True)),
+                                        main.retrieval_batcher.submit(("hiit", True)))
+
+        yoga, hiit = asyncio.run(run())
+        assert yoga["results"][0]["document"]["title"] == "Test Yoga Article"
+        assert hiit["results"][0]["document"]["title"] == "Test HIIT Workout"
+        assert yoga["cached"] is None
+        assert ai.calls == [["yoga", "hiit"]]
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Chat sessions whose LLM is a fake streaming client"""
+    from test_llm_interface import FakeClient
+    from generator.llm_interface import LLMInterface
+    from generator.session_store import SessionStore
+
+    clients = []
+
+    def factory():
+        clients.append(FakeClient())
+        return LLMInterface(history_enabled=True, client=clients[-1])
+
+    store = SessionStore(factory)
+    store.clients = clients
+    monkeypatch.setattr(main, "llm_sessions", store)
+    return store
+
+
+class TestStreamingQuery:
+
+    def test_results_then_tokens_then_timing(self, api, ai, sessions):
+        """Retrieval results come first, then each streamed piece, then the timing"""
+        response = api.post("/query/stream", json={"query": "yoga", "user_id": "u1"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ["results", "token", "token", "token", "done"]
+        assert events[0][1]["results"][0]["document"]["title"] == "Test Yoga Article"
+        assert "".join(data["text"] for name, data in events if name == "token") == "Stretch every day."
+
+        done = events[-1][1]
+        assert done["answer"] == "Stretch every day."
+        timing = done["timing"]
+        assert timing["embedding_time"] <= timing["time_to_first_token"] <= timing["embedding_time"] + timing["generation_time"]
+        assert sessions.get("u1").history == [("yoga", "Stretch every day.")]
+
+    def test_generation_error_event(self, api, ai, sessions, monkeypatch):
+        """A stream that breaks midway ends with an error event and is not cached"""
+        from test_llm_interface import FakeClient
+        from generator.llm_interface import LLMInterface
+
+        monkeypatch.setattr(sessions, "factory", lambda: LLMInterface(history_enabled=True, client=FakeClient(fail=True)))
+        events = parse_sse(api.post("/query/stream", json={"query": "yoga", "user_id": "u9"}).text)
+        assert [name for name, _ in events][-2:] == ["error", "done"]
+        assert len(main.answer_cache) == 0
+
+    def test_unavailable_without_models(self, api):
+        response = api.post("/query/stream", json={"query": "yoga", "user_id": "u1"})
+        assert response.status_code == 503
+
+
+class TestAnswerCache:
+
+    def ask(self, api, query, user_id="u1"):
+        return parse_sse(api.post("/query/stream", json={"query": query, "user_id": user_id}).text)[-1][1]
+
+    def test_paraphrase_is_answered_from_cache(self, api, ai, sessions):
+        """A near-identical question reuses the answer without calling the LLM"""
+        assert self.ask(api, "yoga")["cached"] is False
+        done = self.ask(api, "yoga please", user_id="u2")
+        assert done["cached"] is True
+        assert done["answer"] == "Stretch every day."
+        assert sessions.clients[1].models.contents == []
+        assert sessions.get("u2").history == [("yoga please", "Stretch every day.")]
+        assert main.answer_cache.stats()["hits"] == 1
+
+    def test_different_question_misses(self, api, ai, sessions):
+        self.ask(api, "yoga")
+        assert self.ask(api, "hiit", user_id="u2")["cached"] is False
+
+    def test_follow_up_turns_bypass_cache(self, api, ai, sessions):
+        """A user with earlier turns gets an answer for their own conversation, never a shared one"""
+        self.ask(api, "yoga", user_id="u1")
+        self.ask(api, "hiit", user_id="u2")
+        done = self.ask(api, "yoga please", user_id="u2")
+        assert done["cached"] is False
+        assert len(sessions.clients[1].models.contents) == 2
+        assert len(main.answer_cache) == 2
+
+    def test_article_update_invalidates(self, api, ai, sessions):
+        """Editing an article the answer was built from drops the cached answer"""
+        self.ask(api, "yoga")
+        assert api.put("/articles/1", json={"title": "Test Yoga Article", "content": "Updated yoga advice."}).status_code == 200
+        assert self.ask(api, "yoga", user_id="u2")["cached"] is False
+
+
+class TestQuery:
+
+    def test_answer_and_history(self, api, ai, sessions):
+        """The answer is generated from the retrieved chunks and kept in the user's session"""
+        response = api.post("/query", json={"query": "yoga", "user_id": "u1"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["answer"] == "Stretch every day."
+        assert data["results"][0]["document"]["title"] == "Test Yoga Article"
+        assert {"embedding_time", "generation_time"} <= set(data["timing"])
+        assert sessions.get("u1").history == [("yoga", "Stretch every day.")]
+
+    def test_paraphrase_uses_answer_cache(self, api, ai, sessions):
+        api.post("/query", json={"query": "yoga", "user_id": "u1"})
+        assert api.post("/query", json={"query": "yoga please", "user_id": "u2"}).json()["answer"] == "Stretch every day."
+        assert sessions.clients[1].models.contents == []
+
+    def test_llm_failure(self, api, ai, sessions, monkeypatch):
+        """A generation that fails after retries is a 502 and is not cached"""
+        async def fail(*args, **kwargs):
+            from generator.async_client import LLMError
+            raise LLMError("down")
+
+        monkeypatch.setattr(sessions, "factory", lambda: SimpleNamespace(acall_llm=fail, history=[]))
+        assert api.post("/query", json={"query": "yoga", "user_id": "u1"}).status_code == 502
+        assert len(main.answer_cache) == 0
+
+    def test_retry_after_while_warming_up(self, api, monkeypatch):
+        """While the warmup is still loading, /query is a 503 that says when to retry"""
+        from warmup import Warmup
+        warmup = Warmup()
+        warmup.components["embedder"] = {"state": "loading", "load_time": None, "error": None}
+        monkeypatch.setattr(main, "warmup", warmup)
+
+        response = api.post("/query", json={"query": "yoga", "user_id": "u1"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == str(main.WARMUP_RETRY_AFTER)
+
+    def test_unavailable_without_models(self, api):
+        """With nothing loading there is nothing to wait for"""
+        response = api.post("/query", json={"query": "yoga", "user_id": "u1"})
+        assert response.status_code == 503
+        assert "retry-after" not in response.headers
@@ -0,0 +1,130 @@
+# test_reindex.py
+
+import hashlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+
+from retriever import vector_store
+from retriever.local_store import NumpyVectorStore
+from retriever.reindex import reindex
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for Embedder that records what it was asked to encode"""
+    model_name = "fake-model"
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def encode_documents(self, docs, batch_size=32):
+        self.encoded.extend(doc["chunk_id"] for doc in docs)
+        vectors = [np.frombuffer(hashlib.sha256(doc["text"].encode()).digest()[:self.dim], dtype=np.uint8)
+                   for doc in docs]
+        vectors = np.array(vectors, dtype=np.float32) + 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def qdrant():
+    return qdrant_client.QdrantClient(location=":memory:")
+
+
+@pytest.fixture
+def store(qdrant):
+    return vector_store.QdrantVectorStore(client=qdrant)
+
+
+def point_count(client):
+    return client.count(vector_store.COLLECTION_NAME).count
+
+
+class TestReindex:
+
+    def test_initial_then_noop(self, article_db, store, qdrant):
+        """A second run with no changes embeds nothing"""
+        embedder = FakeEmbedder()
+        assert reindex(embedder, db_path=article_db, store=store)["added"] == 2
+        assert point_count(qdrant) == 2
+
+        embedder.encoded.clear()
+        stats = reindex(embedder, db_path=article_db, store=store)
+        assert stats["unchanged"] == 2
+        assert embedder.encoded == []
+
+    def test_only_changed_chunks_are_embedded(self, article_db, store, qdrant):
+        """Edits re-embed one chunk and overwrite its point instead of duplicating it"""
+        embedder = FakeEmbedder()
+        reindex(embedder, db_path=article_db, store=store)
+
+        conn = sqlite3.connect(article_db)
+        conn.execute("UPDATE articles SET content = 'Brand new yoga text' WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        embedder.encoded.clear()
+        stats = reindex(embedder, db_path=article_db, store=store)
+        assert stats["updated"] == 1
+        assert embedder.encoded == [1]
+        assert point_count(qdrant) == 2
+
+        point = qdrant.retrieve(vector_store.COLLECTION_NAME, [vector_store.point_id(1)], with_payload=True)[0]
+        assert "Brand new yoga text" in point.payload["document"]["text"]
+
+    def test_snapshot_follows_reindex(self, article_db, store, tmp_path):
+        """The embedding snapshot is written on the first run and kept current by later ones"""
+        from retriever.snapshot import corpus_fingerprint, load_snapshot
+
+        embedder = FakeEmbedder()
+        path = str(tmp_path / "snapshot")
+        assert reindex(embedder, db_path=article_db, store=store, snapshot_path=path)["snapshot"] is True
+
+        conn = sqlite3.connect(article_db)
+        conn.execute("UPDATE articles SET content = 'Brand new yoga text' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        reindex(embedder, db_path=article_db, store=store, snapshot_path=path)
+
+        documents, embeddings = load_snapshot(path, embedder.model_name, corpus_fingerprint(article_db, "fake-model"))
+        assert "Brand new yoga text" in documents[0]["text"]
+        np.testing.assert_allclose(embeddings, embedder.encode_documents(documents))
+
+    def test_removed_articles_are_deleted(self, article_db, store, qdrant):
+        """Points for deleted articles are removed from the collection"""
+        embedder = FakeEmbedder()
+        reindex(embedder, db_path=article_db, store=store)
+
+        conn = sqlite3.connect(article_db)
+        conn.execute("DELETE FROM articles WHERE id = 2")
+        conn.commit()
+        conn.close()
+
+        assert reindex(embedder, db_path=article_db, store=store)["removed"] == 1
+        assert point_count(qdrant) == 1
+
+    def test_full_rebuild(self, article_db, store, qdrant):
+        """full=True re-embeds everything"""
+        embedder = FakeEmbedder()
+        reindex(embedder, db_path=article_db, store=store)
+        embedder.encoded.clear()
+        reindex(embedder, db_path=article_db, store=store, full=True)
+        assert sorted(embedder.encoded) == [1, 2]
+        assert point_count(qdrant) == 2
+
+    def test_local_backend(self, article_db, tmp_path):
+        """The same incremental flow works against the in-process store"""
+        local = NumpyVectorStore(path=str(tmp_path / "index"))
+        embedder = FakeEmbedder()
+        reindex(embedder, db_path=article_db, store=local)
+
+        conn = sqlite3.connect(article_db)
+        conn.execute("DELETE FROM articles WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        assert reindex(embedder, db_path=article_db, store=local)["removed"] == 1
+        assert [doc["chunk_id"] for doc in local.documents] == [2]
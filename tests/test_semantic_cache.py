@@ -0,0 +1,89 @@
+# test_semantic_cache.py
+
+import numpy as np
+
+from generator.semantic_cache import SemanticCache
+
+
+def hits(*article_ids):
+    return [{"score": 0.9, "document": {"chunk_id": a, "article_id": a, "text": f"text {a}"}} for a in article_ids]
+
+
+def vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+class TestSemanticCache:
+
+    def test_similar_query_hits(self):
+        """A query above the cosine threshold gets the stored answer"""
+        cache = SemanticCache(threshold=0.9)
+        cache.store(vec(1, 0, 0), "q", "answer", hits(1), cache.generation)
+        found = cache.lookup(vec(1, 0.1, 0))
+        assert found["answer"] == "answer"
+        assert found["score"] > 0.9
+        assert cache.lookup(vec(0, 1, 0)) is None
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_best_match_wins(self):
+        cache = SemanticCache(threshold=0.5)
+        cache.store(vec(1, 1, 0), "a", "first", hits(1), cache.generation)
+        cache.store(vec(1, 0, 0), "b", "second", hits(2), cache.generation)
+        assert cache.lookup(vec(1, 0.05, 0))["answer"] == "second"
+
+    def test_article_invalidation(self):
+        """Updating an article drops only the answers built from it"""
+        cache = SemanticCache(threshold=0.9)
+        cache.store(vec(1, 0, 0), "a", "from 1", hits(1, 2), cache.generation)
+        cache.store(vec(0, 1, 0), "b", "from 3", hits(3), cache.generation)
+        cache.invalidate_article(2)
+        assert cache.lookup(vec(1, 0, 0)) is None
+        assert cache.lookup(vec(0, 1, 0))["answer"] == "from 3"
+        assert len(cache) == 1
+
+    def test_answer_racing_an_update_is_not_stored(self):
+        """An answer generated while one of its articles changed is discarded"""
+        cache = SemanticCache(threshold=0.9)
+        generation = cache.generation
+        cache.invalidate_article(1)
+        assert cache.store(vec(1, 0, 0), "a", "stale", hits(1), generation) is False
+        assert cache.store(vec(1, 0, 0), "a", "fresh", hits(1), cache.generation) is True
+        assert cache.lookup(vec(1, 0, 0))["answer"] == "fresh"
+
+    def test_change_log_is_bounded(self):
+        """Only recent invalidations are kept; an answer older than all of them is dropped"""
+        cache = SemanticCache(threshold=0.9, changes_kept=2)
+        generation = cache.generation
+        cache.invalidate_article(2)
+        assert cache.store(vec(1, 0, 0), "a", "unrelated change", hits(1), generation) is True
+        for article_id in (3, 4):
+            cache.invalidate_article(article_id)
+        assert len(cache._changes) == 2
+        assert cache.store(vec(0, 1, 0), "b", "too old to check", hits(1), generation) is False
+
+    def test_answer_without_articles_is_not_stored(self):
+        """The "no relevant documents" placeholder has no article to invalidate it by"""
+        from retriever.store import no_results
+
+        cache = SemanticCache(threshold=0.9)
+        assert cache.store(vec(1, 0, 0), "a", "nothing found", no_results(0.1), cache.generation) is False
+        assert len(cache) == 0
+
+    def test_size_limit_evicts_least_recently_used(self):
+        cache = SemanticCache(threshold=0.9, maxsize=2)
+        cache.store(vec(1, 0, 0), "a", "a", hits(1), 0)
+        cache.store(vec(0, 1, 0), "b", "b", hits(2), 0)
+        cache.lookup(vec(1, 0, 0))
+        cache.store(vec(0, 0, 1), "c", "c", hits(3), 0)
+        assert cache.lookup(vec(0, 1, 0)) is None
+        assert cache.lookup(vec(1, 0, 0))["answer"] == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("generator.semantic_cache.time.monotonic", lambda: now[0])
+        cache = SemanticCache(threshold=0.9, ttl=10)
+        cache.store(vec(1, 0, 0), "a", "a", hits(1), 0)
+        now[0] += 11
+        assert cache.lookup(vec(1, 0, 0)) is None
+        assert len(cache) == 0
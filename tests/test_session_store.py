@@ -0,0 +1,110 @@
+# test_session_store.py
+
+import time
+
+from generator.llm_interface import LLMInterface
+from generator.session_store import SessionStore, SESSION_OVERHEAD_BYTES
+from test_llm_interface import FakeClient
+
+
+def factory():
+    return LLMInterface(history_enabled=True, client=FakeClient())
+
+
+def chat(store, user_id, question):
+    llm = store.get(user_id)
+    llm.call_llm(f"Context ...\nQuery: {question}", question=question)
+    store.save(user_id, llm)
+    return llm
+
+
+class TestMemoryTier:
+
+    def test_same_session_is_returned(self):
+        store = SessionStore(factory)
+        assert store.get("u1") is store.get("u1")
+        assert store.stats()["hits"] == 1
+        assert store.stats()["misses"] == 1
+
+    def test_session_count_is_capped(self):
+        """The least recently used session goes once max_sessions is exceeded"""
+        store = SessionStore(factory, max_sessions=2)
+        store.get("a")
+        store.get("b")
+        store.get("a")
+        store.get("c")
+        assert "b" not in store and "a" in store and "c" in store
+        assert store.stats()["evictions"]["capacity"] == 1
+
+    def test_memory_is_capped(self):
+        """Growing histories push out the oldest sessions to stay under the byte cap"""
+        store = SessionStore(factory, max_memory_bytes=3 * SESSION_OVERHEAD_BYTES)
+        for user_id in ("a", "b", "c"):
+            chat(store, user_id, "how to stretch")
+        assert store.stats()["memory_bytes"] <= 3 * SESSION_OVERHEAD_BYTES
+        assert "a" not in store
+        assert store.stats()["evictions"]["memory"] == 1
+
+    def test_idle_sessions_expire(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr("generator.session_store.time.monotonic", lambda: now[0])
+        store = SessionStore(factory, ttl=60)
+        first = store.get("u1")
+        now[0] += 61
+        assert store.get("u1") is not first
+        assert store.stats()["evictions"]["expired"] == 1
+
+
+class TestPersistentTier:
+
+    def test_history_survives_restart(self, tmp_path):
+        """A new store on the same database resumes the compacted history"""
+        db_path = str(tmp_path / "sessions.db")
+        store = SessionStore(factory, db_path=db_path)
+        chat(store, "u1", "how to stretch")
+        store.close()
+
+        restored = SessionStore(factory, db_path=db_path).get("u1")
+        assert restored.history == [("how to stretch", "Stretch every day.")]
+
+    def test_evicted_session_is_reloaded(self, tmp_path):
+        store = SessionStore(factory, max_sessions=1, db_path=str(tmp_path / "sessions.db"))
+        chat(store, "u1", "how to stretch")
+        store.get("u2")
+        assert "u1" not in store
+        assert store.get("u1").history == [("how to stretch", "Stretch every day.")]
+        assert store.stats()["loaded_from_db"] == 1
+
+    def test_workers_see_each_others_turns(self, tmp_path):
+        """A cached session is refreshed when another worker has saved a newer turn"""
+        db_path = str(tmp_path / "sessions.db")
+        worker_a = SessionStore(factory, db_path=db_path)
+        worker_b = SessionStore(factory, db_path=db_path)
+        chat(worker_a, "u1", "first")
+        chat(worker_b, "u1", "second")
+        # Within the recheck interval worker A trusts its copy; after it, A sees B's turn
+        assert [q for q, _ in worker_a.get("u1").history] == ["first"]
+        worker_a.recheck_interval = 0
+        assert [q for q, _ in worker_a.get("u1").history] == ["first", "second"]
+
+    def test_memory_hits_skip_sqlite(self, tmp_path, monkeypatch):
+        """A recently checked session is served from memory without a database read"""
+        store = SessionStore(factory, db_path=str(tmp_path / "sessions.db"))
+        chat(store, "u1", "first")
+
+        def no_reads(user_id):
+            raise AssertionError("SQLite was read")
+
+        monkeypatch.setattr(store, "_stored", no_reads)
+        assert store.get("u1").history[0][0] == "first"
+        assert store.stats()["hits"] == 1
+
+    def test_stale_rows_are_ignored(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / "sessions.db")
+        store = SessionStore(factory, db_path=db_path, persist_ttl=60)
+        chat(store, "u1", "old question")
+        store.close()
+
+        later = time.time() + 120
+        monkeypatch.setattr("generator.session_store.time.time", lambda: later)
+        assert SessionStore(factory, db_path=db_path, persist_ttl=60).get("u1").history == []
@@ -0,0 +1,125 @@
+# test_snapshot.py
+
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+import main
+from retriever.snapshot import corpus_fingerprint, load_snapshot, read_meta, save_snapshot, snapshot_paths, update_snapshot
+from retriever.sql_emb import load_documents
+
+
+def embed(documents, dim=4):
+    """One deterministic unit vector per document"""
+    rng = np.random.default_rng(len(documents))
+    vectors = rng.random((len(documents), dim), dtype=np.float32) + 0.1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def edit_article(db_path, article_id, content):
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE articles SET content = ? WHERE id = ?", (content, article_id))
+    conn.commit()
+    conn.close()
+
+
+class TestFingerprint:
+
+    def test_stable_until_articles_change(self, article_db):
+        before = corpus_fingerprint(article_db, "m")
+        assert corpus_fingerprint(article_db, "m") == before
+        edit_article(article_db, 1, "Different yoga text")
+        assert corpus_fingerprint(article_db, "m") != before
+
+    def test_depends_on_model_and_chunking(self, article_db):
+        base = corpus_fingerprint(article_db, "m")
+        assert corpus_fingerprint(article_db, "other") != base
+        assert corpus_fingerprint(article_db, "m", overlap=10) != base
+
+
+class TestSnapshot:
+
+    def test_round_trip_is_memory_mapped(self, article_db, tmp_path):
+        """Documents come back in row order with a read-only memory-mapped matrix"""
+        documents = load_documents(article_db)
+        embeddings = embed(documents)
+        fingerprint = corpus_fingerprint(article_db, "m")
+        meta = save_snapshot(str(tmp_path), documents, embeddings, "m", fingerprint)
+        assert meta["count"] == 2 and meta["dim"] == 4
+
+        loaded_documents, loaded = load_snapshot(str(tmp_path), "m", fingerprint)
+        assert loaded_documents == documents
+        assert isinstance(loaded, np.memmap)
+        assert not loaded.flags.writeable
+        np.testing.assert_array_equal(loaded, embeddings)
+
+    def test_rejects_other_model_or_corpus(self, article_db, tmp_path):
+        documents = load_documents(article_db)
+        save_snapshot(str(tmp_path), documents, embed(documents), "m", "abc")
+        assert load_snapshot(str(tmp_path), "other", "abc") is None
+        assert load_snapshot(str(tmp_path), "m", "def") is None
+        assert load_snapshot(str(tmp_path), "m") is not None
+
+    def test_incomplete_snapshot_is_ignored(self, article_db, tmp_path):
+        """Without meta.json (written last) there is no snapshot"""
+        documents = load_documents(article_db)
+        save_snapshot(str(tmp_path), documents, embed(documents), "m", "abc")
+        os.remove(snapshot_paths(str(tmp_path))[2])
+        assert read_meta(str(tmp_path)) is None
+        assert load_snapshot(str(tmp_path), "m", "abc") is None
+
+    def test_mismatched_lengths_raise(self, article_db, tmp_path):
+        documents = load_documents(article_db)
+        with pytest.raises(ValueError):
+            save_snapshot(str(tmp_path), documents, embed(documents[:1]), "m", "abc")
+
+    def test_update_reuses_unchanged_rows(self, article_db, tmp_path):
+        """An incremental update takes new rows for changed chunks and keeps the rest"""
+        documents = load_documents(article_db)
+        embeddings = embed(documents)
+        save_snapshot(str(tmp_path), documents, embeddings, "m", "old")
+
+        edit_article(article_db, 2, "Brand new HIIT text")
+        documents = load_documents(article_db)
+        replacement = np.array([[1, 0, 0, 0]], dtype=np.float32)
+        assert update_snapshot(str(tmp_path), documents, [documents[1]], replacement, "m", "new")
+
+        loaded_documents, loaded = load_snapshot(str(tmp_path), "m", "new")
+        assert loaded_documents[1]["text"].endswith("Brand new HIIT text")
+        np.testing.assert_array_equal(loaded[0], embeddings[0])
+        np.testing.assert_array_equal(loaded[1], replacement[0])
+
+    def test_update_without_rows_to_reuse(self, article_db, tmp_path):
+        """Unchanged chunks missing from the snapshot leave it untouched"""
+        documents = load_documents(article_db)
+        assert not update_snapshot(str(tmp_path), documents, [], [], "m", "abc")
+        assert read_meta(str(tmp_path)) is None
+
+
+class TestStartupFromSnapshot:
+
+    def test_restart_skips_encoding(self, article_db, tmp_path, monkeypatch):
+        """The first start encodes and snapshots; the next one reuses it without an embedder"""
+        class Encoder:
+            calls = 0
+
+            def encode_documents(self, documents):
+                Encoder.calls += 1
+                return embed(documents)
+
+        monkeypatch.setattr(main, "FILE_PATH", article_db)
+        monkeypatch.setattr(main, "EMBEDDING_SNAPSHOT_PATH", str(tmp_path / "snapshot"))
+        monkeypatch.setattr(main, "embedder", Encoder())
+        documents, embeddings = main.corpus_embeddings()
+        assert Encoder.calls == 1
+
+        monkeypatch.setattr(main, "embedder", None)
+        restored, mapped = main.corpus_embeddings()
+        assert restored == documents
+        np.testing.assert_array_equal(mapped, embeddings)
+
+        edit_article(article_db, 1, "Changed")
+        with pytest.raises(RuntimeError):
+            main.corpus_embeddings()
@@ -0,0 +1,42 @@
+# test_stats.py
+
+import sqlite3
+
+from init_db import recompute_stats
+
+
+class TestStats:
+
+    def test_stats_after_migration(self, api):
+        """Existing articles are counted when the aggregate table is first created"""
+        stats = api.get("/api/stats").json()
+        assert stats["total_articles"] == 2
+        assert stats["total_sources"] == 2
+        assert stats["average_word_count"] == 6
+        assert stats["articles_by_source"] == [
+            {"id": 1, "name": "Test Health Daily", "article_count": 2},
+            {"id": 2, "name": "Test Wellness News", "article_count": 0},
+        ]
+
+    def test_stats_follow_writes(self, api):
+        """Create, bulk insert, update and delete keep the aggregates current"""
+        api.post("/articles/", json={"title": "New", "content": "one two three", "source_id": 2})
+        api.post("/articles/bulk", content='{"title": "Bulk", "content": "a b c d", "source_id": 2}')
+        api.put("/articles/1", json={"content": "short", "source_id": 2})
+        api.delete("/articles/2")
+
+        stats = api.get("/api/stats").json()
+        assert stats["total_articles"] == 3
+        assert stats["average_word_count"] == (3 + 4 + 1) / 3
+        counts = {s["name"]: s["article_count"] for s in stats["articles_by_source"]}
+        assert counts == {"Test Health Daily": 0, "Test Wellness News": 3}
+
+    def test_recompute_repairs_drift(self, api, article_db):
+        """recompute_stats rebuilds the aggregates from the articles table"""
+        conn = sqlite3.connect(article_db)
+        conn.execute("UPDATE source_stats SET article_count = 99")
+        recompute_stats(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        assert api.get("/api/stats").json()["total_articles"] == 2
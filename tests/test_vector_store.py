@@ -0,0 +1,159 @@
+# test_vector_store.py
+
+import numpy as np
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+
+from retriever import vector_store
+
+
+class FlakyClient:
+    """Wraps a real client and fails the first upsert of every batch"""
+
+    def __init__(self, client):
+        self.client = client
+        self.attempts = {}
+
+    def upsert(self, collection_name, points, wait=True):
+        key = points.ids[0]
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        if self.attempts[key] == 1:
+            raise ConnectionError("transient")
+        return self.client.upsert(collection_name=collection_name, points=points, wait=wait)
+
+
+@pytest.fixture
+def qdrant():
+    client = qdrant_client.QdrantClient(location=":memory:")
+    vector_store.create_qdrant_collection(8, client=client)
+    return client
+
+
+def documents(n):
+    return [{"title": f"T{i}", "chunk_id": i, "text": f"text {i}"} for i in range(n)]
+
+
+class TestAddDocumentsToIndex:
+
+    def test_batches_cover_every_point(self, qdrant):
+        """Points are written in several batches, none lost or duplicated"""
+        vectors = np.random.default_rng(0).normal(size=(25, 8)).astype(np.float32)
+        written = vector_store.add_documents_to_index(documents(25), vectors, client=qdrant, batch_size=4, parallel=3)
+        assert written == 25
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 25
+
+    def test_rerun_is_idempotent(self, qdrant):
+        """Deterministic ids make a second ingest overwrite instead of duplicate"""
+        vectors = np.ones((10, 8), dtype=np.float32)
+        vector_store.add_documents_to_index(documents(10), vectors, client=qdrant, batch_size=3)
+        vector_store.add_documents_to_index(documents(10), vectors, client=qdrant, batch_size=3)
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 10
+
+    def test_batches_are_retried(self, qdrant, monkeypatch):
+        """A failing batch is retried rather than leaving a partial index"""
+        monkeypatch.setattr(vector_store, "UPSERT_BACKOFF", 0)
+        flaky = FlakyClient(qdrant)
+        written = vector_store.add_documents_to_index(documents(9), np.ones((9, 8)), client=flaky, batch_size=3)
+        assert written == 9
+        assert sorted(flaky.attempts.values()) == [2, 2, 2]
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 9
+
+    def test_exhausted_retries_raise(self, qdrant):
+        """Persistent failures surface to the caller"""
+        class DownClient:
+            def upsert(self, **kwargs):
+                raise ConnectionError("down")
+
+        batch = vector_store.Batch(ids=[vector_store.point_id(1)], vectors=np.ones((1, 8)), payloads=[{}])
+        with pytest.raises(ConnectionError):
+            vector_store.upsert_batch(batch, client=DownClient(), retries=1, backoff=0)
+
+    def test_only_transient_errors_are_retried(self):
+        """A rejected request (4xx) fails at once; an overloaded server is retried"""
+        from httpx import Headers
+        from qdrant_client.http.exceptions import UnexpectedResponse
+
+        class ErrorClient:
+            def __init__(self, status):
+                self.status = status
+                self.calls = 0
+
+            def upsert(self, **kwargs):
+                self.calls += 1
+                raise UnexpectedResponse(self.status, "", b"", Headers())
+
+        batch = vector_store.Batch(ids=[vector_store.point_id(1)], vectors=np.ones((1, 8)).tolist(), payloads=[{}])
+        for status, calls in ((400, 1), (503, 3)):
+            client = ErrorClient(status)
+            with pytest.raises(UnexpectedResponse):
+                vector_store.upsert_batch(batch, client=client, retries=2, backoff=0)
+            assert client.calls == calls
+
+
+class TestBlueGreenRebuild:
+
+    def test_collection_is_served_through_alias(self, qdrant):
+        """The live collection is a versioned one behind the `documents` alias"""
+        assert vector_store.live_collection(qdrant) == "documents_v1"
+        assert vector_store.collection_exists(qdrant)
+
+    def test_queries_see_old_version_until_switch(self, qdrant):
+        """A version being built is invisible to queries until the alias moves"""
+        vector_store.add_documents_to_index(documents(3), np.eye(3, 8), client=qdrant)
+        name = vector_store.create_collection_version(8, client=qdrant)
+        vector_store.add_documents_to_index(documents(5), np.eye(5, 8), client=qdrant, collection_name=name)
+
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 3
+        vector_store.switch_alias(name, client=qdrant)
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 5
+
+    def test_rebuild_switches_and_collects_old_versions(self, qdrant):
+        """Each rebuild goes live in one step; only RETAIN_VERSIONS older versions survive"""
+        for n in (2, 3, 4):
+            name = vector_store.rebuild_collection(documents(n), np.eye(n, 8), client=qdrant)
+            assert vector_store.live_collection(qdrant) == name
+            assert qdrant.count(vector_store.COLLECTION_NAME).count == n
+        assert vector_store.collection_versions(qdrant) == [3, 4]
+
+        hits = vector_store.query_index(np.eye(1, 8)[0], top_k=1, client=qdrant)
+        assert hits[0]["document"]["chunk_id"] == 0
+
+    def test_failed_rebuild_keeps_live_version(self, qdrant, monkeypatch):
+        """A build that dies midway is dropped and queries keep the previous data"""
+        vector_store.add_documents_to_index(documents(3), np.eye(3, 8), client=qdrant)
+
+        def broken(*args, **kwargs):
+            raise ConnectionError("down")
+
+        monkeypatch.setattr(vector_store, "add_documents_to_index", broken)
+        with pytest.raises(ConnectionError):
+            vector_store.rebuild_collection(documents(5), np.eye(5, 8), client=qdrant)
+        assert vector_store.live_collection(qdrant) == "documents_v1"
+        assert vector_store.collection_versions(qdrant) == [1]
+        assert qdrant.count(vector_store.COLLECTION_NAME).count == 3
+
+    def test_legacy_collection_is_replaced_by_alias(self):
+        """A pre-versioning `documents` collection gives way to the alias on first switch"""
+        client = qdrant_client.QdrantClient(location=":memory:")
+        client.create_collection(
+            vector_store.COLLECTION_NAME,
+            vectors_config=vector_store.VectorParams(size=8, distance=vector_store.Distance.COSINE)
+        )
+        vector_store.rebuild_collection(documents(2), np.eye(2, 8), client=client)
+        assert [c.name for c in client.get_collections().collections] == ["documents_v1"]
+        assert client.count(vector_store.COLLECTION_NAME).count == 2
+
+
+class TestQueryIndexBatch:
+
+    def test_matches_single_queries(self, qdrant):
+        """search_batch returns the same hits per query as query_index"""
+        vectors = np.random.default_rng(1).normal(size=(20, 8)).astype(np.float32)
+        vector_store.add_documents_to_index(documents(20), vectors, client=qdrant)
+
+        queries = vectors[[0, 5, 9]] + 0.05
+        batched = vector_store.query_index_batch(queries, top_k=3, client=qdrant)
+        single = [vector_store.query_index(q, top_k=3, client=qdrant) for q in queries]
+        assert [[h["document"]["chunk_id"] for h in hits] for hits in batched] == \
+            [[h["document"]["chunk_id"] for h in hits] for hits in single]
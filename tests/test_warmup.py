@@ -0,0 +1,79 @@
+# test_warmup.py
+
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from warmup import Warmup
+
+
+class TestWarmup:
+
+    def test_components_load_in_order(self):
+        """Each step runs once, in order, and ends ready with a load time"""
+        order = []
+        warmup = Warmup()
+        warmup.start([("a", lambda: order.append("a")), ("b", lambda: order.append("b"))])
+        warmup.join(5)
+
+        assert order == ["a", "b"]
+        assert warmup.ready
+        assert not warmup.loading
+        assert all(c["load_time"] is not None for c in warmup.status()["components"].values())
+
+    def test_failure_is_recorded(self):
+        """A failing step (including sys.exit from the docker helpers) does not stop later ones"""
+        warmup = Warmup()
+        warmup.start([("docker", lambda: sys.exit(1)), ("llm", lambda: None)])
+        warmup.join(5)
+
+        assert warmup.state("docker") == "failed"
+        assert warmup.components["docker"]["error"] == "SystemExit: 1"
+        assert warmup.state("llm") == "ready"
+        assert not warmup.ready
+
+    def test_loading_until_done(self):
+        release = threading.Event()
+        warmup = Warmup()
+        warmup.start([("embedder", release.wait)])
+        assert warmup.loading
+        assert warmup.state("embedder") in ("pending", "loading")
+        release.set()
+        warmup.join(5)
+        assert warmup.state("embedder") == "ready"
+        assert warmup.state("unknown") == "disabled"
+
+
+class TestHealth:
+
+    def test_health(self, api):
+        """The API is healthy as soon as the database answers, warm or not"""
+        response = api.get("/api/health")
+        assert response.status_code == 200
+        health = response.json()
+        assert health["status"] == "healthy"
+        assert health["database"] == "connected"
+        assert health["ai_ready"] is False
+
+    def test_startup_warms_in_background(self, api, monkeypatch):
+        """Startup returns before the warmup finishes; health reports each component"""
+        release = threading.Event()
+        monkeypatch.setattr(main, "AI_WARMUP", True)
+        monkeypatch.setattr(main, "warmup", Warmup())
+        monkeypatch.setattr(main, "load_embedder", release.wait)
+        monkeypatch.setattr(main, "load_vector_store", lambda: None)
+        monkeypatch.setattr(main, "load_llm", lambda: None)
+
+        with TestClient(main.app) as client:
+            assert client.get("/articles/").status_code == 200
+            components = client.get("/api/health").json()["components"]
+            assert components["embedder"]["state"] in ("pending", "loading")
+            assert client.post("/query", json={"query": "yoga", "user_id": "u1"}).status_code == 503
+
+            release.set()
+            main.warmup.join(5)
+            health = client.get("/api/health").json()
+            assert health["ready"] is True
+            assert list(health["components"]) == ["embedder", "vector_store", "llm"]
@@ -0,0 +1,61 @@
+# warmup.py
+import threading
+import time
+
+
+class Warmup:
+    """
+    Slow startup work (model loading, indexing, client setup) run on a background thread
+    so the app serves requests immediately. Each named component goes
+    pending -> loading -> ready | failed and records how long it took to load.
+    """
+
+    def __init__(self):
+        # name -> {"state", "load_time", "error"}, in load order
+        self.components = {}
+        self._thread = None
+
+    def start(self, steps):
+        """Run `steps` ([(name, fn), ...]) in order on a daemon thread."""
+        for name, _ in steps:
+            self.components[name] = {"state": "pending", "load_time": None, "error": None}
+        # Daemon: a model download still running at shutdown must not hold the process open
+        self._thread = threading.Thread(target=self._run, args=(steps,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self, steps):
+        for name, fn in steps:
+            component = self.components[name]
+            component["state"] = "loading"
+            start = time.monotonic()
+            try:
+                fn()
+            except (Exception, SystemExit) as e:
+                # The docker helpers sys.exit() on failure; record it like any other error
+                component.update(state="failed", error=f"{type(e).__name__}: {e}")
+                print(f"Warmup of {name} failed: {e}")
+            else:
+                component["state"] = "ready"
+            component["load_time"] = round(time.monotonic() - start, 3)
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def state(self, name):
+        component = self.components.get(name)
+        return component["state"] if component is not None else "disabled"
+
+    @property
+    def ready(self):
+        return bool(self.components) and all(c["state"] == "ready" for c in self.components.values())
+
+    @property
+    def loading(self):
+        return any(c["state"] in ("pending", "loading") for c in self.components.values())
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "components": {name: dict(component) for name, component in self.components.items()},
+        }